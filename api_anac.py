@@ -0,0 +1,378 @@
+# -*- coding: utf-8 -*-
+# Gerador SSIM - Acesso à API SIROS da ANAC
+# Download em streaming e decodificação incremental da resposta (JSON duplamente codificado),
+# por uma sessão HTTP compartilhada (keep-alive, gzip) e com várias temporadas em paralelo
+
+import codecs
+import itertools
+import json
+import os
+import random
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from instrumentacao import INSTRUMENTACAO, etapa, contar, modulo_sob_demanda
+
+# Importados na primeira consulta à API
+requests = modulo_sob_demanda('requests')
+urllib3 = modulo_sob_demanda('urllib3')
+
+# Endereço da API (GERADOR_SSIM_API_URL aponta para outro servidor, ex: um servidor local de testes)
+URL_API_SSIM = os.environ.get('GERADOR_SSIM_API_URL', "https://sas.anac.gov.br/sas/siros_api/ssimfile")
+TIMEOUT_API = 300
+TAMANHO_BLOCO_DOWNLOAD = 1 << 20  # 1 MiB por leitura da resposta
+CONEXOES_API = 8  # Conexões mantidas abertas no pool da sessão
+DOWNLOADS_SIMULTANEOS = 4
+TENTATIVAS_API = 3
+ESPERA_INICIAL_API = 2.0  # Segundos antes da 2ª tentativa; dobra a cada nova falha
+_STATUS_TRANSITORIOS = {429, 500, 502, 503, 504}
+
+# Maior prefixo de conteúdo de string JSON sem aspas finais (escapes completos)
+_CONTEUDO_STRING = re.compile(r'[^"\\]*(?:\\.[^"\\]*)*', re.DOTALL)
+# Escape \uXXXX incompleto ou surrogate alto (\uD800-\uDBFF) que depende do próximo bloco
+_ESCAPE_PENDENTE = re.compile(r'\\u(?:[0-9a-fA-F]{0,3}|[dD][89abAB][0-9a-fA-F]{2})\Z')
+_ESPACOS = ' \t\r\n'
+_SEPARADOR = re.compile(r'[ \t\r\n,]*')
+_SO_ESPACOS = re.compile(r'[ \t\r\n]*')
+
+
+class DecodificadorSsimfile:
+    """
+    Decodifica incrementalmente a resposta da API, que vem como uma string JSON
+    contendo a lista JSON de registros ({"ssimfile": "..."}), sem nunca montar a
+    string interna inteira em memória. Também aceita a lista JSON direta.
+    """
+
+    def __init__(self):
+        self._externo = ''        # Conteúdo ainda não decodificado da string externa
+        self._interno = ''        # JSON interno (lista de registros) ainda não consumido
+        self._posicao = 0         # Posição de leitura em self._interno
+        self._formato = None      # 'string' (duplamente codificado) ou 'lista'
+        self._string_fechada = False
+        self._lista_aberta = False
+        self._lista_fechada = False
+        self._decoder = json.JSONDecoder()
+
+    def alimentar(self, texto):
+        """Recebe um bloco de texto da resposta e retorna os registros completos"""
+        if self._formato is None:
+            texto = texto.lstrip(_ESPACOS)
+            if not texto:
+                return []
+            if texto[0] == '"':
+                self._formato = 'string'
+                texto = texto[1:]
+            else:
+                self._formato = 'lista'
+
+        if self._formato == 'lista':
+            self._interno += texto
+        else:
+            self._interno += self._desescapar(texto)
+        return self._extrair_registros(final=False)
+
+    def finalizar(self):
+        """Processa o restante do buffer e valida o fim do documento"""
+        registros = self._extrair_registros(final=True)
+        if self._formato == 'string' and (self._externo or not self._string_fechada):
+            raise json.JSONDecodeError("String JSON externa incompleta", self._externo, 0)
+        if not self._lista_fechada:
+            raise json.JSONDecodeError("Lista JSON de registros incompleta", self._interno, self._posicao)
+        return registros
+
+    def _desescapar(self, texto):
+        """Decodifica a parte segura da string externa (sem escapes cortados no fim)"""
+        if self._string_fechada:
+            if texto.strip(_ESPACOS):
+                raise json.JSONDecodeError("Conteúdo após a string JSON", texto, 0)
+            return ''
+
+        buffer = self._externo + texto
+        fim = _CONTEUDO_STRING.match(buffer).end()
+        if fim < len(buffer) and buffer[fim] == '"':
+            # Aspas finais da string externa
+            if buffer[fim + 1:].strip(_ESPACOS):
+                raise json.JSONDecodeError("Conteúdo após a string JSON", buffer, fim + 1)
+            self._string_fechada = True
+            seguro, self._externo = buffer[:fim], ''
+        else:
+            # fim < len(buffer) aqui só acontece com uma barra invertida no último caractere
+            seguro = buffer[:fim]
+            pendente = _ESCAPE_PENDENTE.search(seguro)
+            if pendente and self._inicia_escape(seguro, pendente.start()):
+                fim = pendente.start()
+                seguro = buffer[:fim]
+            self._externo = buffer[fim:]
+
+        return json.loads('"' + seguro + '"')
+
+    @staticmethod
+    def _inicia_escape(texto, posicao):
+        """Indica se a barra invertida em `posicao` inicia um escape (não é uma barra escapada)"""
+        barras = 0
+        while posicao - barras >= 0 and texto[posicao - barras] == '\\':
+            barras += 1
+        return barras % 2 == 1
+
+    def _extrair_registros(self, final):
+        """Extrai da lista interna os registros já completos"""
+        registros = []
+        texto = self._interno
+        posicao = self._posicao
+        tamanho = len(texto)
+
+        while True:
+            # Espaços (e vírgulas entre registros, depois de aberta a lista)
+            padrao = _SEPARADOR if self._lista_aberta else _SO_ESPACOS
+            posicao = padrao.match(texto, posicao).end()
+            if posicao >= tamanho:
+                break
+
+            caractere = texto[posicao]
+            if not self._lista_aberta:
+                if caractere != '[':
+                    raise json.JSONDecodeError("Esperada lista JSON de registros", texto, posicao)
+                self._lista_aberta = True
+                posicao += 1
+                continue
+            if self._lista_fechada:
+                raise json.JSONDecodeError("Conteúdo após a lista JSON", texto, posicao)
+            if caractere == ']':
+                self._lista_fechada = True
+                posicao += 1
+                continue
+
+            try:
+                registro, fim = self._decoder.raw_decode(texto, posicao)
+            except json.JSONDecodeError:
+                if final:
+                    raise
+                break  # Registro cortado no fim do bloco: aguarda o próximo
+            if fim >= tamanho and not final and isinstance(registro, (int, float)):
+                break  # Número pode continuar no próximo bloco
+            registros.append(registro)
+            posicao = fim
+
+        # Descarta o que já foi consumido para manter o buffer pequeno
+        self._interno = texto[posicao:]
+        self._posicao = 0
+        return registros
+
+
+def decodificar_blocos(blocos):
+    """Gera os registros da API a partir de blocos de texto da resposta"""
+    decodificador = DecodificadorSsimfile()
+    if not INSTRUMENTACAO.ativa:
+        for bloco in blocos:
+            yield from decodificador.alimentar(bloco)
+        yield from decodificador.finalizar()
+        return
+
+    # Instrumentado: soma só o tempo de decodificação (sem a leitura da rede)
+    segundos = 0.0
+    total = 0
+    for bloco in itertools.chain(blocos, [None]):
+        inicio = time.perf_counter()
+        registros = decodificador.finalizar() if bloco is None else decodificador.alimentar(bloco)
+        segundos += time.perf_counter() - inicio
+        total += len(registros)
+        yield from registros
+    INSTRUMENTACAO.registrar_etapa('api.decodificacao', segundos, total)
+
+
+def iterar_linhas_ssim(registros):
+    """Gera apenas as linhas SSIM (campo 'ssimfile') dos registros da API"""
+    for item in registros:
+        if isinstance(item, dict) and 'ssimfile' in item:
+            yield item['ssimfile']
+
+
+_sessao = None
+_lock_sessao = threading.Lock()
+
+
+def obter_sessao():
+    """Sessão HTTP do processo: conexões keep-alive reaproveitadas entre consultas e threads"""
+    global _sessao
+    with _lock_sessao:
+        if _sessao is None:
+            sessao = requests.Session()
+            adaptador = requests.adapters.HTTPAdapter(pool_connections=CONEXOES_API, pool_maxsize=CONEXOES_API)
+            sessao.mount('https://', adaptador)
+            sessao.mount('http://', adaptador)
+            sessao.headers['Accept-Encoding'] = 'gzip, deflate'
+            # As consultas usam verify=False: sem um InsecureRequestWarning a cada requisição
+            urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+            _sessao = sessao
+    return _sessao
+
+
+def baixar_temporada(temporada, tamanho_bloco=TAMANHO_BLOCO_DOWNLOAD, timeout=TIMEOUT_API,
+                     cabecalhos=None, info_resposta=None, progresso=None):
+    """
+    Consulta a API da ANAC em streaming e gera os registros da temporada um a um.
+    Erros de rede sobem como requests.exceptions.RequestException e erros de
+    formato como json.JSONDecodeError.
+
+    `cabecalhos` permite requisições condicionais (If-None-Match / If-Modified-Since);
+    se `info_resposta` for um dict, recebe 'status', 'etag' e 'last_modified'.
+    Uma resposta 304 (não modificado) não gera registros.
+    `progresso(bytes_recebidos, bytes_totais)` é chamado a cada bloco (total None se desconhecido).
+    """
+    with etapa('api.consulta'), obter_sessao().get(
+        URL_API_SSIM,
+        params={'ds_temporada': temporada},
+        headers=cabecalhos,
+        verify=False,
+        timeout=timeout,
+        stream=True
+    ) as response_api:
+        if info_resposta is not None:
+            info_resposta['status'] = response_api.status_code
+            info_resposta['etag'] = response_api.headers.get('ETag')
+            info_resposta['last_modified'] = response_api.headers.get('Last-Modified')
+        if response_api.status_code == 304:
+            return
+        response_api.raise_for_status()
+        decodificador_texto = codecs.getincrementaldecoder(response_api.encoding or 'utf-8')(errors='replace')
+        tamanho_resposta = response_api.headers.get('Content-Length')
+        tamanho_resposta = int(tamanho_resposta) if tamanho_resposta and tamanho_resposta.isdigit() else None
+
+        def blocos_texto():
+            recebidos = 0
+            for bloco in response_api.iter_content(chunk_size=tamanho_bloco):
+                if bloco:
+                    if progresso is not None:
+                        # Bytes lidos da rede (comprimidos, como o Content-Length) quando disponível
+                        lidos = getattr(getattr(response_api, 'raw', None), 'tell', None)
+                        recebidos = lidos() if callable(lidos) else recebidos + len(bloco)
+                        progresso(recebidos, tamanho_resposta)
+                    yield decodificador_texto.decode(bloco)
+            yield decodificador_texto.decode(b'', final=True)
+
+        yield from decodificar_blocos(blocos_texto())
+
+
+def baixar_linhas_temporada(temporada, cabecalhos=None, info_resposta=None):
+    """Gera as linhas SSIM da temporada direto da API (usado pelo cache em disco)"""
+    return iterar_linhas_ssim(
+        baixar_temporada(temporada, cabecalhos=cabecalhos, info_resposta=info_resposta)
+    )
+
+
+def _falha_transitoria(erro):
+    """Erros de rede, timeouts, respostas cortadas e status 429/5xx valem uma nova tentativa"""
+    if isinstance(erro, requests.exceptions.HTTPError):
+        return erro.response is not None and erro.response.status_code in _STATUS_TRANSITORIOS
+    return isinstance(erro, (
+        requests.exceptions.ConnectionError,
+        requests.exceptions.Timeout,
+        requests.exceptions.ChunkedEncodingError,
+        requests.exceptions.ContentDecodingError,
+    ))
+
+
+class ProgressoDownloads:
+    """
+    Estado do download de cada temporada, atualizado pelas threads de download e lido
+    por quem exibe o progresso (`instantaneo()` devolve uma cópia).
+    Estados: 'na fila', 'baixando', 'aguardando nova tentativa', 'concluída', 'erro'.
+    """
+
+    def __init__(self, temporadas):
+        self._lock = threading.Lock()
+        self._estados = {
+            temporada: {'estado': 'na fila', 'tentativa': 0, 'bytes': 0, 'bytes_totais': None,
+                        'registros': 0, 'erro': None}
+            for temporada in temporadas
+        }
+
+    def atualizar(self, temporada, **campos):
+        with self._lock:
+            self._estados[temporada].update(campos)
+
+    def instantaneo(self):
+        with self._lock:
+            return {temporada: dict(estado) for temporada, estado in self._estados.items()}
+
+
+def _lista_registros(temporada, registros):
+    return list(registros)
+
+
+def baixar_registros_temporada(temporada, tentativas=TENTATIVAS_API, espera_inicial=ESPERA_INICIAL_API,
+                               progresso=None, destino=None, info_respostas=None):
+    """
+    Baixa os registros da temporada, repetindo o download inteiro com espera exponencial (e uma
+    variação aleatória) quando a falha é transitória.
+    Os registros são repassados, à medida que chegam, a `destino(temporada, registros)`, e o
+    resultado dele é devolvido (sem destino: a lista de registros). Com um destino que grava em
+    disco (ex: CacheTemporadas.salvar) a temporada não fica inteira em memória; a cada nova
+    tentativa o destino é chamado de novo e deve descartar o que recebeu na anterior.
+    `progresso` é um ProgressoDownloads. Se `info_respostas` for um dict, recebe em
+    info_respostas[temporada] o 'status', 'etag' e 'last_modified' da resposta da tentativa atual
+    (preenchido antes do primeiro registro chegar ao destino).
+    """
+    def atualizar(**campos):
+        if progresso is not None:
+            progresso.atualizar(temporada, **campos)
+
+    if destino is None:
+        destino = _lista_registros
+
+    for tentativa in range(1, tentativas + 1):
+        atualizar(estado='baixando', tentativa=tentativa, bytes=0, registros=0)
+        recebidos = 0
+        info_resposta = {}
+        if info_respostas is not None:
+            info_respostas[temporada] = info_resposta
+
+        def registros():
+            nonlocal recebidos
+            for registro in baixar_temporada(
+                temporada, info_resposta=info_resposta,
+                progresso=lambda lidos, total: atualizar(bytes=lidos, bytes_totais=total)
+            ):
+                recebidos += 1
+                yield registro
+
+        try:
+            resultado = destino(temporada, registros())
+            atualizar(estado='concluída', registros=recebidos)
+            return resultado
+        except requests.exceptions.RequestException as erro:
+            if tentativa == tentativas or not _falha_transitoria(erro):
+                atualizar(estado='erro', erro=str(erro))
+                raise
+            contar('api.novas_tentativas')
+            atualizar(estado='aguardando nova tentativa', erro=str(erro))
+            time.sleep(espera_inicial * 2 ** (tentativa - 1) * random.uniform(0.8, 1.2))
+        except json.JSONDecodeError as erro:
+            atualizar(estado='erro', erro=str(erro))
+            raise
+
+
+def baixar_temporadas(temporadas, downloads_simultaneos=DOWNLOADS_SIMULTANEOS, tentativas=TENTATIVAS_API,
+                      espera_inicial=ESPERA_INICIAL_API, progresso=None, destino=None, info_respostas=None):
+    """
+    Inicia o download de várias temporadas em paralelo (threads sobre a mesma sessão HTTP)
+    e devolve {temporada: Future com o resultado de `destino`} (sem destino: a lista de
+    registros; veja baixar_registros_temporada, que também descreve `info_respostas`).
+    As threads seguem em segundo plano; `concurrent.futures.wait` ou `Future.result()` aguardam o fim.
+    """
+    temporadas = list(dict.fromkeys(temporadas))
+    executor = ThreadPoolExecutor(
+        max_workers=max(1, min(downloads_simultaneos, len(temporadas))), thread_name_prefix='download_temporada'
+    )
+    try:
+        return {
+            temporada: executor.submit(
+                baixar_registros_temporada, temporada, tentativas, espera_inicial, progresso, destino,
+                info_respostas
+            )
+            for temporada in temporadas
+        }
+    finally:
+        executor.shutdown(wait=False)
@@ -0,0 +1,393 @@
+# -*- coding: utf-8 -*-
+# Gerador SSIM - Benchmark das etapas de geração
+# Temporadas sintéticas determinísticas no formato da API da ANAC (sem acesso à rede)
+#
+# Exemplos:
+#   python benchmark_ssim.py --registros 100000
+#   python benchmark_ssim.py --registros 1000000 --companhias 100 --saida depois.json --comparar antes.json
+#   python benchmark_ssim.py --partida --etapas decodificacao
+
+import argparse
+import collections
+import gc
+import json
+import os
+import platform
+import random
+import shutil
+import string
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+from referencias import IndiceAeroportos
+from temporada import indexar_temporada
+from api_anac import decodificar_blocos
+from parser_ssim import transformar_linhas3
+from gerador_ssim import extrair_companhias_do_ssim, selecionar_linhas_companhia, gerar_linhas_arquivo_ssim
+from escrita_ssim import gravar_arquivo_ssim
+
+VERSAO_RELATORIO = 1
+TAMANHO_BLOCO_PAYLOAD = 1 << 20
+
+COMPANHIAS_BASE = ['G3', 'AD', 'LA', 'JJ', '2Z', 'TP', 'AF', 'KL', 'AA', 'CM', 'AR', 'AV', 'UX', 'LH', 'IB']
+AEROPORTOS_BASE = [
+    'GRU', 'CGH', 'VCP', 'GIG', 'SDU', 'BSB', 'CNF', 'POA', 'REC', 'SSA', 'FOR', 'BEL', 'MAO', 'CWB',
+    'FLN', 'NAT', 'MCZ', 'CGB', 'GYN', 'LIS', 'MAD', 'CDG', 'AMS', 'FRA', 'MIA', 'JFK', 'MCO', 'EZE',
+    'SCL', 'BOG', 'LIM', 'PTY', 'MVD', 'ASU',
+]
+OFFSETS = ['-0300'] * 6 + ['-0400', '-0500', '+0000', '+0100', '+0200', '-0200', '+0530']
+EQUIPAMENTOS = ['73G', '738', '7M8', '320', '32N', '321', 'E95', 'E2', 'AT7', '789', '77W']
+CONFIGURACOES = ['000', 'Y186', 'Y174', 'J12Y150', 'C30Y270', 'Y70']
+MESES = ['JAN', 'FEB', 'MAR', 'APR', 'MAY', 'JUN', 'JUL', 'AUG', 'SEP', 'OCT', 'NOV', 'DEC']
+
+ETAPAS = [
+    'decodificacao', 'extracao_companhias', 'indexacao', 'filtragem', 'conversao_horario',
+    'adaptacao_gol', 'renumeracao', 'serializacao', 'serializacao_gzip',
+]
+
+# Partida a frio: cada medição roda em um interpretador novo (nada importado, nada em memória)
+DIRETORIO_PROJETO = os.path.dirname(os.path.abspath(__file__))
+MODULOS_PESADOS = ['pandas', 'numpy', 'pyarrow', 'requests']
+_MEDICOES_PARTIDA = {
+    'importacao_interface': "import gerador_ssim_streamlit",
+    'referencias_tabela': (
+        "from referencias import IndiceAeroportos, IndiceCompanhias\n"
+        "IndiceAeroportos.de_csv('airport.csv'); IndiceCompanhias.de_csv('iata_airlines.csv')"
+    ),
+    'referencias_csv': (
+        "import pandas as pd\n"
+        "from referencias import IndiceAeroportos, IndiceCompanhias\n"
+        "IndiceAeroportos.de_dataframe(pd.read_csv('airport.csv'))\n"
+        "IndiceCompanhias.de_dataframe(pd.read_csv('iata_airlines.csv'))"
+    ),
+}
+_SCRIPT_PARTIDA = """
+import json, sys, time
+inicio = time.perf_counter()
+exec({codigo!r})
+segundos = time.perf_counter() - inicio
+print(json.dumps({{'segundos': segundos, 'modulos': [m for m in {modulos!r} if m in sys.modules]}}))
+"""
+
+
+# --- Gerador sintético ---
+def _codigos_companhias(quantidade, aleatorio):
+    """Códigos IATA de companhia: os reais mais comuns e, depois, códigos sintéticos"""
+    codigos = list(COMPANHIAS_BASE[:quantidade])
+    alfabeto = string.ascii_uppercase + string.digits
+    while len(codigos) < quantidade:
+        codigo = aleatorio.choice(string.ascii_uppercase) + aleatorio.choice(alfabeto)
+        if codigo not in codigos:
+            codigos.append(codigo)
+    return codigos
+
+
+def _codigos_aeroportos(quantidade, aleatorio):
+    """Códigos IATA de aeroporto com offset UTC (os sintéticos em geral não existem no CSV)"""
+    codigos = list(AEROPORTOS_BASE[:quantidade])
+    while len(codigos) < quantidade:
+        codigo = ''.join(aleatorio.choice(string.ascii_uppercase) for _ in range(3))
+        if codigo not in codigos:
+            codigos.append(codigo)
+    return {codigo: aleatorio.choice(OFFSETS) for codigo in codigos}
+
+
+def _linha3(aleatorio, companhia, aeroportos, codigos_aeroportos, numero_linha):
+    """Uma linha 3 de 200 caracteres no layout usado pela ANAC"""
+    numero_voo = f"{aleatorio.randint(1, 9999):04d}"
+    inicio = f"{aleatorio.randint(1, 28):02d}{aleatorio.choice(MESES)}25"
+    fim = f"{aleatorio.randint(1, 28):02d}{aleatorio.choice(MESES)}26"
+    dias = ''.join(str(dia) if aleatorio.random() < 0.7 else ' ' for dia in range(1, 8))
+    origem, destino = aleatorio.sample(codigos_aeroportos, 2)
+    partida = f"{aleatorio.randint(0, 23):02d}{aleatorio.choice((0, 10, 15, 30, 45, 55)):02d}"
+    chegada = f"{aleatorio.randint(0, 23):02d}{aleatorio.choice((0, 5, 20, 30, 40, 50)):02d}"
+
+    linha = (
+        f"3 {companhia:<3}{numero_voo}0101J{inicio}{fim}{dias} "
+        f"{origem}{partida}{partida}{aeroportos[origem]}  "
+        f"{destino}{chegada}{chegada}{aeroportos[destino]}  "
+        f"{aleatorio.choice(EQUIPAMENTOS):<3}"
+    ).ljust(137)
+    if aleatorio.random() < 0.8:
+        linha += f"{companhia:<3}{aleatorio.randint(1, 9999):04d}"
+    linha = linha.ljust(172) + aleatorio.choice(CONFIGURACOES)
+    return linha.ljust(192) + f"{numero_linha:08d}"
+
+
+def gerar_temporada(registros, companhias=20, aeroportos=200, semente=42, temporada='W25'):
+    """Gera as linhas SSIM de uma temporada sintética (headers, registros 3 e linha 5)"""
+    aleatorio = random.Random(semente)
+    codigos_companhias = _codigos_companhias(companhias, aleatorio)
+    mapa_aeroportos = _codigos_aeroportos(max(aeroportos, 2), aleatorio)
+    codigos_aeroportos = list(mapa_aeroportos)
+    # Distribuição desigual entre companhias, como numa malha real
+    pesos = [1.0 / (posicao + 1) for posicao in range(len(codigos_companhias))]
+
+    yield '1AIRLINE STANDARD SCHEDULE DATA SET'.ljust(192) + '00000001'
+    for _ in range(4):
+        yield '0' * 200
+    yield f"2UXX  0008{temporada}01NOV2529MAR26".ljust(192) + '00000006'
+
+    numero_linha = 7
+    restantes = registros
+    while restantes > 0:
+        lote = min(restantes, 10000)
+        for companhia in aleatorio.choices(codigos_companhias, weights=pesos, k=lote):
+            yield _linha3(aleatorio, companhia, mapa_aeroportos, codigos_aeroportos, numero_linha)
+            numero_linha += 1
+        restantes -= lote
+
+    for _ in range(4):
+        yield '0' * 200
+    yield '5 XX 01JAN25'.ljust(187) + f"{numero_linha - 1:06d}E{numero_linha + 4:06d}"
+
+
+def gerar_payload(linhas):
+    """Resposta da API: string JSON contendo a lista JSON de registros {"ssimfile": ...}"""
+    return json.dumps(json.dumps([{'ssimfile': linha} for linha in linhas]))
+
+
+# --- Medição ---
+def _medir(funcao, medir_memoria):
+    """Executa `funcao` e retorna (resultado, segundos, pico de memória em bytes ou None)"""
+    gc.collect()
+    if medir_memoria:
+        tracemalloc.start()
+    inicio = time.perf_counter()
+    try:
+        resultado = funcao()
+        duracao = time.perf_counter() - inicio
+        pico = tracemalloc.get_traced_memory()[1] if medir_memoria else None
+    finally:
+        if medir_memoria:
+            tracemalloc.stop()
+    return resultado, duracao, pico
+
+
+def medir_etapa(nome, funcao, registros, bytes_processados=None, repeticoes=1, medir_memoria=True):
+    """
+    Mede uma etapa: melhor tempo entre as repetições (sem tracemalloc, que deixa o
+    código mais lento) e, em uma execução separada, o pico de memória alocada.
+    """
+    tempos = []
+    resultado = None
+    for _ in range(max(repeticoes, 1)):
+        resultado, duracao, _ = _medir(funcao, False)
+        tempos.append(duracao)
+    segundos = min(tempos)
+
+    pico = None
+    if medir_memoria:
+        resultado = None
+        resultado, _, pico = _medir(funcao, True)
+
+    medicao = {
+        'segundos': round(segundos, 6),
+        'registros': registros,
+        'registros_por_segundo': round(registros / segundos, 1) if segundos else None,
+        'pico_memoria_mb': round(pico / 1e6, 3) if pico is not None else None,
+    }
+    if bytes_processados is not None:
+        medicao['mb_por_segundo'] = round(bytes_processados / 1e6 / segundos, 3) if segundos else None
+    print(f"⏱️ {nome:<22} {segundos:9.3f}s  {medicao['registros_por_segundo'] or 0:>14,.0f} reg/s"
+          + (f"  pico {medicao['pico_memoria_mb']:.1f} MB" if pico is not None else ""))
+    return resultado, medicao
+
+
+def carregar_aeroportos(caminho=os.path.join(DIRETORIO_PROJETO, 'airport.csv')):
+    """Índice de aeroportos do repositório (None se o CSV não existir)"""
+    try:
+        return IndiceAeroportos.de_csv(caminho)
+    except FileNotFoundError:
+        return None
+
+
+def _medir_em_processo_novo(codigo):
+    """Executa `codigo` em um interpretador novo; retorna segundos e módulos pesados importados"""
+    script = _SCRIPT_PARTIDA.format(codigo=codigo, modulos=MODULOS_PESADOS)
+    saida = subprocess.run(
+        [sys.executable, '-c', script], cwd=DIRETORIO_PROJETO, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(saida.strip().splitlines()[-1])
+
+
+def medir_partida(repeticoes=3):
+    """
+    Partida a frio: importação da interface (até a primeira página) e carga das referências
+    pela tabela binária e pelo CSV com pandas, cada uma em interpretadores novos (melhor tempo)
+    """
+    _medir_em_processo_novo(_MEDICOES_PARTIDA['referencias_tabela'])  # Compila as tabelas, se preciso
+    medicoes = {}
+    for nome, codigo in _MEDICOES_PARTIDA.items():
+        execucoes = [_medir_em_processo_novo(codigo) for _ in range(max(repeticoes, 1))]
+        melhor = min(execucoes, key=lambda execucao: execucao['segundos'])
+        medicoes[nome] = {
+            'segundos': round(melhor['segundos'], 6),
+            'modulos_pesados': melhor['modulos'],
+        }
+        print(f"🚀 {nome:<22} {melhor['segundos']:9.3f}s  módulos pesados: {', '.join(melhor['modulos']) or 'nenhum'}")
+    return medicoes
+
+
+def executar_benchmark(registros=100000, companhias=20, aeroportos=200, semente=42, etapas=None,
+                       repeticoes=1, medir_memoria=True):
+    """Executa as etapas selecionadas e retorna o relatório (dict serializável em JSON)"""
+    etapas = set(etapas or ETAPAS)
+    medicoes = {}
+
+    linhas = list(gerar_temporada(registros, companhias, aeroportos, semente))
+    payload = gerar_payload(linhas)
+    dados_json = [{'ssimfile': linha} for linha in linhas]
+    del linhas
+    print(f"🧪 Temporada sintética: {registros} registros 3, {len(payload) / 1e6:.1f} MB de payload")
+
+    def medir(nome, funcao, quantidade=registros, bytes_processados=None):
+        if nome not in etapas:
+            return None
+        resultado, medicoes[nome] = medir_etapa(
+            nome, funcao, quantidade, bytes_processados, repeticoes, medir_memoria
+        )
+        return resultado
+
+    medir(
+        'decodificacao',
+        lambda: list(decodificar_blocos(
+            payload[inicio:inicio + TAMANHO_BLOCO_PAYLOAD]
+            for inicio in range(0, len(payload), TAMANHO_BLOCO_PAYLOAD)
+        )),
+        bytes_processados=len(payload)
+    )
+    # Libera o payload (None e não del: a função medida acima ainda referencia o nome)
+    payload = None
+
+    medir('extracao_companhias', lambda: extrair_companhias_do_ssim(dados_json))
+    indice_temporada = indexar_temporada(dados_json)
+    medir('indexacao', lambda: indexar_temporada(dados_json))
+
+    # Filtragem da companhia com mais voos, percorrendo a temporada inteira
+    contagem = indice_temporada.contagem_por_companhia()
+    companhia_principal = max(contagem, key=contagem.get) if contagem else 'TODAS'
+    medir(
+        'filtragem',
+        lambda: selecionar_linhas_companhia(dados_json, companhia_principal),
+        quantidade=len(dados_json)
+    )
+
+    linhas_header = list(indice_temporada.linhas_header)
+    linhas3 = list(indice_temporada.linhas_companhia(dados_json, 'TODAS'))
+    bytes_linhas3 = sum(len(linha) for linha in linhas3)
+
+    df_airports = carregar_aeroportos()
+    medir(
+        'conversao_horario',
+        lambda: transformar_linhas3(linhas3, df_airports, converter_para_brasilia=True),
+        bytes_processados=bytes_linhas3
+    )
+    medir(
+        'adaptacao_gol',
+        lambda: transformar_linhas3(linhas3, adaptar_ssim_gol=True),
+        bytes_processados=bytes_linhas3
+    )
+    medir(
+        'renumeracao',
+        lambda: collections.deque(gerar_linhas_arquivo_ssim(linhas_header, linhas3, 'TODAS'), maxlen=0),
+        bytes_processados=bytes_linhas3
+    )
+
+    diretorio = tempfile.mkdtemp(prefix='benchmark_ssim_')
+    try:
+        for nome, compressao, extensao in (('serializacao', None, '.ssim'), ('serializacao_gzip', 'gzip', '.ssim.gz')):
+            caminho = os.path.join(diretorio, 'TODAS' + extensao)
+            medir(
+                nome,
+                lambda: gravar_arquivo_ssim(
+                    gerar_linhas_arquivo_ssim(linhas_header, linhas3, 'TODAS'), caminho, compressao
+                ),
+                bytes_processados=bytes_linhas3
+            )
+    finally:
+        shutil.rmtree(diretorio, ignore_errors=True)
+
+    return {
+        'versao': VERSAO_RELATORIO,
+        'executado_em': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'plataforma': platform.platform(),
+        'parametros': {
+            'registros': registros,
+            'companhias': companhias,
+            'aeroportos': aeroportos,
+            'semente': semente,
+            'repeticoes': repeticoes,
+        },
+        'etapas': medicoes,
+    }
+
+
+def comparar_relatorios(anterior, atual):
+    """Imprime a variação de tempo e memória de cada etapa entre dois relatórios"""
+    if anterior.get('parametros') != atual.get('parametros'):
+        print("⚠️ Parâmetros diferentes entre os relatórios; a comparação é apenas indicativa")
+    print(f"{'Etapa':<22} {'Antes (s)':>10} {'Depois (s)':>11} {'Variação':>9} {'Memória (MB)':>20}")
+    for nome, medicao in atual['etapas'].items():
+        antes = anterior.get('etapas', {}).get(nome)
+        if not antes:
+            continue
+        variacao = (medicao['segundos'] / antes['segundos'] - 1) * 100 if antes['segundos'] else 0.0
+        memoria = ""
+        if antes.get('pico_memoria_mb') is not None and medicao.get('pico_memoria_mb') is not None:
+            memoria = f"{antes['pico_memoria_mb']:.1f} → {medicao['pico_memoria_mb']:.1f}"
+        print(f"{nome:<22} {antes['segundos']:>10.3f} {medicao['segundos']:>11.3f} {variacao:>+8.1f}% {memoria:>20}")
+    for nome, medicao in atual.get('partida', {}).items():
+        antes = anterior.get('partida', {}).get(nome)
+        if antes and antes['segundos']:
+            variacao = (medicao['segundos'] / antes['segundos'] - 1) * 100
+            print(f"{nome:<22} {antes['segundos']:>10.3f} {medicao['segundos']:>11.3f} {variacao:>+8.1f}%")
+
+
+def criar_parser():
+    parser = argparse.ArgumentParser(description="Benchmark das etapas do Gerador SSIM com dados sintéticos.")
+    parser.add_argument('--registros', type=int, default=100000, help="Registros 3 da temporada (padrão: 100000)")
+    parser.add_argument('--companhias', type=int, default=20, help="Número de companhias (padrão: 20)")
+    parser.add_argument('--aeroportos', type=int, default=200, help="Número de aeroportos (padrão: 200)")
+    parser.add_argument('--semente', type=int, default=42, help="Semente do gerador (padrão: 42)")
+    parser.add_argument('--etapas', nargs='+', choices=ETAPAS, help="Mede apenas estas etapas")
+    parser.add_argument('--repeticoes', type=int, default=1, help="Repetições por etapa (vale o melhor tempo)")
+    parser.add_argument('--sem-memoria', action='store_true', help="Não mede o pico de memória (mais rápido)")
+    parser.add_argument('--saida', default='benchmark_ssim.json', help="Arquivo JSON do relatório")
+    parser.add_argument('--comparar', metavar='JSON', help="Relatório anterior para comparação")
+    parser.add_argument('--partida', action='store_true',
+                        help="Mede também a partida a frio (importação da interface e carga das referências)")
+    return parser
+
+
+def main(argv=None):
+    args = criar_parser().parse_args(argv)
+    relatorio = executar_benchmark(
+        registros=args.registros,
+        companhias=args.companhias,
+        aeroportos=args.aeroportos,
+        semente=args.semente,
+        etapas=args.etapas,
+        repeticoes=args.repeticoes,
+        medir_memoria=not args.sem_memoria,
+    )
+    if args.partida:
+        relatorio['partida'] = medir_partida(args.repeticoes)
+
+    with open(args.saida, 'w', encoding='utf-8') as arquivo:
+        json.dump(relatorio, arquivo, ensure_ascii=False, indent=2)
+    print(f"💾 Relatório salvo em '{args.saida}'")
+
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as arquivo:
+            comparar_relatorios(json.load(arquivo), relatorio)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
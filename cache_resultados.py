@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+# Gerador SSIM - Cache de resultados em memória
+# Linhas já filtradas e transformadas por (temporada, companhia, opções), com descarte LRU
+# limitado em bytes e um único cálculo por chave mesmo com várias sessões pedindo ao mesmo tempo
+
+import threading
+from collections import OrderedDict, namedtuple
+
+from instrumentacao import contar
+
+LIMITE_BYTES_PADRAO = 512 * 1024 * 1024
+SOBRECARGA_POR_LINHA = 57  # Cabeçalho de um str ASCII (49 bytes) + ponteiro na tupla (8 bytes)
+
+ResultadoFiltragem = namedtuple(
+    'ResultadoFiltragem',
+    ['linhas_header', 'linhas_filtradas', 'estatisticas_aeroportos']
+)
+
+
+def tamanho_linhas(linhas):
+    """Estimativa dos bytes ocupados em memória por uma sequência de linhas"""
+    return sum(map(len, linhas)) + SOBRECARGA_POR_LINHA * len(linhas)
+
+
+def tamanho_resultado(resultado):
+    """Estimativa dos bytes ocupados por um ResultadoFiltragem"""
+    return tamanho_linhas(resultado.linhas_header) + tamanho_linhas(resultado.linhas_filtradas)
+
+
+class _Calculo:
+    """Cálculo em andamento de uma chave, aguardado pelas demais requisições"""
+
+    def __init__(self):
+        self.concluido = threading.Event()
+        self.valor = None
+        self.erro = None
+        self.interrompido = False
+
+
+class CacheResultados:
+    """
+    Cache LRU thread-safe de resultados imutáveis, limitado pelo total estimado de bytes.
+
+    `obter(chave, calcular)` devolve o valor em cache ou chama `calcular()`; requisições
+    simultâneas da mesma chave esperam o primeiro cálculo em vez de repeti-lo (e, se ele
+    falhar com uma Exception, recebem o mesmo erro: a falha não é recalculada uma vez por
+    requisição). Interrupções (KeyboardInterrupt, SystemExit, controle de fluxo do Streamlit)
+    sobem só na thread que calculava; quem esperava calcula de novo.
+    """
+
+    def __init__(self, limite_bytes=LIMITE_BYTES_PADRAO, medir=tamanho_resultado):
+        self.limite_bytes = limite_bytes
+        self.medir = medir
+        self._lock = threading.Lock()
+        self._entradas = OrderedDict()  # chave -> (valor, bytes), da menos para a mais recente
+        self._em_andamento = {}
+        self.total_bytes = 0
+        self.acertos = 0
+        self.falhas = 0
+        self.compartilhados = 0
+        self.erros_compartilhados = 0
+        self.descartes = 0
+
+    def __len__(self):
+        return len(self._entradas)
+
+    def __contains__(self, chave):
+        with self._lock:
+            return chave in self._entradas
+
+    def obter(self, chave, calcular):
+        """Valor da chave, calculado uma única vez e mantido enquanto couber no limite"""
+        while True:
+            with self._lock:
+                entrada = self._entradas.get(chave)
+                if entrada is not None:
+                    self._entradas.move_to_end(chave)
+                    self.acertos += 1
+                    contar('cache_resultados.acertos')
+                    return entrada[0]
+
+                calculo = self._em_andamento.get(chave)
+                responsavel = calculo is None
+                if responsavel:
+                    calculo = self._em_andamento[chave] = _Calculo()
+                    self.falhas += 1
+                    contar('cache_resultados.falhas')
+
+            if responsavel:
+                break
+            calculo.concluido.wait()
+            if calculo.interrompido:
+                # A thread que calculava foi interrompida: a chave é calculada de novo
+                continue
+            if calculo.erro is not None:
+                # O cálculo compartilhado falhou: quem já esperava recebe o mesmo erro
+                with self._lock:
+                    self.erros_compartilhados += 1
+                contar('cache_resultados.erros_compartilhados')
+                raise calculo.erro
+            with self._lock:
+                self.compartilhados += 1
+            contar('cache_resultados.compartilhados')
+            return calculo.valor
+
+        try:
+            calculo.valor = calcular()
+        except Exception as erro:
+            calculo.erro = erro
+            raise
+        except BaseException:
+            calculo.interrompido = True
+            raise
+        else:
+            self._guardar(chave, calculo.valor)
+        finally:
+            with self._lock:
+                del self._em_andamento[chave]
+            calculo.concluido.set()
+        return calculo.valor
+
+    def _guardar(self, chave, valor):
+        """Insere o valor e descarta os menos usados recentemente até caber no limite"""
+        tamanho = self.medir(valor)
+        if tamanho > self.limite_bytes:
+            # Maior que o cache inteiro: devolvido sem guardar
+            return
+        with self._lock:
+            anterior = self._entradas.pop(chave, None)
+            if anterior is not None:
+                self.total_bytes -= anterior[1]
+            self._entradas[chave] = (valor, tamanho)
+            self.total_bytes += tamanho
+            while self.total_bytes > self.limite_bytes:
+                _, (_, tamanho_descartado) = self._entradas.popitem(last=False)
+                self.total_bytes -= tamanho_descartado
+                self.descartes += 1
+                contar('cache_resultados.descartes')
+
+    def limpar(self):
+        with self._lock:
+            self._entradas.clear()
+            self.total_bytes = 0
+
+    def estatisticas(self):
+        """Resumo do uso do cache"""
+        with self._lock:
+            return {
+                'entradas': len(self._entradas),
+                'bytes': self.total_bytes,
+                'limite_bytes': self.limite_bytes,
+                'acertos': self.acertos,
+                'falhas': self.falhas,
+                'compartilhados': self.compartilhados,
+                'erros_compartilhados': self.erros_compartilhados,
+                'descartes': self.descartes,
+            }
@@ -0,0 +1,342 @@
+# -*- coding: utf-8 -*-
+# Gerador SSIM - Cache local de temporadas em disco
+# Linhas brutas comprimidas + metadados por temporada, com atualização condicional
+
+import gzip
+import hashlib
+import itertools
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+from temporada import indexar_temporada
+from temporada_compacta import (
+    TemporadaCompacta, gravar_temporada, abrir_temporada,
+    remover_arquivos_temporada, tamanho_arquivos_temporada,
+)
+
+DIRETORIO_PADRAO = os.environ.get(
+    'GERADOR_SSIM_CACHE',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache_ssim')
+)
+IDADE_MAXIMA_PADRAO = 6 * 3600          # Depois disso a temporada é revalidada na API
+LIMITE_BYTES_PADRAO = 256 * 1024 * 1024  # Tamanho máximo do cache em disco
+
+
+def _nome_seguro(temporada):
+    """Nome de arquivo seguro para a temporada (ex: W25)"""
+    return re.sub(r'[^A-Za-z0-9_-]', '_', temporada.strip())
+
+
+class CacheTemporadas:
+    """
+    Armazena cada temporada em `<temporada>.ssim.gz` (uma linha SSIM por linha) com
+    um `<temporada>.json` de metadados: data do download, hash do conteúdo, número
+    de registros, tamanho e último acesso. O conteúdo sobrevive a reinícios do processo.
+    Quando a API publica outro conteúdo, a versão substituída fica em
+    `<temporada>.anterior.ssim.gz` (metadados em 'anterior'), para comparação.
+
+    `carregar_mapeada` mantém ao lado uma cópia em registros de 200 bytes
+    (`<temporada>.registros` + `<temporada>.indice.npz`), aberta com mmap.
+    """
+
+    def __init__(self, diretorio=DIRETORIO_PADRAO, idade_maxima=IDADE_MAXIMA_PADRAO,
+                 limite_bytes=LIMITE_BYTES_PADRAO):
+        self.diretorio = diretorio
+        self.idade_maxima = idade_maxima
+        self.limite_bytes = limite_bytes
+        self._lock = threading.Lock()
+        self._atualizando = set()
+        os.makedirs(self.diretorio, exist_ok=True)
+
+    # --- Arquivos ---
+    def _caminho_dados(self, temporada):
+        return os.path.join(self.diretorio, f"{_nome_seguro(temporada)}.ssim.gz")
+
+    def _caminho_anterior(self, temporada):
+        return os.path.join(self.diretorio, f"{_nome_seguro(temporada)}.anterior.ssim.gz")
+
+    def _caminho_metadados(self, temporada):
+        return os.path.join(self.diretorio, f"{_nome_seguro(temporada)}.json")
+
+    def _caminho_mapeado(self, temporada):
+        return os.path.join(self.diretorio, _nome_seguro(temporada))
+
+    def _gravar_metadados(self, temporada, metadados):
+        destino = self._caminho_metadados(temporada)
+        descritor, temporario = tempfile.mkstemp(dir=self.diretorio, suffix='.json.tmp')
+        with os.fdopen(descritor, 'w', encoding='utf-8') as arquivo:
+            json.dump(metadados, arquivo, ensure_ascii=False, indent=2)
+        os.replace(temporario, destino)
+
+    # --- Consulta ---
+    def metadados(self, temporada):
+        """Metadados da temporada em cache (ou None)"""
+        try:
+            with open(self._caminho_metadados(temporada), encoding='utf-8') as arquivo:
+                metadados = json.load(arquivo)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        if not os.path.exists(self._caminho_dados(temporada)):
+            return None
+        return metadados
+
+    def listar(self):
+        """Metadados de todas as temporadas em cache"""
+        temporadas = []
+        for nome in sorted(os.listdir(self.diretorio)):
+            if nome.endswith('.json'):
+                metadados = self.metadados(nome[:-len('.json')])
+                if metadados:
+                    temporadas.append(metadados)
+        return temporadas
+
+    def tamanho_total(self):
+        """Bytes ocupados pelas temporadas em cache"""
+        return sum(self._tamanho_em_disco(metadados) for metadados in self.listar())
+
+    def _tamanho_em_disco(self, metadados):
+        """Arquivo comprimido + versão anterior + cópia mapeável da temporada"""
+        anterior = metadados.get('anterior') or {}
+        return metadados.get('tamanho_bytes', 0) + anterior.get('tamanho_bytes', 0) + tamanho_arquivos_temporada(
+            self._caminho_mapeado(metadados['temporada'])
+        )
+
+    def expirado(self, metadados):
+        """Indica se a temporada passou da idade máxima e deve ser revalidada"""
+        return time.time() - metadados.get('baixado_em_epoch', 0) > self.idade_maxima
+
+    def carregar(self, temporada):
+        """Retorna (linhas, metadados) da temporada em cache, ou (None, None)"""
+        metadados = self.metadados(temporada)
+        if metadados is None:
+            return None, None
+        linhas = self._ler_linhas(self._caminho_dados(temporada))
+        if linhas is None:
+            # Arquivo corrompido ou truncado: descarta e força novo download
+            self.remover(temporada)
+            return None, None
+
+        metadados['ultimo_acesso_epoch'] = time.time()
+        self._gravar_metadados(temporada, metadados)
+        return linhas, metadados
+
+    def carregar_anterior(self, temporada):
+        """Retorna (linhas, metadados) da versão substituída pelo último download, ou (None, None)"""
+        metadados = self.metadados(temporada)
+        anterior = metadados.get('anterior') if metadados else None
+        if not anterior:
+            return None, None
+        linhas = self._ler_linhas(self._caminho_anterior(temporada))
+        if linhas is None:
+            return None, None
+        return linhas, anterior
+
+    @staticmethod
+    def _ler_linhas(caminho):
+        """Linhas de um arquivo .ssim.gz do cache (None se ausente, corrompido ou truncado)"""
+        try:
+            with gzip.open(caminho, 'rt', encoding='utf-8', newline='\n') as arquivo:
+                conteudo = arquivo.read()
+        except (OSError, EOFError):
+            return None
+        return conteudo.split('\n') if conteudo else []
+
+    @staticmethod
+    def _iterar_linhas(caminho):
+        """Linhas de um arquivo .ssim.gz do cache, uma a uma (OSError/EOFError se corrompido ou truncado)"""
+        with gzip.open(caminho, 'rt', encoding='utf-8', newline='\n') as arquivo:
+            linha = None
+            for linha in arquivo:
+                yield linha[:-1] if linha.endswith('\n') else linha
+            if linha is not None and linha.endswith('\n'):
+                yield ''  # Última linha vazia (mesmo resultado de split('\n'))
+
+    def carregar_mapeada(self, temporada):
+        """
+        Retorna (TemporadaCompacta mapeada com mmap, metadados), ou (None, None).
+        Na primeira vez (ou se o conteúdo em cache mudou) grava os registros de 200 bytes e o
+        índice lateral a partir do arquivo comprimido; depois a abertura não decodifica nada.
+        """
+        metadados = self.metadados(temporada)
+        if metadados is None:
+            return None, None
+        caminho = self._caminho_mapeado(temporada)
+
+        mapeada = None
+        try:
+            mapeada = abrir_temporada(caminho)
+        except (OSError, ValueError, KeyError):
+            pass
+        if mapeada is not None and mapeada.indice_arquivo['origem'] == metadados.get('hash'):
+            metadados['ultimo_acesso_epoch'] = time.time()
+            self._gravar_metadados(temporada, metadados)
+            return mapeada, metadados
+
+        # Registros lidos do arquivo comprimido direto para o buffer compacto (sem a lista de linhas)
+        try:
+            compacta = TemporadaCompacta.de_linhas(self._iterar_linhas(self._caminho_dados(temporada)))
+        except (OSError, EOFError):
+            # Arquivo corrompido ou truncado: descarta e força novo download
+            self.remover(temporada)
+            return None, None
+        metadados['ultimo_acesso_epoch'] = time.time()
+        self._gravar_metadados(temporada, metadados)
+        gravar_temporada(compacta, indexar_temporada(compacta), caminho, origem=metadados.get('hash'))
+        return abrir_temporada(caminho), metadados
+
+    # --- Escrita ---
+    def salvar(self, temporada, linhas, etag=None, last_modified=None):
+        """
+        Grava as linhas da temporada (substituição atômica) e aplica o limite de tamanho.
+        Retorna os metadados, ou None se alguma linha não puder ser armazenada.
+        Se o conteúdo for idêntico ao já armazenado, apenas renova a data do download.
+        """
+        descritor, temporario = tempfile.mkstemp(dir=self.diretorio, suffix='.ssim.gz.tmp')
+        os.close(descritor)
+        hash_conteudo = hashlib.sha256()
+        registros = 0
+        try:
+            with gzip.open(temporario, 'wt', encoding='utf-8', newline='\n') as arquivo:
+                for linha in linhas:
+                    if not isinstance(linha, str) or '\n' in linha or '\r' in linha:
+                        raise ValueError("Linha SSIM não armazenável no cache")
+                    texto = linha if registros == 0 else '\n' + linha
+                    arquivo.write(texto)
+                    hash_conteudo.update(texto.encode('utf-8'))
+                    registros += 1
+        except ValueError:
+            os.remove(temporario)
+            return None
+        except BaseException:
+            # Falha durante o download: não deixa arquivo temporário para trás
+            os.remove(temporario)
+            raise
+
+        agora = time.time()
+        anteriores = self.metadados(temporada)
+        metadados = {
+            'temporada': temporada,
+            'baixado_em': datetime.fromtimestamp(agora).isoformat(timespec='seconds'),
+            'baixado_em_epoch': agora,
+            'ultimo_acesso_epoch': agora,
+            'hash': hash_conteudo.hexdigest(),
+            'registros': registros,
+            'tamanho_bytes': os.path.getsize(temporario),
+            'etag': etag,
+            'last_modified': last_modified,
+            'alterado_em': agora,
+        }
+        with self._lock:
+            if anteriores and anteriores.get('hash') == metadados['hash']:
+                os.remove(temporario)
+                metadados['alterado_em'] = anteriores.get('alterado_em', agora)
+                metadados['anterior'] = anteriores.get('anterior')
+            else:
+                if anteriores:
+                    # Conteúdo novo: a versão substituída é guardada para comparação
+                    os.replace(self._caminho_dados(temporada), self._caminho_anterior(temporada))
+                    metadados['anterior'] = {
+                        chave: anteriores.get(chave)
+                        for chave in ('baixado_em', 'alterado_em', 'hash', 'registros', 'tamanho_bytes')
+                    }
+                os.replace(temporario, self._caminho_dados(temporada))
+            self._gravar_metadados(temporada, metadados)
+            self._aplicar_limite(preservar=temporada)
+        return metadados
+
+    def renovar(self, temporada, etag=None, last_modified=None):
+        """Marca a temporada como revalidada (conteúdo inalterado na API)"""
+        metadados = self.metadados(temporada)
+        if metadados is None:
+            return None
+        agora = time.time()
+        metadados['baixado_em'] = datetime.fromtimestamp(agora).isoformat(timespec='seconds')
+        metadados['baixado_em_epoch'] = agora
+        metadados['etag'] = etag or metadados.get('etag')
+        metadados['last_modified'] = last_modified or metadados.get('last_modified')
+        self._gravar_metadados(temporada, metadados)
+        return metadados
+
+    def remover(self, temporada):
+        """Remove a temporada do cache"""
+        for caminho in (self._caminho_dados(temporada), self._caminho_anterior(temporada),
+                        self._caminho_metadados(temporada)):
+            try:
+                os.remove(caminho)
+            except FileNotFoundError:
+                pass
+        remover_arquivos_temporada(self._caminho_mapeado(temporada))
+
+    def _aplicar_limite(self, preservar=None):
+        """Remove as temporadas acessadas há mais tempo até caber no limite de bytes"""
+        temporadas = sorted(self.listar(), key=lambda m: m.get('ultimo_acesso_epoch', 0))
+        tamanhos = [self._tamanho_em_disco(m) for m in temporadas]
+        total = sum(tamanhos)
+        for metadados, tamanho in zip(temporadas, tamanhos):
+            if total <= self.limite_bytes:
+                break
+            if metadados['temporada'] == preservar:
+                continue
+            self.remover(metadados['temporada'])
+            total -= tamanho
+
+    # --- Atualização ---
+    def atualizar(self, temporada, baixar):
+        """
+        Revalida a temporada na API. `baixar(temporada, cabecalhos, info)` deve gerar as
+        linhas SSIM e preencher `info` com 'status', 'etag' e 'last_modified'
+        (status 304 = inalterado). Retorna 'inalterado', 'atualizado' ou 'erro'.
+        """
+        anteriores = self.metadados(temporada) or {}
+        cabecalhos = {}
+        if anteriores.get('etag'):
+            cabecalhos['If-None-Match'] = anteriores['etag']
+        if anteriores.get('last_modified'):
+            cabecalhos['If-Modified-Since'] = anteriores['last_modified']
+
+        info = {}
+        linhas = iter(baixar(temporada, cabecalhos, info))
+        # A requisição só acontece na primeira leitura; depois dela `info` está preenchido
+        primeira = next(linhas, None)
+        if info.get('status') == 304:
+            self.renovar(temporada, info.get('etag'), info.get('last_modified'))
+            return 'inalterado'
+
+        if primeira is not None:
+            linhas = itertools.chain([primeira], linhas)
+        metadados = self.salvar(temporada, linhas, info.get('etag'), info.get('last_modified'))
+        if metadados is None:
+            return 'erro'
+        if anteriores.get('hash') == metadados['hash']:
+            return 'inalterado'
+        return 'atualizado'
+
+    def atualizar_em_segundo_plano(self, temporada, baixar):
+        """Dispara a revalidação da temporada em uma thread (uma por temporada)"""
+        with self._lock:
+            if temporada in self._atualizando:
+                return False
+            self._atualizando.add(temporada)
+
+        def executar():
+            try:
+                self.atualizar(temporada, baixar)
+            except Exception:
+                # Falha na revalidação: a cópia em disco continua válida
+                pass
+            finally:
+                with self._lock:
+                    self._atualizando.discard(temporada)
+
+        threading.Thread(target=executar, name=f"cache-ssim-{temporada}", daemon=True).start()
+        return True
+
+    def atualizando(self, temporada):
+        """Indica se há revalidação em andamento para a temporada"""
+        with self._lock:
+            return temporada in self._atualizando
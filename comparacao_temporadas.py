@@ -0,0 +1,236 @@
+# -*- coding: utf-8 -*-
+# Gerador SSIM - Comparação entre duas versões da mesma temporada
+# Registros 3 casados por chave (companhia, voo, itinerário/perna e período) com ordenação e
+# intersecção das chaves; os conteúdos são comparados em lotes direto na matriz de bytes
+
+from collections import Counter
+
+import numpy as np
+
+from parser_ssim import TAMANHO_LOTE, CAMPOS_LINHA3, matriz_caracteres
+from temporada import indexar_temporada
+from temporada_compacta import TemporadaCompacta
+from filtros_voos import obter_indice_filtros
+from gerador_ssim import gerar_linhas_arquivo_ssim
+from paralelo_ssim import transformar_posicoes_paralelo
+from instrumentacao import etapa, contar, modulo_sob_demanda
+
+pd = modulo_sob_demanda('pandas')
+
+# Chave do registro: sufixo, companhia, voo, variação de itinerário, perna e período
+_CAMPOS_CHAVE = [
+    'sufixo_operacional', 'companhia', 'numero_voo', 'variacao_itinerario', 'sequencia_perna',
+    'periodo_inicio', 'periodo_fim',
+]
+_COLUNAS_CHAVE = np.concatenate([np.arange(*CAMPOS_LINHA3[campo]) for campo in _CAMPOS_CHAVE])
+# Número do registro é a posição da linha no arquivo: fica fora da comparação
+_FIM_CONTEUDO = CAMPOS_LINHA3['numero_registro'][0]
+CAMPOS_COMPARADOS = [
+    campo for campo, (inicio, fim) in CAMPOS_LINHA3.items()
+    if campo not in _CAMPOS_CHAVE and fim <= _FIM_CONTEUDO
+]
+_OUTRAS_COLUNAS = np.setdiff1d(
+    np.arange(1, _FIM_CONTEUDO),
+    np.concatenate([_COLUNAS_CHAVE] + [np.arange(*CAMPOS_LINHA3[campo]) for campo in CAMPOS_COMPARADOS])
+)
+CAMPO_OUTROS = 'outros'  # Colunas sem campo nomeado no parser
+
+SITUACOES = ['incluidos', 'removidos', 'alterados']
+ARQUIVOS_DELTA = {
+    'DELTA': "Registros incluídos e alterados (versão atual)",
+    'REMOVIDOS': "Registros que deixaram de existir (versão anterior)",
+}
+
+
+class _Versao:
+    """Registros 3 de uma versão da temporada: posições, chaves e códigos de companhia"""
+
+    def __init__(self, dados_json, indice_temporada=None):
+        self.dados = dados_json
+        self.compacta = TemporadaCompacta.de_dados_api(dados_json)
+        if indice_temporada is None:
+            indice_temporada = self.compacta.indice or indexar_temporada(self.compacta)
+        self.indice = indice_temporada
+        self.posicoes = np.asarray(indice_temporada.posicoes_linha3, dtype=np.int64)
+        self.chaves = self._chaves()
+        # Código da companhia como no índice da temporada (posições 2-4, sem espaços)
+        codigos = np.char.strip(self.compacta.companhias[self.posicoes])
+        valores, self.codigo_companhia = np.unique(codigos, return_inverse=True)
+        self.companhias = np.array([valor.decode('utf-8', errors='replace') for valor in valores], dtype=object)
+
+    def matriz(self, indices):
+        """Linhas (n, 200) dos registros 3 de índices `indices` (na ordem de `posicoes`)"""
+        posicoes = self.posicoes[indices]
+        matriz = self.compacta.registros[posicoes]
+        if self.compacta.extras:
+            # Linhas com mais de 200 bytes ficam fora do buffer: montadas à parte
+            fora = [k for k, posicao in enumerate(posicoes.tolist()) if posicao in self.compacta.extras]
+            if fora:
+                matriz[fora] = matriz_caracteres([self.compacta.linha(int(posicoes[k])) for k in fora])
+        return matriz
+
+    def _chaves(self):
+        """
+        Chave de cada registro (colunas da chave + ocorrência, para chaves repetidas na mesma
+        versão), como bytes de tamanho fixo comparáveis e ordenáveis pelo NumPy
+        """
+        partes = []
+        for inicio in range(0, len(self.posicoes), TAMANHO_LOTE):
+            indices = np.arange(inicio, min(inicio + TAMANHO_LOTE, len(self.posicoes)))
+            partes.append(np.ascontiguousarray(self.matriz(indices)[:, _COLUNAS_CHAVE]))
+        largura = len(_COLUNAS_CHAVE)
+        chaves = np.concatenate(partes) if partes else np.empty((0, largura), dtype=np.uint8)
+        simples = chaves.view(f'S{largura}').ravel()
+
+        # k-ésima ocorrência da chave na versão (0 para chaves únicas)
+        ordem = np.argsort(simples, kind='stable')
+        ordenadas = simples[ordem]
+        sequencia = np.arange(len(ordenadas))
+        novo_grupo = np.ones(len(ordenadas), dtype=bool)
+        novo_grupo[1:] = ordenadas[1:] != ordenadas[:-1]
+        ocorrencia = np.empty(len(ordenadas), dtype='>u4')
+        ocorrencia[ordem] = sequencia - np.maximum.accumulate(np.where(novo_grupo, sequencia, 0))
+
+        completas = np.concatenate([chaves, ocorrencia.view(np.uint8).reshape(-1, 4)], axis=1)
+        return np.ascontiguousarray(completas).view(f'S{largura + 4}').ravel()
+
+    def contagem(self, indices):
+        """Registros por código de companhia entre os índices"""
+        return np.bincount(self.codigo_companhia[indices], minlength=len(self.companhias))
+
+    def da_companhia(self, indices, codigo_companhia):
+        """Índices (de `indices`) dos registros da companhia ("TODAS" para todos)"""
+        if codigo_companhia == "TODAS":
+            return indices
+        encontrados = np.flatnonzero(self.companhias == codigo_companhia)
+        if not len(encontrados):
+            return indices[:0]
+        return indices[self.codigo_companhia[indices] == encontrados[0]]
+
+
+class ComparacaoTemporadas:
+    """
+    Diferenças entre duas versões da mesma temporada.
+
+    Registros com a mesma chave nas duas versões são `alterados` se algum campo (fora o
+    número do registro) mudou; chaves só da versão atual são `incluidos` e só da anterior,
+    `removidos`. Mudança de período conta como remoção + inclusão (o período faz parte da chave).
+    Os índices guardados são relativos aos registros 3 de cada versão (`_Versao.posicoes`).
+    """
+
+    def __init__(self, anterior, atual):
+        self.anterior = anterior
+        self.atual = atual
+        with etapa('comparacao', linhas=len(anterior.posicoes) + len(atual.posicoes)):
+            _, indices_anterior, indices_atual = np.intersect1d(
+                anterior.chaves, atual.chaves, assume_unique=True, return_indices=True
+            )
+            self.removidos = np.setdiff1d(np.arange(len(anterior.chaves)), indices_anterior, assume_unique=True)
+            self.incluidos = np.setdiff1d(np.arange(len(atual.chaves)), indices_atual, assume_unique=True)
+
+            # Conteúdo dos pares casados comparado em lotes, campo a campo
+            diferencas = []
+            for inicio in range(0, len(indices_atual), TAMANHO_LOTE):
+                fatia = slice(inicio, inicio + TAMANHO_LOTE)
+                diferentes = anterior.matriz(indices_anterior[fatia]) != atual.matriz(indices_atual[fatia])
+                por_campo = [diferentes[:, slice(*CAMPOS_LINHA3[campo])].any(axis=1) for campo in CAMPOS_COMPARADOS]
+                por_campo.append(diferentes[:, _OUTRAS_COLUNAS].any(axis=1))
+                diferencas.append(np.column_stack(por_campo))
+            diferencas = np.concatenate(diferencas) if diferencas else np.empty((0, len(CAMPOS_COMPARADOS) + 1), dtype=bool)
+
+            alterados = diferencas.any(axis=1)
+            self.alterados_anterior = indices_anterior[alterados]
+            self.alterados = indices_atual[alterados]
+            self.diferencas = diferencas[alterados]  # Campos alterados de cada registro alterado
+            self.inalterados = int(len(indices_atual) - alterados.sum())
+        for situacao in SITUACOES:
+            contar(f'comparacao.{situacao}', len(getattr(self, situacao)))
+
+    @property
+    def vazia(self):
+        """Versões com os mesmos registros 3"""
+        return not (len(self.incluidos) or len(self.removidos) or len(self.alterados))
+
+    def campos_alterados(self):
+        """Número de registros alterados por campo"""
+        nomes = CAMPOS_COMPARADOS + [CAMPO_OUTROS]
+        return Counter({nome: int(total) for nome, total in zip(nomes, self.diferencas.sum(axis=0)) if total})
+
+    def resumo(self):
+        """Incluídos, removidos, alterados e inalterados por companhia"""
+        companhias = sorted(set(self.anterior.companhias) | set(self.atual.companhias))
+        tabela = pd.DataFrame(0, index=pd.Index(companhias, name='companhia'), columns=SITUACOES + ['inalterados'])
+        for situacao, versao, indices in (
+            ('incluidos', self.atual, self.incluidos),
+            ('removidos', self.anterior, self.removidos),
+            ('alterados', self.atual, self.alterados),
+        ):
+            tabela.loc[versao.companhias, situacao] = versao.contagem(indices)
+        tabela['inalterados'] = 0
+        tabela.loc[self.atual.companhias, 'inalterados'] = self.atual.contagem(np.arange(len(self.atual.posicoes)))
+        tabela['inalterados'] -= tabela['incluidos'] + tabela['alterados']
+        tabela = tabela[(tabela[SITUACOES].sum(axis=1) > 0) | (tabela['inalterados'] > 0)]
+        return tabela.reset_index()
+
+    def posicoes_delta(self, codigo_companhia="TODAS"):
+        """Posições (na versão atual) dos registros incluídos e alterados, na ordem original"""
+        indices = np.sort(np.concatenate([self.incluidos, self.alterados]))
+        return self.atual.posicoes[self.atual.da_companhia(indices, codigo_companhia)]
+
+    def posicoes_removidas(self, codigo_companhia="TODAS"):
+        """Posições (na versão anterior) dos registros removidos"""
+        return self.anterior.posicoes[self.anterior.da_companhia(self.removidos, codigo_companhia)]
+
+    def registros(self, codigo_companhia="TODAS", limite=None):
+        """Tabela das diferenças (uma linha por registro) com a chave e os campos alterados"""
+        nomes = np.array(CAMPOS_COMPARADOS + [CAMPO_OUTROS], dtype=object)
+        partes = []
+        for situacao, versao, indices in (
+            ('incluido', self.atual, self.incluidos),
+            ('removido', self.anterior, self.removidos),
+            ('alterado', self.atual, self.alterados),
+        ):
+            selecionados = versao.da_companhia(indices, codigo_companhia)
+            if situacao == 'alterado':
+                linhas_diferencas = self.diferencas[np.isin(indices, selecionados)]
+            if limite is not None:
+                selecionados = selecionados[:limite]
+            linhas = versao.compacta.linhas(versao.posicoes[selecionados])
+            tabela = pd.DataFrame({
+                'situacao': situacao,
+                'companhia': [linha[2:4].strip() for linha in linhas],
+                'numero_voo': [linha[5:9].strip() for linha in linhas],
+                'itinerario': [linha[9:11] for linha in linhas],
+                'perna': [linha[11:13] for linha in linhas],
+                'periodo': [f"{linha[14:21]}-{linha[21:28]}" for linha in linhas],
+                'campos': '',
+            })
+            if situacao == 'alterado':
+                tabela['campos'] = [', '.join(nomes[linha]) for linha in linhas_diferencas[:len(linhas)]]
+            partes.append(tabela)
+        return pd.concat(partes, ignore_index=True)
+
+
+def comparar_temporadas(dados_anteriores, dados_atuais, indice_anterior=None, indice_atual=None):
+    """Compara duas versões da mesma temporada (lista da API ou TemporadaCompacta)"""
+    return ComparacaoTemporadas(_Versao(dados_anteriores, indice_anterior), _Versao(dados_atuais, indice_atual))
+
+
+def gerar_arquivos_delta(comparacao, codigo_companhia="TODAS", converter_para_brasilia=False, df_airports=None,
+                         adaptar_ssim_gol=False, processos=1, usar_fuso_iana=False, filtro_voos=None):
+    """
+    Produz pares (tipo, gerador de linhas) com os arquivos SSIM das diferenças: 'DELTA' (registros
+    incluídos e alterados, como na versão atual) e 'REMOVIDOS' (como estavam na versão anterior).
+    As conversões e os filtros de voos são os mesmos dos arquivos completos.
+    """
+    linhas_header = list(comparacao.atual.indice.linhas_header)
+    for tipo, versao, posicoes in (
+        ('DELTA', comparacao.atual, comparacao.posicoes_delta(codigo_companhia)),
+        ('REMOVIDOS', comparacao.anterior, comparacao.posicoes_removidas(codigo_companhia)),
+    ):
+        if filtro_voos is not None and filtro_voos.ativo:
+            posicoes = obter_indice_filtros(versao.dados, versao.indice).posicoes_filtradas(filtro_voos, posicoes)
+        linhas = transformar_posicoes_paralelo(
+            versao.dados, posicoes, df_airports, converter_para_brasilia, adaptar_ssim_gol, processos, usar_fuso_iana
+        )
+        yield tipo, gerar_linhas_arquivo_ssim(linhas_header, linhas, codigo_companhia)
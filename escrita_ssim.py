@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+# Gerador SSIM - Escrita do arquivo SSIM em streaming
+# Grava as linhas geradas direto em disco (texto, .gz ou .zip) sem montar o arquivo em memória
+
+import gzip
+import io
+import itertools
+import os
+import tempfile
+import time
+import weakref
+import zipfile
+
+from instrumentacao import etapa
+
+LINHAS_POR_ESCRITA = 4096
+PREFIXO_TEMPORARIO = 'ssim_'
+IDADE_MAXIMA_TEMPORARIOS = 6 * 3600  # Arquivos de download esquecidos são removidos depois de 6 horas
+COMPRESSOES = {
+    None: ('.ssim', 'text/plain'),
+    'gzip': ('.ssim.gz', 'application/gzip'),
+    'zip': ('.zip', 'application/zip'),
+}
+
+
+def escrever_linhas(linhas, arquivo):
+    """
+    Escreve as linhas em um arquivo texto aberto, separadas por '\\n' e sem quebra
+    no final (mesmo conteúdo de "\\n".join(linhas)). Retorna o número de linhas.
+    """
+    linhas = iter(linhas)
+    total = 0
+    separador = ''
+    while True:
+        lote = list(itertools.islice(linhas, LINHAS_POR_ESCRITA))
+        if not lote:
+            break
+        arquivo.write(separador + "\n".join(lote))
+        separador = "\n"
+        total += len(lote)
+    return total
+
+
+def nome_com_compressao(nome_arquivo, compressao=None):
+    """Ajusta a extensão do nome do arquivo .ssim para a compressão escolhida"""
+    extensao, _ = COMPRESSOES[compressao]
+    base = nome_arquivo[:-len('.ssim')] if nome_arquivo.endswith('.ssim') else nome_arquivo
+    return base + extensao
+
+
+def tipo_mime(compressao=None):
+    """Tipo MIME do arquivo gerado com a compressão escolhida"""
+    return COMPRESSOES[compressao][1]
+
+
+def gravar_arquivo_ssim(linhas, caminho, compressao=None, nome_interno=None):
+    """
+    Grava as linhas em `caminho` como texto puro, gzip ('gzip') ou zip ('zip', com um
+    único arquivo `nome_interno`). Retorna o número de linhas gravadas.
+    """
+    if compressao not in COMPRESSOES:
+        raise ValueError(f"Compressão não suportada: {compressao}")
+
+    with etapa(f"serializacao.{compressao or 'texto'}") as medicao:
+        total = _gravar(linhas, caminho, compressao, nome_interno)
+        medicao.linhas = total
+    return total
+
+
+def _gravar(linhas, caminho, compressao, nome_interno):
+    """Abre o destino conforme a compressão e escreve as linhas"""
+    if compressao is None:
+        with open(caminho, 'w', encoding='utf-8', newline='\n') as arquivo:
+            return escrever_linhas(linhas, arquivo)
+
+    if compressao == 'gzip':
+        with gzip.open(caminho, 'wt', encoding='utf-8', newline='\n') as arquivo:
+            return escrever_linhas(linhas, arquivo)
+
+    if not nome_interno:
+        nome_interno = os.path.splitext(os.path.basename(caminho))[0] + '.ssim'
+    with zipfile.ZipFile(caminho, 'w', compression=zipfile.ZIP_DEFLATED) as arquivo_zip:
+        with arquivo_zip.open(nome_interno, 'w', force_zip64=True) as binario:
+            with io.TextIOWrapper(binario, encoding='utf-8', newline='\n') as arquivo:
+                return escrever_linhas(linhas, arquivo)
+
+
+def gravar_arquivo_temporario(linhas, nome_arquivo, compressao=None, diretorio=None):
+    """
+    Grava as linhas em um arquivo temporário no disco e retorna (caminho, linhas, bytes).
+    Quem chama é responsável por remover o arquivo.
+    """
+    if compressao not in COMPRESSOES:
+        raise ValueError(f"Compressão não suportada: {compressao}")
+
+    descritor, caminho = tempfile.mkstemp(prefix=PREFIXO_TEMPORARIO, suffix=COMPRESSOES[compressao][0], dir=diretorio)
+    os.close(descritor)
+    try:
+        total = gravar_arquivo_ssim(linhas, caminho, compressao, nome_interno=nome_arquivo)
+    except BaseException:
+        os.remove(caminho)
+        raise
+    return caminho, total, os.path.getsize(caminho)
+
+
+def _remover_arquivo(caminho):
+    try:
+        os.remove(caminho)
+    except OSError:
+        pass
+
+
+class ArquivoTemporario:
+    """
+    Arquivo gerado para download e o que se sabe dele (chave das opções que o geraram, nome,
+    linhas, relatório de validação). O arquivo é removido por `remover()` ou quando o objeto
+    deixa de ser referenciado (ex: fim da sessão do Streamlit que o guardava).
+    """
+
+    def __init__(self, caminho, nome=None, linhas=0, chave=None, relatorio=None):
+        self.caminho = caminho
+        self.nome = nome
+        self.linhas = linhas
+        self.chave = chave
+        self.relatorio = relatorio
+        self.tamanho = os.path.getsize(caminho)
+        self._finalizador = weakref.finalize(self, _remover_arquivo, caminho)
+
+    def existe(self):
+        return self._finalizador.alive and os.path.exists(self.caminho)
+
+    def remover(self):
+        self._finalizador()
+
+
+def remover_temporarios_antigos(diretorio, idade_maxima=IDADE_MAXIMA_TEMPORARIOS):
+    """Remove os arquivos de download do diretório modificados há mais de `idade_maxima` segundos"""
+    limite = time.time() - idade_maxima
+    try:
+        entradas = list(os.scandir(diretorio))
+    except OSError:
+        return 0
+    removidos = 0
+    for entrada in entradas:
+        try:
+            if entrada.name.startswith(PREFIXO_TEMPORARIO) and entrada.is_file() and entrada.stat().st_mtime < limite:
+                os.remove(entrada.path)
+                removidos += 1
+        except OSError:
+            pass
+    return removidos
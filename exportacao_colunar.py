@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+# Gerador SSIM - Exportação colunar (Parquet / Arrow IPC)
+# Registros 3 fatiados em colunas tipadas e gravados em lotes, particionados por companhia
+# (diretórios companhia=XX), sem montar uma segunda cópia da seleção em memória
+
+import importlib.util
+import os
+import shutil
+import tempfile
+import zipfile
+from collections import Counter
+
+import numpy as np
+
+from parser_ssim import TAMANHO_LOTE, CAMPOS_TEXTO, CAMPOS_NUMERICOS, CAMPOS_DATA, parsear_linhas3
+from instrumentacao import etapa, modulo_sob_demanda
+
+# pyarrow vem com o Streamlit; na linha de comando pode faltar. Só é importado na primeira exportação
+pa = modulo_sob_demanda('pyarrow')
+pq = modulo_sob_demanda('pyarrow.parquet')
+PYARROW_DISPONIVEL = importlib.util.find_spec('pyarrow') is not None
+
+FORMATOS_COLUNARES = {
+    'parquet': '.parquet',
+    'arrow': '.arrow',  # Arrow IPC (formato de arquivo)
+}
+PARTICAO_SEM_COMPANHIA = '__HIVE_DEFAULT_PARTITION__'
+# Número de registro é a posição da linha no arquivo SSIM: não faz sentido fora dele
+_COLUNAS_IGNORADAS = {'companhia', 'numero_registro'}
+
+
+def _esquema(colunas):
+    """Esquema Arrow das colunas de parsear_linhas3 (textos como string, horários e offsets em minutos)"""
+    campos = []
+    for coluna, dtype in colunas.items():
+        if coluna in CAMPOS_TEXTO:
+            tipo = pa.string()
+        elif coluna in CAMPOS_DATA:
+            tipo = pa.date32()
+        elif coluna == 'dias_mascara':
+            tipo = pa.uint8()
+        elif coluna in CAMPOS_NUMERICOS:
+            tipo = pa.int32()
+        else:
+            tipo = pa.int16()  # Horários e offsets
+        campos.append(pa.field(coluna, tipo))
+    return pa.schema(campos)
+
+
+def _coluna_arrow(coluna, tipo):
+    """Coluna (Series) do DataFrame do parser como array Arrow do tipo do esquema"""
+    if pa.types.is_string(tipo):
+        # Categorical: decodifica a partir dos códigos (sem montar strings em Python)
+        categorica = coluna.array
+        dicionario = pa.DictionaryArray.from_arrays(
+            pa.array(np.asarray(categorica.codes, dtype=np.int32)),
+            pa.array(categorica.categories.to_numpy(dtype=object), type=pa.string())
+        )
+        return dicionario.dictionary_decode()
+    if pa.types.is_date32(tipo):
+        return pa.array(coluna.to_numpy().astype('datetime64[D]'), type=tipo, from_pandas=True)
+    return pa.array(coluna.array, type=tipo)
+
+
+class ExportadorColunar:
+    """
+    Grava registros 3 em `diretorio`/companhia=XX/parte-0.parquet (ou .arrow), um escritor
+    aberto por companhia e uma row group (ou batch) por lote de TAMANHO_LOTE linhas.
+
+    `repassar(linhas)` devolve as mesmas linhas (para encadear com a gravação do SSIM) e
+    exporta os registros 3 ao passar; `concluir()` fecha os arquivos e devolve os registros
+    gravados por companhia. Usar como contexto fecha os arquivos também em caso de erro.
+    """
+
+    def __init__(self, diretorio, formato='parquet'):
+        if not PYARROW_DISPONIVEL:
+            raise RuntimeError("Exportação colunar requer o pacote pyarrow (pip install pyarrow)")
+        if formato not in FORMATOS_COLUNARES:
+            raise ValueError(f"Formato colunar não suportado: {formato}")
+        self.diretorio = diretorio
+        self.formato = formato
+        self.registros_por_companhia = Counter()
+        self._escritores = {}
+        self._arquivos = []
+        self._esquema = None
+        self._lote = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *erro):
+        self._fechar()
+
+    def repassar(self, linhas):
+        """Repassa as linhas, exportando os registros 3 em lotes"""
+        for linha in linhas:
+            if linha.startswith('3'):
+                self._lote.append(linha)
+                if len(self._lote) == TAMANHO_LOTE:
+                    self._gravar_lote()
+            yield linha
+
+    def adicionar(self, linhas):
+        """Exporta os registros 3 de `linhas`"""
+        for _ in self.repassar(linhas):
+            pass
+
+    def _escritor(self, companhia):
+        escritor = self._escritores.get(companhia)
+        if escritor is None:
+            particao = os.path.join(self.diretorio, f"companhia={companhia or PARTICAO_SEM_COMPANHIA}")
+            os.makedirs(particao, exist_ok=True)
+            caminho = os.path.join(particao, 'parte-0' + FORMATOS_COLUNARES[self.formato])
+            if self.formato == 'parquet':
+                escritor = pq.ParquetWriter(caminho, self._esquema, compression='zstd')
+            else:
+                arquivo = pa.OSFile(caminho, 'wb')
+                self._arquivos.append(arquivo)
+                escritor = pa.ipc.new_file(arquivo, self._esquema)
+            self._escritores[companhia] = escritor
+        return escritor
+
+    def _gravar_lote(self):
+        lote, self._lote = self._lote, []
+        with etapa(f'exportacao.{self.formato}', linhas=len(lote)):
+            df = parsear_linhas3(lote)
+            colunas = {coluna: df[coluna] for coluna in df.columns if coluna not in _COLUNAS_IGNORADAS}
+            if self._esquema is None:
+                self._esquema = _esquema(colunas)
+            tabela = pa.Table.from_arrays(
+                [_coluna_arrow(colunas[campo.name], campo.type) for campo in self._esquema], schema=self._esquema
+            )
+
+            # Partição por companhia: uma fatia da tabela por código
+            companhias = df['companhia'].values
+            ordem = np.argsort(companhias.codes, kind='stable')
+            codigos, inicios = np.unique(companhias.codes[ordem], return_index=True)
+            limites = np.append(inicios, len(ordem))
+            for k, codigo in enumerate(codigos):
+                companhia = companhias.categories[codigo] if codigo >= 0 else ''
+                fatia = tabela.take(pa.array(ordem[limites[k]:limites[k + 1]]))
+                self._escritor(companhia).write_table(fatia)
+                self.registros_por_companhia[companhia] += fatia.num_rows
+
+    def _fechar(self):
+        for escritor in self._escritores.values():
+            escritor.close()
+        for arquivo in self._arquivos:
+            arquivo.close()
+        self._escritores, self._arquivos = {}, []
+
+    def concluir(self):
+        """Grava o último lote, fecha os arquivos e devolve {companhia: registros}"""
+        if self._lote:
+            self._gravar_lote()
+        self._fechar()
+        return dict(self.registros_por_companhia)
+
+
+def exportar_linhas3(linhas, diretorio, formato='parquet'):
+    """Exporta os registros 3 de `linhas` para `diretorio` (particionado por companhia)"""
+    with ExportadorColunar(diretorio, formato) as exportador:
+        exportador.adicionar(linhas)
+        return exportador.concluir()
+
+
+def gravar_exportacao_temporaria(linhas, nome_base, formato='parquet', diretorio=None):
+    """
+    Exporta os registros 3 e compacta as partições em um .zip temporário no disco.
+    Retorna (caminho, registros, bytes); quem chama é responsável por remover o arquivo.
+    """
+    temporario = tempfile.mkdtemp(prefix='ssim_colunar_', dir=diretorio)
+    try:
+        raiz = os.path.join(temporario, nome_base)
+        registros = sum(exportar_linhas3(linhas, raiz, formato).values())
+        descritor, caminho = tempfile.mkstemp(prefix='ssim_', suffix='.zip', dir=diretorio)
+        os.close(descritor)
+        # Parquet/Arrow já vêm comprimidos: o zip só agrupa as partições
+        with zipfile.ZipFile(caminho, 'w', compression=zipfile.ZIP_STORED) as arquivo_zip:
+            for pasta, _, arquivos in os.walk(raiz):
+                for nome in sorted(arquivos):
+                    completo = os.path.join(pasta, nome)
+                    arquivo_zip.write(completo, os.path.relpath(completo, temporario))
+        return caminho, registros, os.path.getsize(caminho)
+    finally:
+        shutil.rmtree(temporario, ignore_errors=True)
+
+
+def nome_exportacao(nome_arquivo, formato='parquet'):
+    """Nome do conjunto exportado a partir do nome do arquivo .ssim"""
+    base = nome_arquivo[:-len('.ssim')] if nome_arquivo.endswith('.ssim') else nome_arquivo
+    return f"{base}_{formato.upper()}"
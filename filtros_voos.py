@@ -0,0 +1,251 @@
+# -*- coding: utf-8 -*-
+# Gerador SSIM - Filtros de voos
+# Índices invertidos (aeroporto, rota, equipamento) e índice de intervalos dos períodos de operação,
+# montados uma vez por temporada; filtros combinados viram interseções de listas de posições
+
+from collections import namedtuple
+
+import numpy as np
+
+from parser_ssim import TAMANHO_LOTE, matriz_caracteres, _data, _mascara_dias
+from temporada_compacta import TemporadaCompacta, linhas_nas_posicoes
+from operacoes_datadas import _dia, _codigo
+from instrumentacao import etapa, contar, modulo_sob_demanda
+
+pd = modulo_sob_demanda('pandas')
+
+_CAMPOS_FILTRO = ['estacao', 'rota', 'origem', 'destino', 'equipamento', 'data_inicio', 'data_fim']
+
+
+class FiltroVoos(namedtuple('FiltroVoos', _CAMPOS_FILTRO, defaults=(None,) * len(_CAMPOS_FILTRO))):
+    """
+    Restrições sobre os registros 3, além da companhia. Campos vazios não filtram.
+
+    estacao: aeroporto de origem ou destino; rota: par de aeroportos 'GRU-SDU' (nos dois sentidos);
+    origem/destino: sentido único; equipamento: código IATA (ex: 738);
+    data_inicio/data_fim: janela de datas ('AAAA-MM-DD'), mantém quem opera em ao menos um dia dela.
+    """
+    __slots__ = ()
+
+    @property
+    def ativo(self):
+        return any(valor for valor in self if not isinstance(valor, str) or valor.strip())
+
+    def normalizado(self):
+        """
+        Códigos em maiúsculas e datas como datetime.date (chave estável para caches).
+        Levanta ValueError para rota ou data inválida.
+        """
+        valores = {}
+        for campo in ('estacao', 'origem', 'destino', 'equipamento'):
+            valor = getattr(self, campo)
+            valores[campo] = valor.strip().upper() if valor and valor.strip() else None
+        rota = _par_rota(self.rota) if self.rota and self.rota.strip() else None
+        if self.rota and self.rota.strip() and rota is None:
+            raise ValueError(f"Rota inválida: '{self.rota}' (use ORIGEM-DESTINO, ex: GRU-SDU)")
+        valores['rota'] = '-'.join(rota) if rota else None
+        for campo in ('data_inicio', 'data_fim'):
+            valor = getattr(self, campo)
+            valores[campo] = pd.Timestamp(valor).date() if valor else None
+        if valores['data_inicio'] and valores['data_fim'] and valores['data_inicio'] > valores['data_fim']:
+            raise ValueError("A data inicial do filtro é posterior à data final")
+        return FiltroVoos(**valores)
+
+    def descricao(self):
+        """Resumo legível dos campos preenchidos"""
+        filtro = self.normalizado()
+        partes = []
+        if filtro.estacao:
+            partes.append(f"aeroporto {filtro.estacao}")
+        if filtro.rota:
+            partes.append(f"rota {filtro.rota}")
+        if filtro.origem:
+            partes.append(f"origem {filtro.origem}")
+        if filtro.destino:
+            partes.append(f"destino {filtro.destino}")
+        if filtro.equipamento:
+            partes.append(f"equipamento {filtro.equipamento}")
+        if filtro.data_inicio or filtro.data_fim:
+            inicio = filtro.data_inicio.strftime('%d/%m/%Y') if filtro.data_inicio else 'início'
+            fim = filtro.data_fim.strftime('%d/%m/%Y') if filtro.data_fim else 'fim'
+            partes.append(f"operando de {inicio} a {fim}")
+        return ', '.join(partes)
+
+    def sufixo_arquivo(self):
+        """Trecho do nome do arquivo que identifica o filtro ('' sem filtro)"""
+        filtro = self.normalizado()
+        partes = [filtro.estacao, filtro.rota, filtro.origem and f"DE_{filtro.origem}",
+                  filtro.destino and f"PARA_{filtro.destino}", filtro.equipamento and f"EQP_{filtro.equipamento}"]
+        if filtro.data_inicio or filtro.data_fim:
+            inicio = filtro.data_inicio.strftime('%Y%m%d') if filtro.data_inicio else 'INICIO'
+            fim = filtro.data_fim.strftime('%Y%m%d') if filtro.data_fim else 'FIM'
+            partes.append(f"{inicio}_{fim}")
+        return ''.join(f"_{parte}" for parte in partes if parte)
+
+
+def _par_rota(rota):
+    """'GRU-SDU', 'GRU SDU' ou 'GRUSDU' como par (GRU, SDU); None se não tiver dois códigos de 3 letras"""
+    codigos = rota.replace('-', ' ').replace('/', ' ').split()
+    if len(codigos) == 1 and len(codigos[0]) == 6:
+        codigos = [codigos[0][:3], codigos[0][3:]]
+    if len(codigos) != 2 or any(len(codigo) != 3 for codigo in codigos):
+        return None
+    return tuple(codigo.upper() for codigo in codigos)
+
+
+class _IndiceInvertido:
+    """Chave -> registros (índices crescentes), em um único array ordenado com limites por chave"""
+
+    def __init__(self, chaves, registros=None):
+        if registros is None:
+            registros = np.arange(len(chaves))
+        ordem = np.lexsort((registros, chaves))
+        chaves_ordenadas = chaves[ordem]
+        self.registros = registros[ordem]
+        self.chaves, self.inicios = np.unique(chaves_ordenadas, return_index=True)
+        self.limites = np.append(self.inicios, len(chaves_ordenadas))
+
+    def __len__(self):
+        return len(self.chaves)
+
+    def registros_da_chave(self, chave):
+        k = np.searchsorted(self.chaves, chave)
+        if k == len(self.chaves) or self.chaves[k] != chave:
+            return self.registros[:0]
+        return self.registros[self.limites[k]:self.limites[k + 1]]
+
+    def contagem(self):
+        """Registros por chave"""
+        return dict(zip(np.char.decode(self.chaves, 'ascii').tolist(), np.diff(self.limites).tolist()))
+
+
+def _matrizes(dados_json, posicoes):
+    """Matrizes de caracteres dos registros nas posições, em lotes (direto dos bytes se compacta)"""
+    for inicio in range(0, len(posicoes), TAMANHO_LOTE):
+        lote = posicoes[inicio:inicio + TAMANHO_LOTE]
+        if isinstance(dados_json, TemporadaCompacta) and not dados_json.extras:
+            yield np.asarray(dados_json.registros[lote])
+        else:
+            yield matriz_caracteres(list(linhas_nas_posicoes(dados_json, lote)))
+
+
+class IndiceFiltros:
+    """
+    Índices dos registros 3 de uma temporada para filtros por aeroporto, rota, equipamento e datas.
+
+    Os registros são numerados na ordem de `posicoes_linha3`; cada índice devolve números
+    crescentes, então combinar filtros é intersectar arrays ordenados e o resultado volta às
+    posições da temporada na ordem original da API.
+    """
+
+    def __init__(self, posicoes, origem, destino, equipamento, inicio, fim, mascara):
+        self.posicoes = posicoes
+        self.origem = _IndiceInvertido(origem)
+        self.destino = _IndiceInvertido(destino)
+        self.equipamento = _IndiceInvertido(equipamento)
+        # Rota sem sentido: chave com os dois aeroportos em ordem alfabética
+        em_ordem = origem <= destino
+        menor, maior = np.where(em_ordem, origem, destino), np.where(em_ordem, destino, origem)
+        self.rota = _IndiceInvertido(np.char.add(menor, maior))
+        # Índice de intervalos: registros por início e por fim do período (sem data válida ficam de fora)
+        validos = np.flatnonzero(fim >= inicio)
+        por_inicio = validos[np.argsort(inicio[validos], kind='stable')]
+        por_fim = validos[np.argsort(fim[validos], kind='stable')]
+        self._por_inicio, self._inicios = por_inicio, inicio[por_inicio]
+        self._por_fim, self._fins = por_fim, fim[por_fim]
+        self._inicio, self._fim, self._mascara = inicio, fim, mascara
+
+    @classmethod
+    def de_temporada(cls, dados_json, indice_temporada):
+        """Lê as colunas dos registros 3 (em lotes sobre a matriz de caracteres) e monta os índices"""
+        posicoes = np.asarray(indice_temporada.posicoes_linha3, dtype=np.int64)
+        with etapa('indexacao.filtros', linhas=len(posicoes)):
+            colunas = {'origem': [], 'destino': [], 'equipamento': [], 'inicio': [], 'fim': [], 'mascara': []}
+            for matriz in _matrizes(dados_json, posicoes):
+                colunas['origem'].append(np.ascontiguousarray(matriz[:, 36:39]).view('S3').ravel())
+                colunas['destino'].append(np.ascontiguousarray(matriz[:, 54:57]).view('S3').ravel())
+                colunas['equipamento'].append(np.ascontiguousarray(matriz[:, 72:75]).view('S3').ravel())
+                # Data inválida: período vazio (fim < início), fora de qualquer janela
+                inicio, fim = _data(matriz, 14), _data(matriz, 21)
+                invalidos = np.isnat(inicio) | np.isnat(fim)
+                colunas['inicio'].append(np.where(invalidos, 1, inicio.astype(np.int64)))
+                colunas['fim'].append(np.where(invalidos, 0, fim.astype(np.int64)))
+                colunas['mascara'].append(_mascara_dias(matriz))
+            vazias = {'origem': 'S3', 'destino': 'S3', 'equipamento': 'S3',
+                      'inicio': np.int64, 'fim': np.int64, 'mascara': np.uint8}
+            colunas = {
+                nome: np.concatenate(partes) if partes else np.empty(0, dtype=vazias[nome])
+                for nome, partes in colunas.items()
+            }
+            return cls(posicoes, **colunas)
+
+    def __len__(self):
+        return len(self.posicoes)
+
+    def _registros_no_periodo(self, data_inicio, data_fim):
+        """Registros com ao menos um dia de operação em [data_inicio, data_fim]"""
+        if not len(self._por_inicio):
+            return self._por_inicio
+        primeiro = self._inicios[0] if data_inicio is None else _dia(data_inicio)
+        ultimo = self._fins[-1] if data_fim is None else _dia(data_fim)
+        # Período sobrepõe a janela: início <= último dia e fim >= primeiro dia
+        comecam_antes = self._por_inicio[:np.searchsorted(self._inicios, ultimo, side='right')]
+        terminam_depois = self._por_fim[np.searchsorted(self._fins, primeiro, side='left'):]
+        registros = np.intersect1d(comecam_antes, terminam_depois, assume_unique=True)
+
+        # Dias da semana do trecho em comum (janelas curtas) contra os dias de operação
+        de = np.maximum(self._inicio[registros], primeiro)
+        ate = np.minimum(self._fim[registros], ultimo)
+        dias = np.minimum(ate - de + 1, 7)
+        semana = ((1 << dias) - 1) << ((de + 3) % 7)
+        semana = (semana | (semana >> 7)) & 0x7F
+        return registros[(self._mascara[registros] & semana) != 0]
+
+    def registros(self, filtro):
+        """Números (crescentes) dos registros que atendem a todos os campos do filtro"""
+        filtro = filtro.normalizado()
+        listas = []
+        if filtro.estacao:
+            codigo = _codigo(filtro.estacao)
+            listas.append(np.union1d(self.origem.registros_da_chave(codigo), self.destino.registros_da_chave(codigo)))
+        if filtro.rota:
+            par = sorted(_codigo(codigo) for codigo in filtro.rota.split('-'))
+            listas.append(self.rota.registros_da_chave(par[0] + par[1]))
+        if filtro.origem:
+            listas.append(self.origem.registros_da_chave(_codigo(filtro.origem)))
+        if filtro.destino:
+            listas.append(self.destino.registros_da_chave(_codigo(filtro.destino)))
+        if filtro.equipamento:
+            listas.append(self.equipamento.registros_da_chave(_codigo(filtro.equipamento)))
+        if filtro.data_inicio or filtro.data_fim:
+            listas.append(self._registros_no_periodo(filtro.data_inicio, filtro.data_fim))
+
+        if not listas:
+            return np.arange(len(self))
+        # Da menor lista para a maior: cada interseção custa no máximo o tamanho da menor
+        listas.sort(key=len)
+        resultado = listas[0]
+        for lista in listas[1:]:
+            if not len(resultado):
+                break
+            resultado = np.intersect1d(resultado, lista, assume_unique=True)
+        contar('filtros.consultas')
+        return resultado
+
+    def posicoes_filtradas(self, filtro, posicoes=None):
+        """
+        Posições da temporada que atendem ao filtro, restritas a `posicoes` (ex: as da companhia),
+        na ordem original da API
+        """
+        selecionadas = self.posicoes[self.registros(filtro)]
+        if posicoes is None:
+            return selecionadas
+        return np.intersect1d(selecionadas, np.asarray(posicoes, dtype=np.int64), assume_unique=True)
+
+
+def obter_indice_filtros(dados_json, indice_temporada):
+    """Índice de filtros guardado no índice da temporada (montado na primeira chamada)"""
+    indice_filtros = getattr(indice_temporada, 'filtros', None)
+    if indice_filtros is None:
+        indice_filtros = indice_temporada.filtros = IndiceFiltros.de_temporada(dados_json, indice_temporada)
+    return indice_filtros
@@ -0,0 +1,339 @@
+# -*- coding: utf-8 -*-
+# Gerador SSIM - Conversão para Brasília pelos fusos IANA
+# Offsets UTC de cada aeroporto calculados por dia (zoneinfo) uma única vez por ano da temporada,
+# com conversão em lote dos horários, divisão dos períodos na troca de horário de verão
+# e virada de dia nos voos que mudam de data ao passar para UTC-3
+
+import datetime as dt
+from functools import lru_cache
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+import numpy as np
+
+from referencias import IndiceAeroportos, OFFSET_PADRAO_BRASILIA
+from parser_ssim import (
+    MESES_SSIM, TAMANHO_LINHA, TAMANHO_LOTE, _ESPACO, _ZERO, matriz_caracteres,
+    _eh_alfanumerico, _eh_maiuscula, _horario, _offset, _data, _mascara_dias,
+    _posicao_ajuste_formato, _contabilizar_consultas, _converter_lote_brasilia,
+)
+from pipeline_ssim import compilar_pipeline
+from instrumentacao import etapa, contar
+
+OFFSET_BRASILIA_MINUTOS = OFFSET_PADRAO_BRASILIA * 60
+MINUTOS_DIA = 24 * 60
+MAXIMO_DIAS_PERIODO = 366  # Períodos maiores (dados inválidos) seguem a conversão por hora cheia
+
+_EPOCA = dt.date(1970, 1, 1)
+_MESES_BYTES = np.frombuffer(''.join(MESES_SSIM).encode('ascii'), dtype=np.uint8).reshape(12, 3)
+_OFFSET_BRASILIA_BYTES = np.frombuffer(b'-0300', dtype=np.uint8)
+
+
+@lru_cache(maxsize=4096)
+def _offsets_ano(nome_tz, ano):
+    """
+    Offset UTC (minutos) de cada dia do ano no fuso IANA, medido ao meio-dia local
+    (None se o fuso não existir na base do sistema).
+    """
+    try:
+        fuso = ZoneInfo(nome_tz)
+    except (ZoneInfoNotFoundError, ValueError):
+        return None
+
+    dias = (dt.date(ano + 1, 1, 1) - dt.date(ano, 1, 1)).days
+    offsets = np.empty(dias, dtype=np.int16)
+    dia = dt.datetime(ano, 1, 1, 12, tzinfo=fuso)
+    for k in range(dias):
+        offsets[k] = (dia + dt.timedelta(days=k)).utcoffset() // dt.timedelta(minutes=1)
+    return offsets
+
+
+def _nome_fuso(df_airports, codigo_iata):
+    """Fuso IANA do aeroporto no índice (None quando ausente)"""
+    if df_airports is None:
+        return None
+    return df_airports.tz(codigo_iata)
+
+
+class TabelaFusos:
+    """
+    Offsets diários dos fusos de um conjunto de aeroportos nos anos da temporada.
+    `offsets[f, p]` é o offset do fuso f no dia de posição p e `mudancas` acumula as trocas
+    de offset, de modo que um período [a, b] atravessa uma transição quando
+    mudancas[f, p(b)] != mudancas[f, p(a)].
+    """
+
+    def __init__(self, nomes_fusos, anos):
+        self.anos = np.array(sorted(anos), dtype=np.int64)
+        self.inicio_anos = np.array(
+            [(dt.date(int(ano), 1, 1) - _EPOCA).days for ano in self.anos], dtype=np.int64
+        )
+        tamanhos = [(dt.date(int(ano) + 1, 1, 1) - dt.date(int(ano), 1, 1)).days for ano in self.anos]
+        self.base_anos = np.concatenate([[0], np.cumsum(tamanhos)[:-1]]).astype(np.int64)
+
+        self.offsets = np.zeros((max(len(nomes_fusos), 1), int(sum(tamanhos))), dtype=np.int16)
+        self.validos = np.zeros(len(nomes_fusos), dtype=bool)
+        for f, nome in enumerate(nomes_fusos):
+            por_ano = [_offsets_ano(nome, int(ano)) for ano in self.anos]
+            if all(offsets is not None for offsets in por_ano):
+                self.offsets[f] = np.concatenate(por_ano)
+                self.validos[f] = True
+
+        mudou = np.zeros(self.offsets.shape, dtype=np.int32)
+        mudou[:, 1:] = self.offsets[:, 1:] != self.offsets[:, :-1]
+        self.mudancas = np.cumsum(mudou, axis=1)
+
+    def posicoes(self, dias):
+        """Posição na tabela de cada dia (dias desde 1970-01-01, todos nos anos da tabela)"""
+        anos = np.asarray(dias).astype('datetime64[D]').astype('datetime64[Y]').astype(np.int64) + 1970
+        k = np.searchsorted(self.anos, anos)
+        return self.base_anos[k] + (dias - self.inicio_anos[k])
+
+
+def _registros_elegiveis(linhas, matriz):
+    """
+    Registros 3 de layout fixo que o motor de fusos converte: blocos de partida e chegada
+    completos, período válido de até um ano, ao menos um dia de operação e ajuste de formato
+    exato em lote. Os demais seguem a conversão por hora cheia (parser_ssim).
+    """
+    elegiveis = np.fromiter(
+        (len(linha) == TAMANHO_LINHA and linha.isascii() for linha in linhas),
+        dtype=bool, count=len(linhas)
+    )
+    elegiveis &= (matriz[:, 0] == ord('3')) & (matriz[:, 1] == _ESPACO)
+    elegiveis &= _eh_alfanumerico(matriz[:, 2:4]).all(axis=1)
+
+    for inicio in (36, 54):
+        elegiveis &= _eh_maiuscula(matriz[:, inicio:inicio + 3]).all(axis=1)
+        for posicao in (inicio + 3, inicio + 7):
+            minutos, validos = _horario(matriz, posicao)
+            minutos_campo = matriz[:, posicao + 2:posicao + 4].astype(np.int64) - _ZERO
+            elegiveis &= validos & (minutos < MINUTOS_DIA) & (minutos_campo[:, 0] * 10 + minutos_campo[:, 1] < 60)
+        elegiveis &= _offset(matriz, inicio + 11)[1]
+
+    inicio_periodo, fim_periodo = _data(matriz, 14), _data(matriz, 21)
+    duracao = (fim_periodo - inicio_periodo).astype(np.int64)
+    elegiveis &= ~np.isnat(inicio_periodo) & ~np.isnat(fim_periodo)
+    elegiveis &= (duracao >= 0) & (duracao <= MAXIMO_DIAS_PERIODO)
+    elegiveis &= _mascara_dias(matriz) != 0
+
+    # O código da CIA repetido pelo ajuste de formato não pode cair sobre os campos convertidos
+    posicao_ajuste, seguro = _posicao_ajuste_formato(matriz)
+    elegiveis &= seguro & ((posicao_ajuste < 0) | (posicao_ajuste >= 72))
+    return elegiveis, posicao_ajuste
+
+
+def _segmentos_por_transicao(dias_inicio, dias_fim, mascara, offsets_origem, offsets_destino):
+    """
+    Divide um período [dias_inicio, dias_fim] nos dias em que o offset da origem ou do destino
+    muda. Cada trecho é reduzido ao primeiro e ao último dia de operação; trechos sem operação
+    são descartados. Retorna [(inicio, fim, offset_origem, offset_destino), ...].
+    """
+    dias = np.arange(dias_inicio, dias_fim + 1)
+    opera = (mascara >> ((dias + 3) % 7)) & 1  # 1970-01-01 foi uma quinta-feira (bit 3)
+    troca = (offsets_origem[1:] != offsets_origem[:-1]) | (offsets_destino[1:] != offsets_destino[:-1])
+    cortes = np.concatenate([[0], np.flatnonzero(troca) + 1, [len(dias)]])
+
+    segmentos = []
+    for a, b in zip(cortes[:-1], cortes[1:]):
+        operacao = np.flatnonzero(opera[a:b])
+        if len(operacao):
+            primeiro, ultimo = a + operacao[0], a + operacao[-1]
+            segmentos.append(
+                (int(dias[primeiro]), int(dias[ultimo]),
+                 int(offsets_origem[primeiro]), int(offsets_destino[primeiro]))
+            )
+    return segmentos
+
+
+def _escrever_numero(bloco, coluna, valores, largura):
+    for k in range(largura):
+        bloco[:, coluna + largura - 1 - k] = _ZERO + (valores // 10 ** k) % 10
+
+
+def _escrever_horario(bloco, coluna, minutos):
+    minutos = np.mod(minutos, MINUTOS_DIA)
+    _escrever_numero(bloco, coluna, (minutos // 60) * 100 + minutos % 60, 4)
+
+
+def _escrever_data(bloco, coluna, dias):
+    """Grava dias desde 1970-01-01 como DDMMMYY"""
+    datas = dias.astype('datetime64[D]')
+    meses = datas.astype('datetime64[M]')
+    _escrever_numero(bloco, coluna, (datas - meses.astype('datetime64[D]')).astype(np.int64) + 1, 2)
+    bloco[:, coluna + 2:coluna + 5] = _MESES_BYTES[meses.astype(np.int64) % 12]
+    _escrever_numero(bloco, coluna + 5, (meses.astype('datetime64[Y]').astype(np.int64) + 1970) % 100, 2)
+
+
+def _escrever_dias(bloco, mascara, alterar):
+    for dia in range(7):
+        novo = np.where((mascara >> dia) & 1, ord('1') + dia, _ESPACO)
+        bloco[:, 28 + dia] = np.where(alterar, novo, bloco[:, 28 + dia])
+
+
+def _converter_lote_fuso_iana(linhas, df_airports):
+    """
+    Ajuste de formato + conversão para Brasília de um bloco de linhas pelos fusos IANA.
+    Retorna a lista de linhas convertidas (registros divididos ocupam várias linhas, em ordem).
+    """
+    linhas = list(linhas)
+    matriz = matriz_caracteres(linhas)
+    elegiveis, posicao_ajuste = _registros_elegiveis(linhas, matriz)
+    indices = np.flatnonzero(elegiveis)
+
+    # Fora do layout: mesma conversão por hora cheia do modo padrão
+    fora_do_layout = np.flatnonzero(~elegiveis).tolist()
+    convertidas_fallback = {}
+    if fora_do_layout:
+        pipeline = compilar_pipeline(df_airports, converter_para_brasilia=True)
+        convertidas = _converter_lote_brasilia([linhas[i] for i in fora_do_layout], df_airports, pipeline)
+        convertidas_fallback = dict(zip(fora_do_layout, convertidas))
+    contar('fuso_iana.registros_fora_do_layout', len(fora_do_layout))
+    if not len(indices):
+        return [convertidas_fallback[i] for i in range(len(linhas))]
+
+    bloco = matriz[indices].copy()
+    ajuste = posicao_ajuste[indices]
+    com_ajuste = np.flatnonzero(ajuste >= 0)
+    bloco[com_ajuste, ajuste[com_ajuste]] = bloco[com_ajuste, 2]
+    bloco[com_ajuste, ajuste[com_ajuste] + 1] = bloco[com_ajuste, 3]
+    contar('ajuste_formato.padrao_principal', len(com_ajuste))
+    contar('ajuste_formato.sem_ajuste', len(indices) - len(com_ajuste))
+    _contabilizar_consultas(df_airports, bloco)
+
+    # Fusos dos aeroportos distintos do bloco (uma consulta ao índice por código)
+    estacoes = np.concatenate([
+        np.ascontiguousarray(bloco[:, 36:39]).view('S3').ravel(),
+        np.ascontiguousarray(bloco[:, 54:57]).view('S3').ravel(),
+    ])
+    codigos, inverso = np.unique(estacoes, return_inverse=True)
+    nomes_por_codigo = [_nome_fuso(df_airports, codigo.decode('ascii')) for codigo in codigos]
+    nomes_fusos = sorted({nome for nome in nomes_por_codigo if nome})
+    posicao_fuso = {nome: f for f, nome in enumerate(nomes_fusos)}
+    fuso_codigo = np.array([posicao_fuso.get(nome, -1) for nome in nomes_por_codigo], dtype=np.int64)
+
+    inicio = _data(bloco, 14).astype(np.int64)
+    fim = _data(bloco, 21).astype(np.int64)
+    # Todos os anos entre o primeiro início e o último fim: um período de até 366 dias pode
+    # atravessar um ano inteiro (ex: 31DEC24-01JAN26), sem começar nem terminar nele
+    anos_periodos = np.concatenate([inicio, fim]).astype('datetime64[D]').astype('datetime64[Y]').astype(np.int64) + 1970
+    tabela = TabelaFusos(nomes_fusos, range(int(anos_periodos.min()), int(anos_periodos.max()) + 1))
+    conhecidos = fuso_codigo >= 0
+    fuso_codigo[conhecidos] = np.where(tabela.validos[fuso_codigo[conhecidos]], fuso_codigo[conhecidos], -1)
+    contar('fuso_iana.aeroportos_sem_fuso', int(np.count_nonzero(fuso_codigo < 0)))
+
+    n = len(indices)
+    fuso_origem, fuso_destino = fuso_codigo[inverso[:n]], fuso_codigo[inverso[n:]]
+    offset_registro_origem, _ = _offset(bloco, 47)
+    offset_registro_destino, _ = _offset(bloco, 65)
+    mascara = _mascara_dias(bloco).astype(np.int64)
+    posicao_inicio, posicao_fim = tabela.posicoes(inicio), tabela.posicoes(fim)
+
+    def offsets_no_dia(fusos, offsets_registro, posicoes):
+        # Aeroporto sem fuso IANA conhecido: usa a variação UTC informada no próprio registro
+        return np.where(fusos >= 0, tabela.offsets[np.maximum(fusos, 0), posicoes], offsets_registro)
+
+    def atravessa_transicao(fusos):
+        linhas_fuso = np.maximum(fusos, 0)
+        return (fusos >= 0) & (
+            tabela.mudancas[linhas_fuso, posicao_fim] != tabela.mudancas[linhas_fuso, posicao_inicio]
+        )
+
+    registro = np.arange(n)
+    offset_origem = offsets_no_dia(fuso_origem, offset_registro_origem, posicao_inicio)
+    offset_destino = offsets_no_dia(fuso_destino, offset_registro_destino, posicao_inicio)
+
+    # Períodos que atravessam uma troca de horário de verão viram um registro por trecho
+    divididos = np.flatnonzero(atravessa_transicao(fuso_origem) | atravessa_transicao(fuso_destino))
+    if len(divididos):
+        manter = np.ones(n, dtype=bool)
+        novos = []
+        for r in divididos.tolist():
+            dias = np.arange(inicio[r], fim[r] + 1)
+            posicoes = tabela.posicoes(dias)
+            segmentos = _segmentos_por_transicao(
+                inicio[r], fim[r], mascara[r],
+                offsets_no_dia(np.full(len(dias), fuso_origem[r]), offset_registro_origem[r], posicoes),
+                offsets_no_dia(np.full(len(dias), fuso_destino[r]), offset_registro_destino[r], posicoes),
+            )
+            if segmentos:
+                manter[r] = False
+                novos.extend((r,) + segmento for segmento in segmentos)
+        contar('fuso_iana.registros_divididos', len(divididos))
+        contar('fuso_iana.trechos_gerados', len(novos))
+
+        if novos:
+            extras = np.array(novos, dtype=np.int64)
+            registro = np.concatenate([registro[manter], extras[:, 0]])
+            inicio = np.concatenate([inicio[manter], extras[:, 1]])
+            fim = np.concatenate([fim[manter], extras[:, 2]])
+            offset_origem = np.concatenate([offset_origem[manter], extras[:, 3]])
+            offset_destino = np.concatenate([offset_destino[manter], extras[:, 4]])
+            # Ordem estável: trechos de um registro ficam no lugar dele, em ordem cronológica
+            ordem = np.argsort(registro, kind='stable')
+            registro, inicio, fim = registro[ordem], inicio[ordem], fim[ordem]
+            offset_origem, offset_destino = offset_origem[ordem], offset_destino[ordem]
+
+    saida = bloco[registro]
+    deslocamento_origem = OFFSET_BRASILIA_MINUTOS - offset_origem
+    deslocamento_destino = OFFSET_BRASILIA_MINUTOS - offset_destino
+
+    # Virada de dia: a data do registro segue a partida da aeronave em horário de Brasília
+    partida_aeronave, _ = _horario(saida, 43)
+    virada = np.floor_divide(partida_aeronave + deslocamento_origem, MINUTOS_DIA)
+    contar('fuso_iana.registros_com_virada_de_dia', int(np.count_nonzero(virada)))
+    if np.any(virada):
+        giro = np.mod(virada, 7)
+        mascara_saida = mascara[registro]
+        mascara_saida = ((mascara_saida << giro) | (mascara_saida >> (7 - giro))) & 0x7F
+        _escrever_dias(saida, mascara_saida, virada != 0)
+    _escrever_data(saida, 14, inicio + virada)
+    _escrever_data(saida, 21, fim + virada)
+
+    for coluna, deslocamento in ((39, deslocamento_origem), (43, deslocamento_origem),
+                                 (57, deslocamento_destino), (61, deslocamento_destino)):
+        _escrever_horario(saida, coluna, _horario(saida, coluna)[0] + deslocamento)
+    saida[:, 47:52] = _OFFSET_BRASILIA_BYTES
+    saida[:, 65:70] = _OFFSET_BRASILIA_BYTES
+    contar('conversao_horario.blocos_convertidos',
+           int(np.count_nonzero(deslocamento_origem) + np.count_nonzero(deslocamento_destino)))
+    contar('fuso_iana.registros_convertidos', len(indices))
+
+    texto = saida.tobytes().decode('ascii')
+    inicio_registro = np.searchsorted(registro, np.arange(n + 1)).tolist()
+    resultado = []
+    k = 0
+    for i in range(len(linhas)):
+        if elegiveis[i]:
+            resultado.extend(
+                texto[j * TAMANHO_LINHA:(j + 1) * TAMANHO_LINHA]
+                for j in range(inicio_registro[k], inicio_registro[k + 1])
+            )
+            k += 1
+        else:
+            resultado.append(convertidas_fallback[i])
+    return resultado
+
+
+def transformar_linhas3_fuso_iana(linhas, df_airports=None, adaptar_ssim_gol=False):
+    """
+    Converte os registros 3 para o horário de Brasília pelos fusos IANA dos aeroportos
+    (coluna Tz de airport.csv), e aplica a adaptação GOL se solicitada.
+
+    Ao contrário de converter_horario_ssim, os minutos de fusos como +0530 são preservados,
+    o horário de verão vale para cada dia do período (registros que atravessam uma troca são
+    divididos) e a data e os dias de operação acompanham a virada de dia da partida.
+    """
+    if df_airports is not None and not isinstance(df_airports, IndiceAeroportos):
+        df_airports = IndiceAeroportos.de_dataframe(df_airports)
+
+    resultado = []
+    with etapa('transformacao.fuso_iana') as medicao:
+        linhas = list(linhas)
+        for inicio in range(0, len(linhas), TAMANHO_LOTE):
+            resultado.extend(_converter_lote_fuso_iana(linhas[inicio:inicio + TAMANHO_LOTE], df_airports))
+        medicao.linhas = len(linhas)
+
+    if adaptar_ssim_gol:
+        with etapa('transformacao.adaptacao_gol', linhas=len(resultado)):
+            resultado = compilar_pipeline(adaptar_ssim_gol=True).transformar(resultado)
+    return resultado
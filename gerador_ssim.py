@@ -0,0 +1,222 @@
+# -*- coding: utf-8 -*-
+# Gerador SSIM - Núcleo de geração (sem dependência do Streamlit)
+# Filtragem por companhia, montagem do arquivo SSIM e geração em lote
+
+from datetime import datetime
+
+from pipeline_ssim import compilar_pipeline
+from instrumentacao import etapa
+from paralelo_ssim import transformar_linhas3_paralelo, transformar_posicoes_paralelo
+from temporada import indexar_temporada
+from filtros_voos import obter_indice_filtros
+
+
+def extrair_companhias_do_ssim(dados_json):
+    """Extrai lista única de companhias aéreas dos dados SSIM"""
+    companhias = set()
+    
+    for item in dados_json:
+        if isinstance(item, dict) and 'ssimfile' in item:
+            linha = item['ssimfile']
+            if linha and linha.startswith('3 ') and len(linha) > 5:
+                # Extrai o código da companhia (posições 2-3 na linha)
+                codigo_cia = linha[2:4].strip()
+                if codigo_cia and codigo_cia.replace(' ', '').isalnum():
+                    companhias.add(codigo_cia)
+    
+    return sorted(list(companhias))
+
+def filtrar_dados_por_companhia(dados_json, codigo_companhia, converter_para_brasilia=False, df_airports=None, adaptar_ssim_gol=False, indice_temporada=None, processos=1, usar_fuso_iana=False, filtro_voos=None):
+    """Filtra dados SSIM por código da companhia aérea com opção de adaptação para padrão SSIM GOL"""
+    linhas_header, linhas_filtradas = selecionar_linhas_companhia(
+        dados_json, codigo_companhia, converter_para_brasilia, df_airports,
+        adaptar_ssim_gol, indice_temporada, processos, usar_fuso_iana, filtro_voos
+    )
+    return montar_arquivo_ssim(linhas_header, linhas_filtradas, codigo_companhia)
+
+def selecionar_linhas_companhia(dados_json, codigo_companhia, converter_para_brasilia=False, df_airports=None, adaptar_ssim_gol=False, indice_temporada=None, processos=1, usar_fuso_iana=False, filtro_voos=None):
+    """
+    Retorna (headers, linhas 3 transformadas) da companhia, antes da montagem do arquivo.
+    Com `filtro_voos` (FiltroVoos) os registros também são restritos por aeroporto, rota,
+    equipamento e datas, pelos índices de filtros da temporada.
+    """
+    with etapa('filtragem') as medicao:
+        linhas_filtradas = []
+        linhas_header = []
+        
+        if filtro_voos is not None and filtro_voos.ativo and indice_temporada is None:
+            # Filtros além da companhia são respondidos pelos índices: indexa a temporada primeiro
+            indice_temporada = indexar_temporada(dados_json)
+        
+        if indice_temporada is not None:
+            # Índice da temporada: percorre apenas os registros 3 da companhia
+            linhas_header = list(indice_temporada.linhas_header)
+            posicoes = indice_temporada.posicoes(codigo_companhia)
+            if filtro_voos is not None and filtro_voos.ativo:
+                # Interseção das listas de posições de cada filtro (sem varrer as linhas)
+                posicoes = obter_indice_filtros(dados_json, indice_temporada).posicoes_filtradas(
+                    filtro_voos, None if codigo_companhia == "TODAS" else posicoes
+                )
+            
+            # ✅ DADOS ORIGINAIS DA ANAC - conversões aplicadas em lote sobre as colunas fixas
+            linhas_filtradas = transformar_posicoes_paralelo(
+                dados_json,
+                posicoes,
+                df_airports,
+                converter_para_brasilia,
+                adaptar_ssim_gol,
+                processos,
+                usar_fuso_iana
+            )
+        else:
+            # Opções resolvidas uma única vez (padrões compilados por companhia)
+            transformar_linha = compilar_pipeline(df_airports, converter_para_brasilia, adaptar_ssim_gol)
+            # Fusos IANA: as linhas são separadas aqui e convertidas em lote no final
+            conversao_em_lote = converter_para_brasilia and usar_fuso_iana
+            if conversao_em_lote:
+                transformar_linha = str
+            
+            # Separar headers e linhas de dados
+            for item in dados_json:
+                if isinstance(item, dict) and 'ssimfile' in item:
+                    linha = item['ssimfile']
+                    if linha:
+                        # Headers (linhas que começam com 1, 2, ou são zeros)
+                        if linha.startswith(('1', '2')):
+                            linhas_header.append(linha)
+                        elif linha.startswith('0'):
+                            # Pular linhas de zeros do header original
+                            continue
+                        # Dados de voos (linhas que começam com 3)
+                        elif linha.startswith('3 ') and len(linha) > 5:
+                            if codigo_companhia == "TODAS":
+                                # Se for "TODAS", incluir todas as linhas
+                                # ✅ DADOS ORIGINAIS DA ANAC - conversões solicitadas aplicadas pelo pipeline
+                                linhas_filtradas.append(transformar_linha(linha))
+                            else:
+                                # Filtrar por companhia específica
+                                codigo_linha = linha[2:4].strip()
+                                if codigo_linha == codigo_companhia:
+                                    # ✅ DADOS ORIGINAIS DA ANAC - conversões solicitadas aplicadas pelo pipeline
+                                    linhas_filtradas.append(transformar_linha(linha))
+            
+            if conversao_em_lote:
+                linhas_filtradas = transformar_linhas3_paralelo(
+                    linhas_filtradas, df_airports, converter_para_brasilia, adaptar_ssim_gol, processos, usar_fuso_iana
+                )
+        
+        medicao.linhas = len(linhas_filtradas)
+    
+    return linhas_header, linhas_filtradas
+
+def montar_arquivo_ssim(linhas_header, linhas_filtradas, codigo_companhia):
+    """Monta o arquivo SSIM: headers, zeros, linhas 3 renumeradas, zeros e linha 5"""
+    return list(gerar_linhas_arquivo_ssim(linhas_header, linhas_filtradas, codigo_companhia))
+
+def gerar_linhas_arquivo_ssim(linhas_header, linhas_filtradas, codigo_companhia):
+    """Gera as linhas do arquivo SSIM uma a uma (mesmo conteúdo de montar_arquivo_ssim)"""
+    numero_linha = 1
+    
+    # Adicionar headers existentes com zeros entre linha 1 e 2
+    for i, header in enumerate(linhas_header):
+        yield header
+        numero_linha += 1
+        
+        # Se for a primeira linha (linha 1), adicionar 4 linhas de zeros
+        if i == 0:  # Após a primeira linha (linha 1)
+            for _ in range(4):
+                zeros_line = "0" * 200
+                yield zeros_line
+                numero_linha += 1
+    
+    # Adicionar linhas de dados com numeração sequencial corrigida
+    for linha_data in linhas_filtradas:
+        # ✅ PRESERVAR DADOS (com melhorias se solicitadas) - apenas renumerar
+        if linha_data.startswith('4'):
+            # Registro 4: dados vão até a coluna 194, só o número de 6 dígitos (colunas 195-200) é regravado
+            nova_linha = linha_data[:194] + f"{numero_linha:06}"
+        else:
+            nova_linha = linha_data[:192] + f"{numero_linha:08}"  # Últimos 8 caracteres são o número da linha
+        yield nova_linha
+        numero_linha += 1
+    
+    # Adicionar 4 linhas de zeros antes da linha 5
+    for _ in range(4):
+        zeros_line = "0" * 200
+        yield zeros_line
+        numero_linha += 1
+    
+    # Adicionar linha 5 (final) com data atual e numeração
+    data_emissao = datetime.now().strftime("%d%b%y").upper()
+    
+    # Obter código da companhia para linha 5
+    codigo_para_linha5 = codigo_companhia if codigo_companhia != "TODAS" else "XX"
+    if len(codigo_para_linha5) > 2:
+        codigo_para_linha5 = codigo_para_linha5[:2]
+    
+    linha_5_conteudo = f"5 {codigo_para_linha5} {data_emissao}"
+    
+    # Formato correto: número da última linha 3 + E + número da linha 5 atual
+    # numero_linha já está na linha 5, então a última linha 3 foi numero_linha - 5 (4 zeros + linha 5)
+    numero_ultima_linha3 = numero_linha - 5  # Última linha 3 antes dos 4 zeros
+    numero_linha_str_e = f"{numero_ultima_linha3:06}E"
+    numero_linha_str_final = f"{numero_linha:06}"
+    
+    # Calcular espaços para manter 200 caracteres
+    espacos_necessarios = 200 - len(linha_5_conteudo) - len(numero_linha_str_e) - len(numero_linha_str_final)
+    linha_5 = linha_5_conteudo + (' ' * espacos_necessarios) + numero_linha_str_e + numero_linha_str_final
+    yield linha_5
+
+def gerar_arquivos_por_companhia(dados_json, indice_temporada, companhias=None, incluir_todas=True,
+                                 converter_para_brasilia=False, df_airports=None, adaptar_ssim_gol=False,
+                                 processos=1, usar_fuso_iana=False, filtro_voos=None):
+    """
+    Gera os arquivos SSIM de várias companhias (e a malha "TODAS") em uma única passada:
+    cada registro 3 é transformado uma só vez e distribuído para o arquivo da sua companhia.
+    Produz pares (codigo_companhia, gerador de linhas), com o mesmo conteúdo de
+    filtrar_dados_por_companhia.
+    Com `processos` > 1 as transformações são divididas entre processos trabalhadores.
+    Com `usar_fuso_iana` a conversão para Brasília usa os fusos IANA dos aeroportos.
+    Com `filtro_voos` (FiltroVoos) todos os arquivos ficam restritos aos registros do filtro.
+    """
+    if companhias is None:
+        companhias = indice_temporada.companhias
+    
+    # Só transforma o que vai para algum arquivo
+    if incluir_todas:
+        posicoes = indice_temporada.posicoes_linha3
+    else:
+        posicoes = sorted(int(p) for codigo in companhias for p in indice_temporada.posicoes(codigo))
+    if filtro_voos is not None and filtro_voos.ativo:
+        posicoes = obter_indice_filtros(dados_json, indice_temporada).posicoes_filtradas(filtro_voos, posicoes)
+    
+    linhas_transformadas = transformar_posicoes_paralelo(
+        dados_json, posicoes, df_airports, converter_para_brasilia, adaptar_ssim_gol, processos, usar_fuso_iana
+    )
+    
+    # Distribuir as linhas transformadas pela companhia (as transformações preservam as posições 2-4;
+    # com fusos IANA um registro original pode gerar mais de uma linha)
+    por_companhia = {codigo: [] for codigo in companhias}
+    for linha_transformada in linhas_transformadas:
+        linhas_cia = por_companhia.get(linha_transformada[2:4].strip())
+        if linhas_cia is not None:
+            linhas_cia.append(linha_transformada)
+    
+    linhas_header = list(indice_temporada.linhas_header)
+    if incluir_todas:
+        yield "TODAS", gerar_linhas_arquivo_ssim(linhas_header, linhas_transformadas, "TODAS")
+    for codigo in companhias:
+        yield codigo, gerar_linhas_arquivo_ssim(linhas_header, por_companhia[codigo], codigo)
+
+def gerar_nome_arquivo(codigo_companhia, temporada, horario_brasilia=False, padrao_gol=False, filtro_voos=None):
+    """Gera nome do arquivo baseado na companhia e temporada (e nos filtros de voos, se houver)"""
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    if filtro_voos is not None:
+        temporada = f"{temporada}{filtro_voos.sufixo_arquivo()}"
+    sufixo_horario = "_HORARIO_BRASILIA" if horario_brasilia else "_HORARIO_LOCAL"
+    sufixo_padrao = "_PADRAO_SSIM_GOL" if padrao_gol else "_PADRAO_ANAC"
+    
+    if codigo_companhia == "TODAS":
+        return f"ssim_TODAS_COMPANHIAS_{temporada}{sufixo_horario}{sufixo_padrao}_{timestamp}.ssim"
+    else:
+        return f"ssim_{codigo_companhia}_{temporada}{sufixo_horario}{sufixo_padrao}_{timestamp}.ssim"
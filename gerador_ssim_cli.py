@@ -0,0 +1,372 @@
+# -*- coding: utf-8 -*-
+# Gerador SSIM - Linha de comando (geração em lote, sem Streamlit)
+# Gera os arquivos SSIM de todas as companhias de uma temporada em uma única passada
+#
+# Exemplos:
+#   python gerador_ssim_cli.py --temporada W25
+#   python gerador_ssim_cli.py --temporada W25 --horario-brasilia --companhias G3 AD LA
+#   python gerador_ssim_cli.py --temporada W25 --entrada resposta_api.json --saida malhas/
+#   python gerador_ssim_cli.py --temporada W25 --companhias G3 --estacao GRU --de 2025-12-20 --ate 2025-12-31
+#   python gerador_ssim_cli.py --temporada W25 --exportar parquet
+#   python gerador_ssim_cli.py --temporada W25 --comparar-com cache --companhias G3
+#   python gerador_ssim_cli.py --arquivo-ssim malha_companhia.ssim.gz --horario-brasilia --padrao-gol
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import requests
+
+from referencias import IndiceAeroportos
+from temporada import indexar_temporada
+from api_anac import baixar_registros_temporada, decodificar_blocos, baixar_linhas_temporada
+from cache_temporadas import CacheTemporadas
+from temporada_compacta import TemporadaCompacta
+from gerador_ssim import gerar_arquivos_por_companhia, gerar_nome_arquivo
+from filtros_voos import FiltroVoos
+from validacao_ssim import ValidadorSSIM
+from paralelo_ssim import processos_disponiveis
+from escrita_ssim import gravar_arquivo_ssim, nome_com_compressao
+from comparacao_temporadas import ARQUIVOS_DELTA, comparar_temporadas, gerar_arquivos_delta
+from exportacao_colunar import FORMATOS_COLUNARES, ExportadorColunar, nome_exportacao
+from importacao_ssim import ArquivoSSIM
+from instrumentacao import INSTRUMENTACAO
+
+DIRETORIO_SAIDA_PADRAO = 'saida_ssim'
+TAMANHO_BLOCO_LEITURA = 1 << 20
+
+
+def carregar_arquivo_entrada(caminho):
+    """Lê uma resposta da API salva em arquivo (JSON simples ou duplamente codificado)"""
+    with open(caminho, encoding='utf-8') as arquivo:
+        blocos = iter(lambda: arquivo.read(TAMANHO_BLOCO_LEITURA), '')
+        return list(decodificar_blocos(blocos))
+
+
+def baixar_temporada_compacta(temporada):
+    """Baixa a temporada direto para o buffer compacto em memória (sem a lista de registros)"""
+    return baixar_registros_temporada(
+        temporada, destino=lambda temporada, registros: TemporadaCompacta.de_dados_api(registros)
+    )
+
+
+def carregar_temporada(temporada, usar_cache=True):
+    """Carrega a temporada do cache local em disco ou direto da API"""
+    if not usar_cache:
+        return baixar_temporada_compacta(temporada), 'API'
+
+    # Cópia local mapeada com mmap: sem decodificar JSON e compartilhada com os trabalhadores
+    cache = CacheTemporadas()
+    metadados = cache.metadados(temporada)
+    if metadados is not None and not cache.expirado(metadados):
+        mapeada, metadados = cache.carregar_mapeada(temporada)
+        if mapeada is not None:
+            return mapeada, f"cache local ({metadados['baixado_em']})"
+
+    # Sem cópia local ou cópia expirada: revalida na API (requisição condicional)
+    cache.atualizar(temporada, baixar_linhas_temporada)
+    mapeada, metadados = cache.carregar_mapeada(temporada)
+    if mapeada is None:
+        return baixar_temporada_compacta(temporada), 'API'
+    return mapeada, 'API'
+
+
+def carregar_dados(args, temporada):
+    """(dados, índice) da temporada, do arquivo --entrada, do cache local ou da API (None em caso de erro)"""
+    try:
+        if args.entrada:
+            dados_json, origem = carregar_arquivo_entrada(args.entrada), args.entrada
+        else:
+            dados_json, origem = carregar_temporada(temporada, usar_cache=not args.sem_cache)
+    except json.JSONDecodeError:
+        print("❌ Erro ao fazer parse do JSON da API", file=sys.stderr)
+        return None
+    except requests.exceptions.Timeout:
+        print("❌ Timeout na consulta à API. Tente novamente.", file=sys.stderr)
+        return None
+    except requests.exceptions.RequestException as e:
+        print(f"❌ Erro na requisição: {str(e)}", file=sys.stderr)
+        return None
+    except OSError as e:
+        print(f"❌ Erro ao ler o arquivo de entrada: {str(e)}", file=sys.stderr)
+        return None
+
+    indice_temporada = indexar_temporada(dados_json)
+    print(f"✅ {len(dados_json)} registros carregados ({origem})")
+    return dados_json, indice_temporada
+
+
+def carregar_aeroportos(caminho='airport.csv'):
+    """Carrega o índice de aeroportos (None se o CSV não existir)"""
+    try:
+        return IndiceAeroportos.de_csv(caminho)
+    except FileNotFoundError:
+        return None
+
+
+def criar_parser():
+    parser = argparse.ArgumentParser(
+        description="Gera arquivos SSIM por companhia a partir da API SIROS da ANAC."
+    )
+    parser.add_argument('--temporada', help="Temporada (ex: W25, S25); com --arquivo-ssim, padrão: a do registro 2")
+    parser.add_argument('--entrada', help="Arquivo JSON com a resposta da API (não consulta a API)")
+    parser.add_argument('--arquivo-ssim', metavar='CAMINHO',
+                        help="Converte um arquivo SSIM próprio (texto, .gz ou .zip) em vez da API, lido em "
+                             "streaming (cada arquivo gerado relê a entrada; não aceita filtros de voos nem --comparar-com)")
+    parser.add_argument('--saida', default=DIRETORIO_SAIDA_PADRAO,
+                        help=f"Diretório de saída (padrão: {DIRETORIO_SAIDA_PADRAO})")
+    parser.add_argument('--companhias', nargs='+', metavar='CODIGO',
+                        help="Gera apenas estas companhias (padrão: todas)")
+    parser.add_argument('--sem-todas', action='store_true',
+                        help="Não gera o arquivo com todas as companhias (TODAS)")
+    parser.add_argument('--horario-brasilia', action='store_true',
+                        help="Converte os horários para o horário de Brasília (UTC-3)")
+    parser.add_argument('--fuso-iana', action='store_true',
+                        help="Com --horario-brasilia, converte pelos fusos IANA dos aeroportos "
+                             "(horário de verão, fusos de meia hora e virada de dia)")
+    parser.add_argument('--padrao-gol', action='store_true',
+                        help="Adapta os registros para o padrão SSIM GOL")
+    parser.add_argument('--compressao', choices=['gzip', 'zip'],
+                        help="Grava os arquivos compactados (.ssim.gz ou .zip)")
+    parser.add_argument('--processos', type=int, default=1, metavar='N',
+                        help="Processos para as conversões (padrão: 1; 0 = todas as CPUs)")
+    parser.add_argument('--instrumentacao', metavar='JSON',
+                        help="Grava tempos por etapa e contadores (fallbacks, erros ignorados) neste arquivo")
+    parser.add_argument('--sem-cache', action='store_true',
+                        help="Ignora o cache local e consulta a API")
+    parser.add_argument('--sem-validacao', action='store_true',
+                        help="Não valida os arquivos gerados (tamanho, numeração, trailer, datas, horários, aeroportos)")
+    parser.add_argument('--exportar', choices=list(FORMATOS_COLUNARES),
+                        help="Exporta também os registros 3 em colunas tipadas (Parquet ou Arrow IPC), "
+                             "em diretórios companhia=XX")
+    parser.add_argument('--comparar-com', metavar='ANTERIOR',
+                        help="Gera só as diferenças em relação a outra versão da temporada: arquivo JSON da API "
+                             "ou 'cache' (versão substituída no último download)")
+    filtros = parser.add_argument_group('filtros de voos', "Restringem os registros 3 de todos os arquivos gerados")
+    filtros.add_argument('--estacao', metavar='IATA', help="Voos com origem ou destino no aeroporto (ex: GRU)")
+    filtros.add_argument('--rota', metavar='ORIGEM-DESTINO', help="Voos entre os dois aeroportos, nos dois sentidos (ex: GRU-SDU)")
+    filtros.add_argument('--origem', metavar='IATA', help="Voos que partem do aeroporto")
+    filtros.add_argument('--destino', metavar='IATA', help="Voos que chegam ao aeroporto")
+    filtros.add_argument('--equipamento', metavar='CODIGO', help="Voos com o equipamento (código IATA, ex: 738)")
+    filtros.add_argument('--de', metavar='AAAA-MM-DD', help="Voos que operam a partir desta data")
+    filtros.add_argument('--ate', metavar='AAAA-MM-DD', help="Voos que operam até esta data")
+    return parser
+
+
+def carregar_versao_anterior(origem, temporada):
+    """Versão anterior da temporada: resposta da API salva em JSON ou a versão guardada no cache"""
+    if origem == 'cache':
+        linhas, metadados = CacheTemporadas().carregar_anterior(temporada)
+        if linhas is None:
+            return None, None
+        return TemporadaCompacta.de_linhas(linhas), f"cache local ({metadados['baixado_em']})"
+    return carregar_arquivo_entrada(origem), origem
+
+
+def gerar_diferencas(args, temporada, dados_json, indice_temporada, companhias, df_airports, processos, filtro_voos):
+    """Compara com a versão anterior e grava os arquivos DELTA e REMOVIDOS de cada companhia"""
+    try:
+        dados_anteriores, origem = carregar_versao_anterior(args.comparar_com, temporada)
+    except json.JSONDecodeError:
+        print("❌ Erro ao fazer parse do JSON da versão anterior", file=sys.stderr)
+        return 1
+    except OSError as e:
+        print(f"❌ Erro ao ler a versão anterior: {str(e)}", file=sys.stderr)
+        return 1
+    if dados_anteriores is None:
+        print(f"⚠️ Nenhuma versão anterior da temporada {temporada} no cache local", file=sys.stderr)
+        return 1
+
+    comparacao = comparar_temporadas(dados_anteriores, dados_json, indice_atual=indice_temporada)
+    print(f"🔀 Comparado com {origem}")
+    resumo = comparacao.resumo()
+    for linha in resumo.itertuples(index=False):
+        if linha.incluidos or linha.removidos or linha.alterados:
+            print(f"   {linha.companhia}: +{linha.incluidos} -{linha.removidos} ~{linha.alterados} "
+                  f"({linha.inalterados} inalterados)")
+    if comparacao.vazia:
+        print("✅ Nenhuma diferença nos registros 3")
+        return 0
+
+    codigos = companhias if args.companhias else ["TODAS"]
+    total_arquivos = 0
+    for codigo_companhia in codigos:
+        arquivos = gerar_arquivos_delta(
+            comparacao, codigo_companhia, args.horario_brasilia, df_airports, args.padrao_gol,
+            processos, args.fuso_iana, filtro_voos
+        )
+        for tipo, linhas in arquivos:
+            nome_arquivo = gerar_nome_arquivo(
+                codigo_companhia, f"{temporada}_{tipo}", args.horario_brasilia, args.padrao_gol, filtro_voos
+            )
+            caminho = os.path.join(args.saida, nome_com_compressao(nome_arquivo, args.compressao))
+            validador = None if args.sem_validacao else ValidadorSSIM(df_airports)
+            if validador is not None:
+                linhas = validador.verificar(linhas)
+            total_linhas = gravar_arquivo_ssim(linhas, caminho, args.compressao, nome_interno=nome_arquivo)
+            total_arquivos += 1
+            print(f"📄 {os.path.basename(caminho)}: {total_linhas} linhas - {ARQUIVOS_DELTA[tipo]}")
+            if validador is not None:
+                for mensagem in validador.concluir().resumo():
+                    print(f"   {mensagem}", file=sys.stderr)
+    print(f"🎉 {total_arquivos} arquivos de diferenças gerados em '{args.saida}'")
+    return 0
+
+
+def main(argv=None):
+    parser = criar_parser()
+    args = parser.parse_args(argv)
+    if args.arquivo_ssim and args.entrada:
+        parser.error("use --entrada ou --arquivo-ssim, não os dois")
+    if not args.temporada and not args.arquivo_ssim:
+        parser.error("informe --temporada (ou --arquivo-ssim)")
+    temporada = (args.temporada or '').strip().upper()
+    try:
+        filtro_voos = FiltroVoos(
+            args.estacao, args.rota, args.origem, args.destino, args.equipamento, args.de, args.ate
+        ).normalizado()
+    except ValueError as e:
+        print(f"❌ Filtro inválido: {str(e)}", file=sys.stderr)
+        return 1
+    inicio = time.perf_counter()
+    if args.instrumentacao:
+        INSTRUMENTACAO.ativa = True
+
+    arquivo_ssim = None
+    if args.arquivo_ssim:
+        if filtro_voos.ativo or args.comparar_com:
+            print("❌ Filtros de voos e --comparar-com não se aplicam a --arquivo-ssim", file=sys.stderr)
+            return 1
+        try:
+            # Primeira passada: só headers e contagens ficam em memória
+            arquivo_ssim = ArquivoSSIM(args.arquivo_ssim).examinar()
+        except (OSError, ValueError) as e:
+            print(f"❌ Erro ao ler o arquivo SSIM: {str(e)}", file=sys.stderr)
+            return 1
+        temporada = temporada or arquivo_ssim.temporada
+        print(f"✅ {arquivo_ssim.registros_por_tipo['3']} registros 3 e {arquivo_ssim.registros_por_tipo['4']} "
+              f"registros 4 em {arquivo_ssim.total_linhas} linhas ({args.arquivo_ssim})")
+        companhias_disponiveis = arquivo_ssim.companhias
+        voos_por_companhia = arquivo_ssim.voos_por_companhia
+    else:
+        carregada = carregar_dados(args, temporada)
+        if carregada is None:
+            return 1
+        dados_json, indice_temporada = carregada
+        companhias_disponiveis = indice_temporada.companhias
+        voos_por_companhia = indice_temporada.voos_por_companhia
+
+    if not companhias_disponiveis:
+        print("⚠️ Nenhuma companhia encontrada nos dados", file=sys.stderr)
+        return 1
+
+    companhias = companhias_disponiveis
+    if args.companhias:
+        solicitadas = [codigo.strip().upper() for codigo in args.companhias]
+        ausentes = [codigo for codigo in solicitadas if codigo not in voos_por_companhia]
+        for codigo in ausentes:
+            print(f"⚠️ Companhia {codigo} não encontrada na temporada {temporada}", file=sys.stderr)
+        companhias = [codigo for codigo in solicitadas if codigo not in ausentes]
+
+    df_airports = None
+    if args.horario_brasilia:
+        df_airports = carregar_aeroportos()
+        if df_airports is None:
+            print("⚠️ Arquivo 'airport.csv' não encontrado. Horários mantidos em UTC.", file=sys.stderr)
+    elif args.fuso_iana:
+        print("⚠️ --fuso-iana só tem efeito com --horario-brasilia.", file=sys.stderr)
+
+    processos = args.processos if args.processos > 0 else processos_disponiveis()
+
+    os.makedirs(args.saida, exist_ok=True)
+    if args.comparar_com:
+        return gerar_diferencas(
+            args, temporada, dados_json, indice_temporada, companhias, df_airports, processos, filtro_voos
+        )
+
+    exportador = None
+    if args.exportar:
+        # Um conjunto só: do arquivo TODAS ou, com --sem-todas, dos arquivos das companhias
+        codigo_exportacao = '_'.join(companhias) if args.sem_todas and args.companhias else 'TODAS'
+        nome_base = nome_exportacao(
+            gerar_nome_arquivo(codigo_exportacao, temporada, args.horario_brasilia, args.padrao_gol, filtro_voos), args.exportar
+        )
+        try:
+            exportador = ExportadorColunar(os.path.join(args.saida, nome_base), args.exportar)
+        except RuntimeError as e:
+            print(f"❌ {str(e)}", file=sys.stderr)
+            return 1
+
+    if arquivo_ssim is not None:
+        # Arquivo próprio: registros 3 transformados em lotes enquanto cada arquivo é gravado
+        arquivos = arquivo_ssim.gerar_arquivos(
+            companhias=companhias,
+            incluir_todas=not args.sem_todas,
+            converter_para_brasilia=args.horario_brasilia,
+            df_airports=df_airports,
+            adaptar_ssim_gol=args.padrao_gol,
+            processos=processos,
+            usar_fuso_iana=args.fuso_iana,
+        )
+    else:
+        arquivos = gerar_arquivos_por_companhia(
+            dados_json,
+            indice_temporada,
+            companhias=companhias,
+            incluir_todas=not args.sem_todas,
+            converter_para_brasilia=args.horario_brasilia,
+            df_airports=df_airports,
+            adaptar_ssim_gol=args.padrao_gol,
+            processos=processos,
+            usar_fuso_iana=args.fuso_iana,
+            filtro_voos=filtro_voos,
+        )
+
+    total_arquivos = 0
+    arquivos_invalidos = 0
+    for codigo_companhia, linhas in arquivos:
+        nome_arquivo = gerar_nome_arquivo(
+            codigo_companhia, temporada, args.horario_brasilia, args.padrao_gol, filtro_voos
+        )
+        # Linhas geradas sob demanda e gravadas direto no disco
+        caminho = os.path.join(args.saida, nome_com_compressao(nome_arquivo, args.compressao))
+        validador = None if args.sem_validacao else ValidadorSSIM(df_airports)
+        if validador is not None:
+            # Validado em lotes enquanto é gravado
+            linhas = validador.verificar(linhas)
+        if exportador is not None and (codigo_companhia == 'TODAS' or args.sem_todas):
+            # Exportado enquanto é gravado: o arquivo TODAS já tem todas as companhias
+            linhas = exportador.repassar(linhas)
+        total_linhas = gravar_arquivo_ssim(linhas, caminho, args.compressao, nome_interno=nome_arquivo)
+        total_arquivos += 1
+        print(f"📄 {os.path.basename(caminho)}: {total_linhas} linhas")
+        if validador is not None:
+            relatorio = validador.concluir()
+            arquivos_invalidos += not relatorio.valido
+            for mensagem in relatorio.resumo():
+                print(f"   {mensagem}", file=sys.stderr)
+
+    if exportador is not None:
+        registros = sum(exportador.concluir().values())
+        print(f"🧮 {os.path.basename(exportador.diretorio)}: {registros} registros ({args.exportar}, por companhia)")
+
+    if df_airports is not None and df_airports.codigos_nao_encontrados:
+        codigos = ', '.join(sorted(df_airports.codigos_nao_encontrados))
+        print(f"⚠️ Aeroportos sem fuso (assumido UTC-3): {codigos}", file=sys.stderr)
+
+    if args.instrumentacao:
+        with open(args.instrumentacao, 'w', encoding='utf-8') as arquivo:
+            arquivo.write(INSTRUMENTACAO.para_json())
+        print(f"📈 Instrumentação salva em '{args.instrumentacao}'")
+
+    duracao = time.perf_counter() - inicio
+    print(f"🎉 {total_arquivos} arquivos gerados em '{args.saida}' ({duracao:.1f}s)")
+    if arquivos_invalidos:
+        print(f"⚠️ {arquivos_invalidos} arquivos com registros fora do padrão SSIM (veja acima)", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
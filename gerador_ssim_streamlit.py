@@ -9,530 +9,558 @@
 # v1.0.04 - PRESERVAÇÃO 100% DADOS ORIGINAIS ANAC - removidas modificações nos campos
 # v1.0.05 - ADAPTAÇÃO PADRÃO SSIM GOL - melhoria campos onward carriage e service information
 
+import time
+_INICIO_IMPORTACAO = time.perf_counter()  # Tempo de partida: importações da interface
+
 import streamlit as st
-import requests
-import pandas as pd
 import json
 import os
 from io import StringIO
 import re
 from datetime import datetime
 import tempfile
-import urllib3
-
-# Configurar warnings SSL
-urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+from pathlib import Path
+import itertools
+from collections import Counter
+from concurrent.futures import wait
 
-# --- Configuração da página ---
-st.set_page_config(
-    page_title="Gerador SSIM - ANAC API v1.0.05",
-    page_icon="✈️",
-    layout="wide",
-    initial_sidebar_state="expanded"
+from referencias import IndiceAeroportos, IndiceCompanhias
+from temporada import indexar_temporada
+from api_anac import baixar_temporadas, baixar_linhas_temporada, iterar_linhas_ssim, ProgressoDownloads
+from cache_temporadas import CacheTemporadas
+from cache_resultados import CacheResultados, ResultadoFiltragem
+from temporada_compacta import TemporadaCompacta, TemporadasCompartilhadas
+from operacoes_datadas import OperacoesTemporada
+from filtros_voos import FiltroVoos, obter_indice_filtros
+from validacao_ssim import ValidadorSSIM
+from gerador_ssim import (
+    selecionar_linhas_companhia,
+    gerar_linhas_arquivo_ssim,
+    gerar_nome_arquivo,
+)
+from escrita_ssim import (
+    ArquivoTemporario,
+    gravar_arquivo_temporario,
+    nome_com_compressao,
+    remover_temporarios_antigos,
+    tipo_mime,
 )
+from comparacao_temporadas import ARQUIVOS_DELTA, comparar_temporadas, gerar_arquivos_delta
+from exportacao_colunar import FORMATOS_COLUNARES, gravar_exportacao_temporaria, nome_exportacao
+from importacao_ssim import ArquivoSSIM, EXTENSOES_ARQUIVO
+from instrumentacao import INSTRUMENTACAO, modulo_sob_demanda
+
+# pandas e requests só no primeiro uso: a primeira página é desenhada sem esperar por eles
+pd = modulo_sob_demanda('pandas')
+requests = modulo_sob_demanda('requests')
+INSTRUMENTACAO.registrar_partida('importacao.interface', time.perf_counter() - _INICIO_IMPORTACAO)
+
+# Arquivos de download gerados pelas sessões (removidos com a sessão ou depois de 6 horas)
+DIRETORIO_DOWNLOADS = os.path.join(tempfile.gettempdir(), 'gerador_ssim_downloads')
 
 # --- Funções auxiliares ---
-@st.cache_data(ttl=3600)  # Cache por 1 hora
+@st.cache_resource(ttl=3600)  # Índice somente leitura: o mesmo objeto em todas as execuções (sem cópia)
 def carregar_dados_airlines():
-    """Carrega dados das companhias aéreas do arquivo CSV"""
+    """Carrega dados das companhias aéreas do arquivo CSV e monta o índice de consulta"""
     try:
-        df_airlines = pd.read_csv('iata_airlines.csv')
-        return df_airlines
+        # Índice por IATA/ICAO a partir da tabela binária pré-compilada do CSV
+        return IndiceCompanhias.de_csv('iata_airlines.csv')
     except FileNotFoundError:
         st.warning("⚠️ Arquivo 'iata_airlines.csv' não encontrado. Nomes das companhias podem não ser exibidos.")
         return None
 
 @st.cache_data(ttl=3600)  # Cache por 1 hora
 def carregar_dados_airports():
-    """Carrega dados dos aeroportos do arquivo CSV"""
+    """Carrega dados dos aeroportos do arquivo CSV e monta o índice de consulta"""
     try:
-        df_airports = pd.read_csv('airport.csv')
-        return df_airports
+        # Índice por IATA/ICAO/nome a partir da tabela binária pré-compilada do CSV
+        return IndiceAeroportos.de_csv('airport.csv')
     except FileNotFoundError:
         st.warning("⚠️ Arquivo 'airport.csv' não encontrado. Conversão de horários não estará disponível.")
         return None
 
-def obter_offset_aeroporto(codigo_aeroporto, df_airports):
-    """Obtém o offset UTC de um aeroporto"""
-    if df_airports is None:
-        return -3  # Default para horário de Brasília
-    
-    # Buscar por código IATA
-    resultado = df_airports[df_airports['IATA'] == codigo_aeroporto]
-    if not resultado.empty:
-        return resultado.iloc[0]['Timezone']
-    
-    # Se não encontrar, retorna -3 (Brasília)
-    return -3
-
-def ajustar_formato_ssim(linha_ssim):
-    """Ajusta formato SSIM para repetir código da companhia aérea na posição específica"""
-    if not linha_ssim.startswith('3 '):
-        return linha_ssim
-    
-    try:
-        # Extrair código da companhia (posições 2-4)
-        codigo_cia = linha_ssim[2:4].strip()
-        
-        # Procurar o padrão no final: [muitos espaços] + codigo_cia + espaço + número
-        # Exemplo: "                                                              AF 0415"
-        
-        # Procurar por 30+ espaços seguidos do código da CIA e número do voo
-        padrao = f"( {{30,}}){codigo_cia} (\\d{{4}})"
-        match = re.search(padrao, linha_ssim)
-        
-        if match:
-            # Encontrou! Vamos substituir
-            espacos_originais = match.group(1)  # Os espaços antes do código
-            numero_voo = match.group(2)  # O número do voo
-            
-            # Remover 9 espaços e inserir "AF       " (AF + 7 espaços)
-            if len(espacos_originais) >= 15:  # Garantir que tem espaços suficientes
-                # Calcular: 62 espaços originais - 9 = 53 espaços antes do novo AF
-                espacos_antes_novo_af = len(espacos_originais) - 9
-                
-                if espacos_antes_novo_af > 0:
-                    # Construir: 53_espaços + AF + 7_espaços + AF_0415
-                    novo_formato = f"{' ' * espacos_antes_novo_af}{codigo_cia}{' ' * 7}{codigo_cia} {numero_voo}"
-                    
-                    # Substituir na linha original
-                    linha_ajustada = linha_ssim.replace(
-                        f"{espacos_originais}{codigo_cia} {numero_voo}",
-                        novo_formato
-                    )
-                    return linha_ajustada
-        
-        # Se não encontrou o padrão padrão, tentar abordagem mais geral
-        # Procurar qualquer sequência longa de espaços
-        match_espacos = re.search(r' {25,}', linha_ssim)
-        if match_espacos:
-            espacos_encontrados = match_espacos.group(0)
-            
-            # Verificar se após os espaços tem o código da CIA
-            pos_fim_espacos = match_espacos.end()
-            resto_linha = linha_ssim[pos_fim_espacos:]
-            
-            if resto_linha.startswith(f"{codigo_cia} "):
-                # Encontrou! Fazer a substituição
-                if len(espacos_encontrados) >= 15:
-                    espacos_antes_novo_af = len(espacos_encontrados) - 9
-                    
-                    if espacos_antes_novo_af > 0:
-                        novo_formato = f"{' ' * espacos_antes_novo_af}{codigo_cia}{' ' * 7}"
-                        
-                        linha_ajustada = linha_ssim.replace(
-                            espacos_encontrados,
-                            novo_formato
-                        )
-                        return linha_ajustada
-        
-        # Se não conseguiu ajustar, retorna original
-        return linha_ssim
-        
-    except Exception as e:
-        # Em caso de erro, retorna a linha original
-        return linha_ssim
-
-def converter_horario_ssim(linha_ssim, df_airports, para_brasilia=False):
-    """Converte horários de uma linha SSIM para horário de Brasília"""
-    if not linha_ssim.startswith('3 '):
-        return linha_ssim
-    
-    # Primeiro ajustar o formato (repetir código da CIA)
-    linha_ajustada = ajustar_formato_ssim(linha_ssim)
-    
-    # Se não precisa converter horários, retorna linha ajustada
-    if not para_brasilia:
-        return linha_ajustada
-    
-    # Extrair aeroportos da linha SSIM
-    # Formato: 3 XX NNNNNNNJDDMMMYYDDMMMYYOOOOOOO  AAAHHMM-TTTT  BBBHHMM-TTTT  ...
-    try:
-        # Encontrar posições dos aeroportos e horários
-        partes = linha_ajustada.split()
-        
-        # Buscar padrões de aeroporto + horário (ex: GRU12001200-0300)
-        padrao_aeroporto_horario = re.findall(r'([A-Z]{3})(\d{4})(\d{4})([-+]\d{4})', linha_ajustada)
-        
-        linha_convertida = linha_ajustada
-        
-        for aeroporto, hora_partida, hora_chegada, offset_original in padrao_aeroporto_horario:
-            offset_aeroporto = obter_offset_aeroporto(aeroporto, df_airports)
-            offset_brasilia = -3  # UTC-3
-            
-            # Converter offset format (-0300 para -3)
-            try:
-                offset_atual = int(offset_original[:3])  # -030 -> -3
-            except:
-                offset_atual = offset_aeroporto
-            
-            # Calcular diferença de horas para Brasília
-            diferenca_horas = offset_brasilia - offset_atual
-            
-            if diferenca_horas != 0:
-                # Converter horário de partida
-                try:
-                    hora_part_int = int(hora_partida)
-                    horas_part = hora_part_int // 100
-                    minutos_part = hora_part_int % 100
-                    
-                    # Aplicar diferença
-                    horas_part += diferenca_horas
-                    
-                    # Ajustar se passou de 24h ou ficou negativo
-                    if horas_part >= 24:
-                        horas_part -= 24
-                    elif horas_part < 0:
-                        horas_part += 24
-                    
-                    hora_partida_nova = f"{horas_part:02d}{minutos_part:02d}"
-                    
-                    # Converter horário de chegada
-                    hora_cheg_int = int(hora_chegada)
-                    horas_cheg = hora_cheg_int // 100
-                    minutos_cheg = hora_cheg_int % 100
-                    
-                    # Aplicar diferença
-                    horas_cheg += diferenca_horas
-                    
-                    # Ajustar se passou de 24h ou ficou negativo
-                    if horas_cheg >= 24:
-                        horas_cheg -= 24
-                    elif horas_cheg < 0:
-                        horas_cheg += 24
-                    
-                    hora_chegada_nova = f"{horas_cheg:02d}{minutos_cheg:02d}"
-                    
-                    # Substituir na linha
-                    texto_original = f"{aeroporto}{hora_partida}{hora_chegada}{offset_original}"
-                    texto_novo = f"{aeroporto}{hora_partida_nova}{hora_chegada_nova}-0300"
-                    linha_convertida = linha_convertida.replace(texto_original, texto_novo)
-                    
-                except (ValueError, IndexError):
-                    # Se der erro na conversão, manter original
-                    continue
-        
-        return linha_convertida
-        
-    except Exception:
-        # Se der qualquer erro, retorna a linha ajustada (sem conversão de horário)
-        return linha_ajustada
-
-@st.cache_data(ttl=1800)  # Cache por 30 minutos
-def extrair_dados_api(temporada):
-    """Extrai dados da API da ANAC para uma temporada específica"""
-    url_base = "https://sas.anac.gov.br/sas/siros_api/ssimfile"
-    
-    with st.spinner(f'🔄 Consultando API da ANAC para temporada {temporada}...'):
+def extrair_dados_api(temporadas, destino=None, info_respostas=None):
+    """
+    Baixa da API da ANAC várias temporadas em paralelo (sessão HTTP compartilhada, novas
+    tentativas com espera crescente), com uma barra de progresso por temporada.
+    Os registros vão para `destino(temporada, registros)` à medida que chegam
+    (status, ETag e Last-Modified de cada resposta em `info_respostas`, se informado).
+    Retorna {temporada: resultado do destino} só com as temporadas baixadas com sucesso.
+    """
+    progresso = ProgressoDownloads(temporadas)
+    downloads = baixar_temporadas(temporadas, progresso=progresso, destino=destino, info_respostas=info_respostas)
+    barras = {temporada: st.progress(0.0, text=f"🔄 {temporada}: na fila") for temporada in downloads}
+    
+    def exibir_progresso():
+        for temporada, estado in progresso.instantaneo().items():
+            recebido = f"{estado['bytes'] / (1 << 20):.1f} MB"
+            fracao = 0.0
+            if estado['bytes_totais']:
+                fracao = min(1.0, estado['bytes'] / estado['bytes_totais'])
+                recebido += f" de {estado['bytes_totais'] / (1 << 20):.1f} MB"
+            if estado['estado'] == 'concluída':
+                fracao = 1.0
+            tentativa = f" (tentativa {estado['tentativa']})" if estado['tentativa'] > 1 else ""
+            barras[temporada].progress(fracao, text=f"🔄 {temporada}: {estado['estado']}{tentativa} - {recebido}")
+    
+    # As threads baixam; aqui só se atualiza a interface até todas terminarem
+    pendentes = set(downloads.values())
+    while pendentes:
+        _, pendentes = wait(pendentes, timeout=0.5)
+        exibir_progresso()
+    
+    resultados = {}
+    for temporada, download in downloads.items():
         try:
-            response_api = requests.get(
-                url_base,
-                params={'ds_temporada': temporada},
-                verify=False,
-                timeout=300
-            )
-            response_api.raise_for_status()
-            
-            # Parse do JSON (tratamento para double-escaped JSON)
-            response_text = response_api.text
-            
-            try:
-                primeira_decodificacao = json.loads(response_text)
-                if isinstance(primeira_decodificacao, str):
-                    lista_de_linhas_json = json.loads(primeira_decodificacao)
-                else:
-                    lista_de_linhas_json = primeira_decodificacao
-            except json.JSONDecodeError:
-                st.error("❌ Erro ao fazer parse do JSON da API")
-                return None
-            
-            return lista_de_linhas_json
-            
+            resultados[temporada] = download.result()
+        except json.JSONDecodeError:
+            st.error(f"❌ {temporada}: erro ao fazer parse do JSON da API")
         except requests.exceptions.Timeout:
-            st.error("❌ Timeout na consulta à API. Tente novamente.")
-            return None
+            st.error(f"❌ {temporada}: timeout na consulta à API. Tente novamente.")
         except requests.exceptions.RequestException as e:
-            st.error(f"❌ Erro na consulta à API: {e}")
-            return None
+            st.error(f"❌ {temporada}: erro na consulta à API: {e}")
+    for barra in barras.values():
+        barra.empty()
+    return resultados
 
-def extrair_companhias_do_ssim(dados_json):
-    """Extrai lista única de companhias aéreas dos dados SSIM"""
-    companhias = set()
-    
-    for item in dados_json:
-        if isinstance(item, dict) and 'ssimfile' in item:
-            linha = item['ssimfile']
-            if linha and linha.startswith('3 ') and len(linha) > 5:
-                # Extrai o código da companhia (posições 2-3 na linha)
-                codigo_cia = linha[2:4].strip()
-                if codigo_cia and codigo_cia.replace(' ', '').isalnum():
-                    companhias.add(codigo_cia)
-    
-    return sorted(list(companhias))
+@st.cache_resource
+def obter_cache_temporadas():
+    """Cache de temporadas em disco, compartilhado entre as sessões"""
+    return CacheTemporadas()
 
-def melhorar_campo_informacoes_linha3(linha_ssim):
+@st.cache_resource
+def obter_cache_resultados():
+    """Cache em memória dos arquivos já filtrados e transformados, compartilhado entre as sessões"""
+    return CacheResultados()
+
+def chave_resultado(codigo_companhia, converter_horarios, padrao_ssim, usar_fuso_iana, filtro_voos=None):
+    """Chave do resultado da seleção no cache em memória (None se a temporada não tiver hash de conteúdo)"""
+    indice_temporada = st.session_state.get('indice_temporada')
+    if indice_temporada is None or indice_temporada.hash_conteudo is None:
+        return None
+    return (
+        indice_temporada.hash_conteudo,
+        codigo_companhia,
+        bool(converter_horarios),
+        bool(padrao_ssim),
+        bool(converter_horarios and usar_fuso_iana),
+        filtro_voos,
+    )
+
+def selecionar_linhas_em_cache(codigo_companhia, converter_horarios, df_airports, padrao_ssim, usar_fuso_iana, filtro_voos=None):
     """
-    Melhora o campo de informações adicionais da linha 3 seguindo padrão SSIM
-    Exemplo: Y312 -> Y138VVG373G (baseado no padrão GOL)
+    Headers e linhas 3 transformadas da companhia, reaproveitados entre execuções e sessões
+    para a mesma temporada e opções. As consultas ao índice de aeroportos feitas no cálculo
+    são guardadas junto e repassadas a `df_airports` também nos acertos.
     """
-    if not linha_ssim.startswith('3 '):
-        return linha_ssim
-    
-    # Extrair informações da linha
-    codigo_cia = linha_ssim[2:4].strip()  # Posição 2-3: código da companhia
-    
-    # Encontrar posição do campo de aeronave (geralmente após os aeroportos e horários)
-    # No formato SSIM, o tipo de aeronave está por volta da posição 100-110
-    tipo_aeronave = ""
-    for i in range(100, min(120, len(linha_ssim)-3)):
-        if linha_ssim[i:i+3].strip() and linha_ssim[i:i+3].isalnum():
-            tipo_aeronave = linha_ssim[i:i+3].strip()
-            break
-    
-    # Localizar campo atual de informações (geralmente contém Y seguido de números)
-    campo_info_atual = ""
-    pos_campo_info = -1
-    for i in range(150, min(180, len(linha_ssim)-10)):
-        if linha_ssim[i] == 'Y' and linha_ssim[i+1:i+4].isdigit():
-            # Encontrou campo que começa com Y seguido de números
-            # Extrair até encontrar espaços ou fim
-            j = i
-            while j < len(linha_ssim) and linha_ssim[j] not in [' ', '\t']:
-                j += 1
-            campo_info_atual = linha_ssim[i:j]
-            pos_campo_info = i
-            break
-    
-    if pos_campo_info == -1:
-        return linha_ssim  # Não encontrou campo para melhorar
-    
-    # Criar novo campo de informações baseado no padrão SSIM
-    # Formato: Y + configuração + código aeronave + código companhia
-    configuracao_base = campo_info_atual[1:] if len(campo_info_atual) > 1 else "312"
-    
-    # Se a configuração é muito curta, expandir baseada no tipo de aeronave
-    if len(configuracao_base) < 3:
-        configuracao_base = "312"  # Padrão básico
-    
-    # Criar campo melhorado: Y + config + aeronave_info + companhia
-    if tipo_aeronave:
-        # Adicionar informações como no padrão GOL: Y138VVG373G
-        novo_campo_info = f"Y{configuracao_base}VV{tipo_aeronave}{codigo_cia}"
+    dados_api = st.session_state['dados_api']
+    indice_temporada = st.session_state.get('indice_temporada')
+
+    def calcular():
+        if df_airports is not None:
+            df_airports.zerar_estatisticas()
+        linhas_header, linhas_filtradas = selecionar_linhas_companhia(
+            dados_api, codigo_companhia, converter_horarios, df_airports, padrao_ssim,
+            indice_temporada, usar_fuso_iana=usar_fuso_iana, filtro_voos=filtro_voos
+        )
+        estatisticas = None
+        if df_airports is not None:
+            estatisticas = df_airports.estatisticas()
+            df_airports.zerar_estatisticas()
+        # Tuplas: o mesmo resultado é lido por várias sessões
+        return ResultadoFiltragem(tuple(linhas_header), tuple(linhas_filtradas), estatisticas)
+
+    chave = chave_resultado(codigo_companhia, converter_horarios, padrao_ssim, usar_fuso_iana, filtro_voos)
+    if chave is None:
+        resultado = calcular()
     else:
-        # Padrão básico se não encontrar aeronave
-        novo_campo_info = f"Y{configuracao_base}VV{codigo_cia}"
-    
-    # Substituir na linha, mantendo mesmo tamanho
-    tamanho_original = len(campo_info_atual)
-    if len(novo_campo_info) > tamanho_original:
-        novo_campo_info = novo_campo_info[:tamanho_original]
-    elif len(novo_campo_info) < tamanho_original:
-        novo_campo_info = novo_campo_info + ' ' * (tamanho_original - len(novo_campo_info))
-    
-    linha_melhorada = linha_ssim[:pos_campo_info] + novo_campo_info + linha_ssim[pos_campo_info + tamanho_original:]
-    
-    return linha_melhorada
+        resultado = obter_cache_resultados().obter(chave, calcular)
+
+    if df_airports is not None and resultado.estatisticas_aeroportos is not None:
+        df_airports.mesclar_estatisticas(resultado.estatisticas_aeroportos)
+    return resultado.linhas_header, resultado.linhas_filtradas
 
-def adaptar_para_padrao_ssim_gol(linha_ssim):
+@st.cache_resource
+def obter_temporadas_compartilhadas():
+    """Temporadas compactas em uso, uma única cópia por conteúdo para todas as sessões"""
+    return TemporadasCompartilhadas()
+
+def compartilhar_temporada(temporada_compacta):
     """
-    Adapta dados da ANAC para padrão SSIM da GOL, melhorando campos obrigatórios
+    Indexa a temporada e devolve a cópia compartilhada de mesmo conteúdo (com o índice),
+    para que cada sessão guarde apenas uma referência em session_state.
     """
-    if not linha_ssim.startswith('3 '):
-        return linha_ssim
-    
+    indice = indexar_temporada(temporada_compacta)
+    compartilhada = obter_temporadas_compartilhadas().compartilhar(indice.hash_conteudo, temporada_compacta)
+    if compartilhada.indice is None:
+        compartilhada.indice = indice
+    # Índices de aeroporto, rota, equipamento e períodos: montados uma vez, junto da temporada
+    obter_indice_filtros(compartilhada, compartilhada.indice)
+    return compartilhada
+
+@st.cache_resource(max_entries=4)
+def obter_operacoes_temporada(hash_conteudo, _dados_api, _indice_temporada):
+    """Colunas de operações por data da temporada, montadas uma vez por conteúdo para todas as sessões"""
+    return OperacoesTemporada.de_temporada(_dados_api, _indice_temporada)
+
+def exibir_voos_por_data(codigo_companhia):
+    """Voos datados de um dia (e aeroporto, opcional), sem expandir a temporada inteira"""
+    indice_temporada = st.session_state.get('indice_temporada')
+    if indice_temporada is None:
+        return
+    operacoes = obter_operacoes_temporada(
+        indice_temporada.hash_conteudo, st.session_state['dados_api'], indice_temporada
+    )
+    if not len(operacoes):
+        return
+
+    with st.expander("📅 Voos por data"):
+        primeira_data = pd.Timestamp(operacoes.inicio.min(), unit='D').date()
+        ultima_data = pd.Timestamp(operacoes.fim.max(), unit='D').date()
+        col1, col2 = st.columns(2)
+        with col1:
+            data_consulta = st.date_input(
+                "Data:", value=primeira_data, min_value=primeira_data, max_value=ultima_data
+            )
+        with col2:
+            estacao = st.text_input("Aeroporto (IATA, opcional):", max_chars=3, help="Origem ou destino, ex: GRU")
+
+        selecao = operacoes.selecionar(
+            companhia=None if codigo_companhia == "TODAS" else codigo_companhia,
+            estacao=estacao or None
+        )
+        voos = operacoes.voos_na_data(data_consulta, selecao)
+        st.write(f"**{len(voos)} voos** em {data_consulta.strftime('%d/%m/%Y')} (horários locais)")
+        if len(voos):
+            st.dataframe(voos.drop(columns=['posicao']), hide_index=True)
+
+@st.cache_resource(max_entries=2)
+def obter_comparacao_temporada(temporada, hash_anterior, hash_atual, _dados_atuais, _indice_atual):
+    """Comparação com a versão anterior guardada no cache em disco, uma vez por par de conteúdos"""
+    linhas, _ = obter_cache_temporadas().carregar_anterior(temporada)
+    if linhas is None:
+        return None
+    return comparar_temporadas(TemporadaCompacta.de_linhas(linhas), _dados_atuais, indice_atual=_indice_atual)
+
+def exibir_alteracoes_temporada(codigo_companhia, converter_horarios, df_airports, padrao_ssim, usar_fuso_iana, filtro_voos, compressao):
+    """Incluídos, removidos e alterados desde a versão anterior, com os arquivos SSIM das diferenças"""
+    temporada = st.session_state.get('temporada_atual')
+    indice_temporada = st.session_state.get('indice_temporada')
+    metadados = obter_cache_temporadas().metadados(temporada) if temporada else None
+    anterior = metadados.get('anterior') if metadados else None
+    if indice_temporada is None or not anterior:
+        return
+    comparacao = obter_comparacao_temporada(
+        temporada, anterior['hash'], indice_temporada.hash_conteudo, st.session_state['dados_api'], indice_temporada
+    )
+    if comparacao is None:
+        return
+
+    with st.expander(f"🔀 Alterações desde a versão anterior (baixada em {anterior['baixado_em']})"):
+        resumo = comparacao.resumo()
+        if codigo_companhia != "TODAS":
+            resumo = resumo[resumo['companhia'] == codigo_companhia]
+        st.dataframe(resumo, hide_index=True)
+        registros = comparacao.registros(codigo_companhia, limite=200)
+        if not len(registros):
+            st.write("✅ Nenhuma diferença nos registros desta seleção")
+            return
+        campos = comparacao.campos_alterados()
+        if campos:
+            st.write("**Campos alterados:** " + ", ".join(f"{campo} ({total})" for campo, total in campos.most_common()))
+        st.dataframe(registros, hide_index=True)
+
+        if not st.button("🔀 Gerar arquivos de diferenças"):
+            return
+        arquivos = gerar_arquivos_delta(
+            comparacao, codigo_companhia, converter_horarios, df_airports, padrao_ssim,
+            usar_fuso_iana=usar_fuso_iana, filtro_voos=filtro_voos
+        )
+        for tipo, linhas in arquivos:
+            chave = f"diferencas_{tipo}"
+            remover_arquivo_download(chave)
+            nome_arquivo = gerar_nome_arquivo(codigo_companhia, f"{temporada}_{tipo}", converter_horarios, padrao_ssim, filtro_voos)
+            caminho, total_linhas, _ = gravar_arquivo_temporario(linhas, nome_arquivo, compressao, diretorio_downloads())
+            guardar_arquivo_download(chave, caminho, nome=nome_arquivo, linhas=total_linhas)
+            st.download_button(
+                label=f"📥 Baixar {tipo} ({total_linhas} linhas)",
+                data=conteudo_no_clique(caminho),
+                file_name=nome_com_compressao(nome_arquivo, compressao),
+                mime=tipo_mime(compressao),
+                help=ARQUIVOS_DELTA[tipo],
+                key=f"baixar_{chave}",
+                on_click='ignore'
+            )
+
+def ler_filtro_voos():
+    """Campos opcionais de aeroporto, rota, equipamento e datas (None se nenhum for preenchido)"""
+    with st.expander("🔎 Filtros de voos (opcional)"):
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            estacao = st.text_input("Aeroporto (IATA):", max_chars=3, key="filtro_estacao", help="Origem ou destino, ex: GRU")
+        with col2:
+            rota = st.text_input("Rota:", max_chars=7, key="filtro_rota", help="Par de aeroportos, nos dois sentidos, ex: GRU-SDU")
+        with col3:
+            equipamento = st.text_input("Equipamento:", max_chars=3, key="filtro_equipamento", help="Código IATA, ex: 738")
+        filtrar_datas = st.checkbox("Filtrar por datas de operação", key="filtro_datas")
+        data_inicio = data_fim = None
+        if filtrar_datas:
+            col1, col2 = st.columns(2)
+            with col1:
+                data_inicio = st.date_input("De:", key="filtro_data_inicio")
+            with col2:
+                data_fim = st.date_input("Até:", key="filtro_data_fim")
+
+    filtro = FiltroVoos(estacao=estacao, rota=rota, equipamento=equipamento, data_inicio=data_inicio, data_fim=data_fim)
+    if not filtro.ativo:
+        return None
     try:
-        # Extrair informações básicas
-        codigo_cia = linha_ssim[2:4].strip()
-        
-        # Encontrar posição do tipo de aeronave (geralmente posição ~105-115)
-        tipo_aeronave = ""
-        for i in range(100, min(120, len(linha_ssim)-3)):
-            if linha_ssim[i:i+3].strip() and linha_ssim[i:i+3].isalnum():
-                tipo_aeronave = linha_ssim[i:i+3].strip()
-                break
-        
-        if not tipo_aeronave:
-            tipo_aeronave = "320"  # Default
-        
-        # Melhoria 1: Campo Onward Carriage (posição ~120-140)
-        # Formato ANAC: "LA 0707"
-        # Formato GOL:  "G3       G3 1007"
-        
-        # Encontrar campo onward carriage atual
-        padrao_onward = f"{codigo_cia} \\d{{4}}"
-        match_onward = re.search(padrao_onward, linha_ssim)
-        
-        if match_onward:
-            campo_onward_original = match_onward.group(0)
-            numero_voo = campo_onward_original.split()[1]
-            
-            # Criar novo campo no padrão GOL: "G3       G3 1007"
-            novo_campo_onward = f"{codigo_cia}{' ' * 7}{codigo_cia} {numero_voo}"
-            
-            # Localizar posição para substituição
-            pos_onward = linha_ssim.find(campo_onward_original)
-            if pos_onward > 0:
-                # Calcular espaços antes para manter 200 caracteres
-                espacos_antes = 120  # Posição aproximada do campo onward
-                linha_parte1 = linha_ssim[:espacos_antes]
-                linha_parte2 = linha_ssim[pos_onward + len(campo_onward_original):]
-                
-                # Reconstruir linha
-                linha_ssim = linha_parte1 + novo_campo_onward + linha_parte2
-        
-        # Melhoria 2: Campo Service Information (posição ~170-190)
-        # Formato ANAC: "000"
-        # Formato GOL:  "Y138VVG373G"
-        
-        # Procurar campo de service information (geralmente "000" ou "Y...")
-        padrao_service = r'(000|Y\d+)'
-        match_service = re.search(padrao_service, linha_ssim[150:])
-        
-        if match_service:
-            campo_service_original = match_service.group(0)
-            
-            # Criar novo campo no padrão GOL
-            if tipo_aeronave in ['73G', '73X', '738']:
-                configuracao = "138" if tipo_aeronave == '73G' else "186"
-            elif tipo_aeronave in ['320', '321', '319']:
-                configuracao = "180" if tipo_aeronave == '320' else "224"
-            elif tipo_aeronave in ['789', '788']:
-                configuracao = "304"
-            else:
-                configuracao = "180"  # Default
-            
-            novo_campo_service = f"Y{configuracao}VV{tipo_aeronave}{codigo_cia}"
-            
-            # Localizar e substituir
-            pos_service = linha_ssim.rfind(campo_service_original)
-            if pos_service > 0:
-                linha_antes = linha_ssim[:pos_service]
-                linha_depois = linha_ssim[pos_service + len(campo_service_original):]
-                linha_ssim = linha_antes + novo_campo_service + linha_depois
-        
-        # Garantir 200 caracteres exatos
-        if len(linha_ssim) > 200:
-            linha_ssim = linha_ssim[:200]
-        elif len(linha_ssim) < 200:
-            linha_ssim = linha_ssim + ' ' * (200 - len(linha_ssim))
-        
-        return linha_ssim
-        
-    except Exception:
-        # Em caso de erro, retorna linha original
-        return linha_ssim
-
-def filtrar_dados_por_companhia(dados_json, codigo_companhia, converter_para_brasilia=False, df_airports=None, adaptar_ssim_gol=False):
-    """Filtra dados SSIM por código da companhia aérea com opção de adaptação para padrão SSIM GOL"""
-    linhas_filtradas = []
-    linhas_header = []
-    
-    # Separar headers e linhas de dados
-    for item in dados_json:
-        if isinstance(item, dict) and 'ssimfile' in item:
-            linha = item['ssimfile']
-            if linha:
-                # Headers (linhas que começam com 1, 2, ou são zeros)
-                if linha.startswith(('1', '2')):
-                    linhas_header.append(linha)
-                elif linha.startswith('0'):
-                    # Pular linhas de zeros do header original
-                    continue
-                # Dados de voos (linhas que começam com 3)
-                elif linha.startswith('3 ') and len(linha) > 5:
-                    if codigo_companhia == "TODAS":
-                        # Se for "TODAS", incluir todas as linhas
-                        linha_processada = linha  # ✅ DADOS ORIGINAIS DA ANAC
-                        
-                        # Aplicar conversões se solicitadas
-                        if converter_para_brasilia:
-                            linha_processada = converter_horario_ssim(linha_processada, df_airports, True)
-                        
-                        if adaptar_ssim_gol:
-                            linha_processada = adaptar_para_padrao_ssim_gol(linha_processada)
-                        
-                        linhas_filtradas.append(linha_processada)
-                    else:
-                        # Filtrar por companhia específica
-                        codigo_linha = linha[2:4].strip()
-                        if codigo_linha == codigo_companhia:
-                            linha_processada = linha  # ✅ DADOS ORIGINAIS DA ANAC
-                            
-                            # Aplicar conversões se solicitadas
-                            if converter_para_brasilia:
-                                linha_processada = converter_horario_ssim(linha_processada, df_airports, True)
-                            
-                            if adaptar_ssim_gol:
-                                linha_processada = adaptar_para_padrao_ssim_gol(linha_processada)
-                            
-                            linhas_filtradas.append(linha_processada)
-    
-    # Agora vamos gerar o arquivo SSIM com formato correto
-    resultado = []
-    numero_linha = 1
-    
-    # Adicionar headers existentes com zeros entre linha 1 e 2
-    for i, header in enumerate(linhas_header):
-        resultado.append(header)
-        numero_linha += 1
-        
-        # Se for a primeira linha (linha 1), adicionar 4 linhas de zeros
-        if i == 0:  # Após a primeira linha (linha 1)
-            for _ in range(4):
-                zeros_line = "0" * 200
-                resultado.append(zeros_line)
-                numero_linha += 1
-    
-    # Adicionar linhas de dados com numeração sequencial corrigida
-    for linha_data in linhas_filtradas:
-        # ✅ PRESERVAR DADOS (com melhorias se solicitadas) - apenas renumerar
-        nova_linha = linha_data[:192] + f"{numero_linha:08}"  # Últimos 8 caracteres são o número da linha
-        resultado.append(nova_linha)
-        numero_linha += 1
-    
-    # Adicionar 4 linhas de zeros antes da linha 5
-    for _ in range(4):
-        zeros_line = "0" * 200
-        resultado.append(zeros_line)
-        numero_linha += 1
-    
-    # Adicionar linha 5 (final) com data atual e numeração
-    from datetime import datetime
-    data_emissao = datetime.now().strftime("%d%b%y").upper()
-    
-    # Obter código da companhia para linha 5
-    codigo_para_linha5 = codigo_companhia if codigo_companhia != "TODAS" else "XX"
-    if len(codigo_para_linha5) > 2:
-        codigo_para_linha5 = codigo_para_linha5[:2]
-    
-    linha_5_conteudo = f"5 {codigo_para_linha5} {data_emissao}"
-    
-    # Formato correto: número da última linha 3 + E + número da linha 5 atual
-    # numero_linha já está na linha 5, então a última linha 3 foi numero_linha - 5 (4 zeros + linha 5)
-    numero_ultima_linha3 = numero_linha - 5  # Última linha 3 antes dos 4 zeros
-    numero_linha_str_e = f"{numero_ultima_linha3:06}E"
-    numero_linha_str_final = f"{numero_linha:06}"
-    
-    # Calcular espaços para manter 200 caracteres
-    espacos_necessarios = 200 - len(linha_5_conteudo) - len(numero_linha_str_e) - len(numero_linha_str_final)
-    linha_5 = linha_5_conteudo + (' ' * espacos_necessarios) + numero_linha_str_e + numero_linha_str_final
-    resultado.append(linha_5)
-    
-    return resultado
+        return filtro.normalizado()
+    except ValueError as e:
+        st.error(f"❌ Filtro inválido: {str(e)}")
+        return None
+
+def carregar_temporadas(temporadas, forcar_atualizacao=False):
+    """
+    Carrega as temporadas do cache em disco; as ausentes são baixadas da API em paralelo.
+    Retorna {temporada: (dados, metadados)} (dados None se o download falhou).
+    """
+    cache = obter_cache_temporadas()
+    carregadas = {}
+    baixar = []
+    
+    for temporada in temporadas:
+        if not forcar_atualizacao:
+            # Registros de 200 bytes mapeados do disco com mmap (sem decodificar nem copiar)
+            mapeada, metadados = cache.carregar_mapeada(temporada)
+            if mapeada is not None:
+                if cache.expirado(metadados):
+                    # Serve a cópia local e revalida na API em segundo plano
+                    cache.atualizar_em_segundo_plano(temporada, baixar_linhas_temporada)
+                carregadas[temporada] = (mapeada, metadados)
+                continue
+        baixar.append(temporada)
+    
+    # Registros gravados no cache em disco à medida que chegam da API (sem a lista da temporada
+    # em memória); a temporada é aberta em seguida com mmap
+    respostas = {}
+    
+    def gravar_no_cache(temporada, registros):
+        # A requisição só acontece na primeira leitura; depois dela a resposta tem os validadores
+        # (ETag / Last-Modified) que o cache usa nas revalidações condicionais
+        registros = iter(registros)
+        primeiro = next(registros, None)
+        if primeiro is not None:
+            registros = itertools.chain([primeiro], registros)
+        info = respostas.get(temporada, {})
+        return cache.salvar(temporada, iterar_linhas_ssim(registros), info.get('etag'), info.get('last_modified'))
+    
+    baixadas = extrair_dados_api(baixar, gravar_no_cache, respostas) if baixar else {}
+    # Registros que o cache não armazena: novo download direto para o buffer compacto em memória
+    sem_cache = [temporada for temporada, metadados in baixadas.items() if metadados is None]
+    compactas = extrair_dados_api(
+        sem_cache, lambda temporada, registros: TemporadaCompacta.de_dados_api(registros)
+    ) if sem_cache else {}
+    for temporada in baixar:
+        metadados = baixadas.get(temporada)
+        dados = cache.carregar_mapeada(temporada)[0] if metadados else compactas.get(temporada)
+        carregadas[temporada] = (dados, metadados)
+    return carregadas
+
+def carregar_temporada(temporada, forcar_atualizacao=False):
+    """Carrega a temporada do cache em disco ou, se ausente, da API (retorna dados e metadados)"""
+    return carregar_temporadas([temporada], forcar_atualizacao)[temporada]
+
+def separar_temporadas(texto):
+    """'W25, S25' -> ['W25', 'S25'] (sem repetições, na ordem digitada)"""
+    return list(dict.fromkeys(codigo.upper() for codigo in re.split(r'[\s,;]+', texto) if codigo))
+
+def ativar_temporada(temporada):
+    """Torna a temporada (já carregada e compartilhada) a temporada de trabalho da sessão"""
+    st.session_state['dados_api'] = st.session_state['temporadas_carregadas'][temporada]
+    st.session_state['indice_temporada'] = st.session_state['dados_api'].indice
+    st.session_state['companhias_disponveis'] = st.session_state['indice_temporada'].companhias
+    st.session_state['temporada_atual'] = temporada
+
+def diretorio_downloads():
+    """Diretório dos arquivos de download; os esquecidos há mais de 6 horas são removidos aqui"""
+    os.makedirs(DIRETORIO_DOWNLOADS, exist_ok=True)
+    remover_temporarios_antigos(DIRETORIO_DOWNLOADS)
+    return DIRETORIO_DOWNLOADS
+
+def guardar_arquivo_download(chave_sessao, caminho, **informacoes):
+    """Guarda o arquivo gerado na sessão: removido ao ser substituído ou quando a sessão termina"""
+    arquivo = ArquivoTemporario(caminho, **informacoes)
+    st.session_state[chave_sessao] = arquivo
+    return arquivo
+
+def remover_arquivo_download(chave='arquivo_download'):
+    """Remove o arquivo de download gerado na execução anterior da sessão"""
+    arquivo = st.session_state.pop(chave, None)
+    if arquivo is not None:
+        arquivo.remover()
+
+def conteudo_no_clique(caminho):
+    """Dados do download_button lidos do disco só quando o usuário clica (não a cada execução)"""
+    return lambda: Path(caminho).read_bytes()
 
-def gerar_nome_arquivo(codigo_companhia, temporada, horario_brasilia=False, padrao_gol=False):
-    """Gera nome do arquivo baseado na companhia e temporada"""
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    sufixo_horario = "_HORARIO_BRASILIA" if horario_brasilia else "_HORARIO_LOCAL"
-    sufixo_padrao = "_PADRAO_SSIM_GOL" if padrao_gol else "_PADRAO_ANAC"
+def exibir_exportacao_colunar(linhas_filtradas, nome_arquivo):
+    """Exportação dos registros 3 filtrados em Parquet ou Arrow IPC (um .zip com as partições por companhia)"""
+    with st.expander("🧮 Exportar para Parquet / Arrow"):
+        formato = st.radio(
+            "Formato colunar:",
+            options=list(FORMATOS_COLUNARES),
+            format_func=lambda x: {'parquet': "🧱 Parquet (.parquet, zstd)", 'arrow': "🏹 Arrow IPC (.arrow)"}[x],
+            horizontal=True,
+            key='formato_colunar'
+        )
+        if not st.button("🧮 Gerar exportação colunar"):
+            return
+
+        remover_arquivo_download('exportacao_download')
+        nome_base = nome_exportacao(nome_arquivo, formato)
+        try:
+            caminho, registros, tamanho = gravar_exportacao_temporaria(
+                linhas_filtradas, nome_base, formato, diretorio_downloads()
+            )
+        except RuntimeError as e:
+            st.error(f"❌ {str(e)}")
+            return
+        guardar_arquivo_download('exportacao_download', caminho, nome=nome_base, linhas=registros)
+        st.info(f"🧮 **{registros} registros** exportados em colunas tipadas, particionados por companhia ({tamanho // 1024} KB)")
+        st.download_button(
+            label=f"📥 Baixar {formato.capitalize()} (.zip)",
+            data=conteudo_no_clique(caminho),
+            file_name=f"{nome_base}.zip",
+            mime='application/zip',
+            help="Diretórios companhia=XX legíveis por pandas, Polars, DuckDB ou Spark",
+            on_click='ignore'
+        )
+
+def examinar_arquivo_enviado(arquivo_enviado):
+    """Primeira passada pelo arquivo enviado (headers e contagens), uma vez por arquivo na sessão"""
+    examinado = st.session_state.get('arquivo_ssim')
+    if examinado is None or examinado[0] != arquivo_enviado.file_id:
+        with st.spinner("🔎 Lendo o arquivo SSIM..."):
+            examinado = (arquivo_enviado.file_id, ArquivoSSIM(arquivo_enviado).examinar())
+        st.session_state['arquivo_ssim'] = examinado
+    arquivo_ssim = examinado[1]
+    arquivo_ssim.origem = arquivo_enviado  # Upload desta execução (relido do início a cada passada)
+    return arquivo_ssim
+
+def exibir_importacao_arquivo(arquivo_enviado, converter_horarios, padrao_ssim, usar_fuso_iana, compressao):
+    """Conversão de um arquivo SSIM enviado, lido e gravado em lotes pelo mesmo pipeline da API"""
+    st.subheader(f"📂 Arquivo SSIM: {arquivo_enviado.name}")
+    try:
+        arquivo_ssim = examinar_arquivo_enviado(arquivo_enviado)
+    except (OSError, ValueError) as e:
+        st.error(f"❌ Erro ao ler o arquivo SSIM: {str(e)}")
+        return
+    
+    tipos = arquivo_ssim.registros_por_tipo
+    st.info(f"📈 **{tipos['3']} registros 3** e {tipos['4']} registros 4 em {arquivo_ssim.total_linhas} linhas "
+            f"(temporada {arquivo_ssim.temporada})")
+    if not arquivo_ssim.companhias:
+        st.warning("⚠️ Nenhuma companhia encontrada nos registros 3 do arquivo")
+        return
+    
+    indice_companhias = carregar_dados_airlines() or IndiceCompanhias()
+    codigo_selecionado = st.selectbox(
+        "Escolha a companhia aérea:",
+        options=["TODAS"] + arquivo_ssim.companhias,
+        format_func=lambda codigo: "TODAS - Todas as companhias do arquivo" if codigo == "TODAS"
+        else f"{codigo} - {indice_companhias.nome(codigo)} ({arquivo_ssim.voos_por_companhia[codigo]} voos)",
+        key='companhia_arquivo_ssim'
+    )
+    st.caption("Conversões escolhidas na barra lateral; registros 4 acompanham o seu registro 3 e o trailer é refeito")
+    if not st.button("🔄 Converter arquivo SSIM", type="primary"):
+        return
+    
+    df_airports = carregar_dados_airports()
+    nome_arquivo = gerar_nome_arquivo(codigo_selecionado, arquivo_ssim.temporada, converter_horarios, padrao_ssim)
+    remover_arquivo_download('importacao_download')
+    validador = ValidadorSSIM(df_airports)
+    with st.spinner("🔄 Convertendo o arquivo..."):
+        caminho_arquivo, total_linhas, tamanho_arquivo = gravar_arquivo_temporario(
+            validador.verificar(arquivo_ssim.gerar_linhas(
+                codigo_selecionado, converter_horarios, df_airports, padrao_ssim, usar_fuso_iana=usar_fuso_iana
+            )),
+            nome_arquivo,
+            compressao,
+            diretorio_downloads()
+        )
+    guardar_arquivo_download('importacao_download', caminho_arquivo, nome=nome_arquivo, linhas=total_linhas)
+    relatorio_validacao = validador.concluir()
     
-    if codigo_companhia == "TODAS":
-        return f"ssim_TODAS_COMPANHIAS_{temporada}{sufixo_horario}{sufixo_padrao}_{timestamp}.ssim"
+    st.success(f"✅ **{total_linhas} linhas** geradas ({tamanho_arquivo // 1024} KB)")
+    if relatorio_validacao.valido:
+        st.success("🧪 **Validação SSIM:** tamanhos, sequência, numeração, trailer, datas e horários conferidos")
     else:
-        return f"ssim_{codigo_companhia}_{temporada}{sufixo_horario}{sufixo_padrao}_{timestamp}.ssim"
+        st.warning("🧪 **Validação SSIM:** o arquivo tem registros fora do padrão (detalhes abaixo)")
+    if relatorio_validacao.contagem():
+        with st.expander("🧪 Resultado da validação SSIM"):
+            for mensagem in relatorio_validacao.resumo():
+                st.write(mensagem)
+    
+    st.download_button(
+        label="📥 Baixar Arquivo SSIM",
+        data=conteudo_no_clique(caminho_arquivo),
+        file_name=nome_com_compressao(nome_arquivo, compressao),
+        mime=tipo_mime(compressao),
+        help="Arquivo SSIM convertido a partir do arquivo enviado",
+        on_click='ignore'
+    )
+
+def exibir_painel_desempenho():
+    """Painel lateral com tempos por etapa e contadores da instrumentação"""
+    with st.sidebar:
+        with st.expander("📈 Desempenho"):
+            st.checkbox(
+                "Ativar instrumentação",
+                key='instrumentacao_ativa',
+                help="Mede tempo por etapa e conta fallbacks, erros ignorados e linhas cortadas ou completadas em 200 colunas (vale para o processo inteiro)"
+            )
+            resumo = INSTRUMENTACAO.resumo()
+            if resumo['etapas']:
+                st.dataframe(pd.DataFrame.from_dict(resumo['etapas'], orient='index'), use_container_width=True)
+            if resumo['contadores']:
+                for nome, quantidade in resumo['contadores'].items():
+                    st.write(f"**{nome}**: {quantidade}")
+            if not resumo['etapas'] and not resumo['contadores']:
+                st.caption("Nenhuma medição registrada")
+            if resumo['partida']:
+                # Importações, tabelas de referência e primeira execução (medidos sempre, uma vez por processo)
+                st.caption("🚀 Partida: " + ", ".join(
+                    f"{nome} {segundos * 1000:.0f} ms" for nome, segundos in resumo['partida'].items()
+                ))
+            
+            col1, col2 = st.columns(2)
+            with col1:
+                st.download_button(
+                    label="💾 JSON",
+                    data=INSTRUMENTACAO.para_json(),
+                    file_name=f"desempenho_ssim_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json",
+                    mime="application/json"
+                )
+            with col2:
+                if st.button("🧹 Zerar"):
+                    INSTRUMENTACAO.zerar()
+                    st.rerun()
 
 # --- Interface Streamlit ---
 def main():
+    # --- Configuração da página ---
+    # (dentro de main para o módulo poder ser importado sem executar a interface)
+    st.set_page_config(
+        page_title="Gerador SSIM - ANAC API v1.0.05",
+        page_icon="✈️",
+        layout="wide",
+        initial_sidebar_state="expanded"
+    )
+    
+    # Instrumentação ligada/desligada pelo painel de desempenho
+    INSTRUMENTACAO.ativa = st.session_state.get('instrumentacao_ativa', False)
+    
     st.title("✈️ Gerador de Arquivos SSIM")
     st.markdown("### Extrair dados de malha aérea da API da ANAC")
     st.markdown("**Versão:** 1.0.05 | **Data:** 09/06/2025")
@@ -545,7 +573,8 @@ def main():
         temporada = st.text_input(
             "🗓️ Temporada (ex: W25, S25)",
             value="W25",
-            help="Digite a temporada desejada (formato: W25 para Winter 2025, S25 para Summer 2025)"
+            help="Digite a temporada desejada (formato: W25 para Winter 2025, S25 para Summer 2025). "
+                 "Várias temporadas separadas por vírgula (ex: W25, S25) são baixadas em paralelo"
         )
         
         # Opção de conversão de horário
@@ -559,8 +588,14 @@ def main():
             help="Escolha se quer manter os horários locais de cada aeroporto ou converter todos para o horário de Brasília"
         )
         
+        usar_fuso_iana = False
         if converter_horarios:
             st.info("⚠️ **Atenção:** Os horários serão convertidos para UTC-3 (Brasília). Verifique se esta é a opção desejada.")
+            usar_fuso_iana = st.checkbox(
+                "🌐 Usar fusos IANA (horário de verão e fusos de meia hora)",
+                value=False,
+                help="Converte pelo fuso de cada aeroporto em cada dia da temporada: divide os períodos na troca de horário de verão, mantém os minutos de fusos como +0530 e ajusta datas e dias de operação na virada de dia"
+            )
         
         # Nova opção: Padrão SSIM
         st.markdown("---")
@@ -578,21 +613,101 @@ def main():
         else:
             st.info("📊 **Dados preservados:**\n- Campo Onward: `LA 0707`\n- Service Info: `000`")
         
+        # Formato do arquivo para download
+        st.markdown("---")
+        st.markdown("### 📦 Download")
+        
+        compressao_download = st.radio(
+            "Formato do arquivo:",
+            options=[None, 'gzip', 'zip'],
+            format_func=lambda x: {None: "📄 SSIM (.ssim)", 'gzip': "🗜️ Compactado (.ssim.gz)", 'zip': "🗜️ Compactado (.zip)"}[x],
+            help="Arquivos compactados são bem menores para temporadas grandes (ex: TODAS as companhias)"
+        )
+        
         # Botão para carregar dados
+        forcar_atualizacao = st.checkbox(
+            "🔁 Ignorar cache local e consultar a API",
+            value=False,
+            help="Por padrão a temporada vem do cache em disco (revalidado em segundo plano quando antigo)"
+        )
+        
         if st.button("🔄 Carregar Dados da API", type="primary"):
-            if temporada:
-                # Limpar cache se necessário
-                if st.session_state.get('temporada_atual') != temporada:
-                    st.cache_data.clear()
+            temporadas = separar_temporadas(temporada)
+            if temporadas:
+                # Temporadas fora do cache em disco são baixadas ao mesmo tempo
+                carregadas = carregar_temporadas(temporadas, forcar_atualizacao)
+                temporadas_carregadas = st.session_state.setdefault('temporadas_carregadas', {})
+                for codigo, (dados, metadados_cache) in carregadas.items():
+                    if not dados:
+                        temporadas_carregadas.pop(codigo, None)
+                        continue
+                    # Uma única passada: headers, trailer e registros 3 por companhia;
+                    # temporada e índice somente leitura, compartilhados entre as sessões
+                    temporadas_carregadas[codigo] = compartilhar_temporada(dados)
+                    prefixo = f"{codigo}: d" if len(temporadas) > 1 else "D"
+                    st.success(f"✅ {prefixo}ados carregados! {len(temporadas_carregadas[codigo])} registros encontrados")
+                    if metadados_cache:
+                        st.caption(f"💾 Cache local: baixado em {metadados_cache['baixado_em']} ({metadados_cache['registros']} registros)")
                 
-                st.session_state['dados_api'] = extrair_dados_api(temporada)
-                st.session_state['temporada_atual'] = temporada
-                if st.session_state['dados_api']:
-                    st.session_state['companhias_disponveis'] = extrair_companhias_do_ssim(st.session_state['dados_api'])
-                    st.success(f"✅ Dados carregados! {len(st.session_state['dados_api'])} registros encontrados")
+                primeira = next((codigo for codigo in temporadas if carregadas[codigo][0]), None)
+                if primeira is not None:
+                    ativar_temporada(primeira)
+                else:
+                    st.session_state['dados_api'] = None
+                    st.session_state['temporada_atual'] = temporadas[0]
             else:
                 st.error("❌ Digite uma temporada válida")
         
+        # Várias temporadas carregadas: escolha da temporada de trabalho
+        temporadas_carregadas = st.session_state.get('temporadas_carregadas', {})
+        if len(temporadas_carregadas) > 1:
+            opcoes_temporadas = list(temporadas_carregadas)
+            temporada_atual = st.session_state.get('temporada_atual')
+            temporada_ativa = st.selectbox(
+                "📂 Temporada ativa",
+                options=opcoes_temporadas,
+                index=opcoes_temporadas.index(temporada_atual) if temporada_atual in opcoes_temporadas else 0,
+                help="Temporadas já carregadas nesta sessão"
+            )
+            if temporada_ativa != temporada_atual:
+                ativar_temporada(temporada_ativa)
+        
+        # Temporadas disponíveis no cache em disco
+        with st.expander("💾 Cache local de temporadas"):
+            cache_temporadas = obter_cache_temporadas()
+            temporadas_em_cache = cache_temporadas.listar()
+            if temporadas_em_cache:
+                for metadados in temporadas_em_cache:
+                    situacao = " 🔄 atualizando..." if cache_temporadas.atualizando(metadados['temporada']) else ""
+                    st.write(f"**{metadados['temporada']}** - {metadados['registros']} registros, "
+                             f"baixado em {metadados['baixado_em']}{situacao}")
+                st.caption(f"Total em disco: {cache_temporadas.tamanho_total() // 1024} KB")
+            
+            temporadas_compartilhadas = obter_temporadas_compartilhadas()
+            if len(temporadas_compartilhadas):
+                st.caption(
+                    f"📦 Temporadas em memória: {len(temporadas_compartilhadas)} "
+                    f"({temporadas_compartilhadas.nbytes() // 1024} KB, compartilhadas entre as sessões)"
+                )
+            else:
+                st.caption("Nenhuma temporada em cache")
+            
+            uso_resultados = obter_cache_resultados().estatisticas()
+            st.caption(
+                f"🧠 Arquivos gerados em memória: {uso_resultados['entradas']} "
+                f"({uso_resultados['bytes'] // (1024 * 1024)} de {uso_resultados['limite_bytes'] // (1024 * 1024)} MB), "
+                f"{uso_resultados['acertos']} reaproveitados"
+            )
+        
+        # Arquivo SSIM da própria companhia, no lugar dos dados da API
+        with st.expander("📂 Arquivo SSIM próprio"):
+            arquivo_enviado = st.file_uploader(
+                "Arquivo SSIM (texto, .gz ou .zip)",
+                type=EXTENSOES_ARQUIVO,
+                key='arquivo_ssim_enviado',
+                help="Registros 1 a 5 lidos em streaming e convertidos com as opções acima; remova o arquivo para voltar aos dados da API"
+            )
+        
         # Informações adicionais
         st.markdown("---")
         st.markdown("### ℹ️ Sobre os dados")
@@ -613,7 +728,10 @@ def main():
         """)
     
     # Área principal - Layout de coluna única
-    if 'dados_api' in st.session_state and st.session_state['dados_api']:
+    if arquivo_enviado is not None:
+        # Arquivo enviado pelo usuário: mesmo pipeline, lido e gravado em lotes
+        exibir_importacao_arquivo(arquivo_enviado, converter_horarios, padrao_ssim, usar_fuso_iana, compressao_download)
+    elif 'dados_api' in st.session_state and st.session_state['dados_api']:
         st.success(f"📊 **Dados carregados para temporada:** {st.session_state.get('temporada_atual', 'N/A')}")
         st.info(f"📈 **Total de registros:** {len(st.session_state['dados_api'])}")
         
@@ -624,17 +742,12 @@ def main():
             companhias = st.session_state['companhias_disponveis']
             
             # Criar lista com nome da companhia (se disponível no CSV) + opção "TODAS"
-            df_airlines = carregar_dados_airlines()
+            indice_companhias = carregar_dados_airlines() or IndiceCompanhias()
             opcoes_companhias = ["TODAS - Todas as companhias (malha completa)"]
             codigos_companhias = ["TODAS"]
             
             for codigo in companhias:
-                nome_cia = "Nome não encontrado"
-                if df_airlines is not None:
-                    resultado = df_airlines[df_airlines['IATA Designator'] == codigo]
-                    if not resultado.empty:
-                        nome_cia = resultado.iloc[0]['Airline Name']
-                opcoes_companhias.append(f"{codigo} - {nome_cia}")
+                opcoes_companhias.append(f"{codigo} - {indice_companhias.nome(codigo)}")
                 codigos_companhias.append(codigo)
             
             # Estatísticas das companhias
@@ -650,23 +763,72 @@ def main():
             if companhia_selecionada is not None:
                 codigo_selecionado = codigos_companhias[companhia_selecionada]
                 
+                # Filtros por aeroporto, rota, equipamento e datas (respondidos pelos índices da temporada)
+                filtro_voos = ler_filtro_voos()
+                
                 # Carregar dados de aeroportos para conversão
                 df_airports = carregar_dados_airports()
                 
-                # Filtrar dados
-                dados_filtrados = filtrar_dados_por_companhia(
-                    st.session_state['dados_api'], 
+                # Filtrar dados (headers + linhas 3 transformadas; o arquivo é montado em streaming)
+                # Mesma temporada, companhia e opções: resultado reaproveitado do cache em memória
+                linhas_header, linhas_filtradas = selecionar_linhas_em_cache(
                     codigo_selecionado,
                     converter_horarios,
                     df_airports,
-                    padrao_ssim  # Nova opção
+                    padrao_ssim,  # Nova opção
+                    usar_fuso_iana,
+                    filtro_voos
                 )
                 
+                # Arquivo já gravado nesta sessão para a mesma seleção e compressão: reaproveitado
+                # (com o seu relatório de validação) nas execuções seguintes da página
+                temporada_atual = st.session_state.get('temporada_atual', 'TEMP')
+                chave_arquivo = chave_resultado(codigo_selecionado, converter_horarios, padrao_ssim, usar_fuso_iana, filtro_voos)
+                if chave_arquivo is not None:
+                    chave_arquivo += (temporada_atual, compressao_download)
+                arquivo_gerado = st.session_state.get('arquivo_download')
+                if chave_arquivo is None or arquivo_gerado is None or arquivo_gerado.chave != chave_arquivo or not arquivo_gerado.existe():
+                    # Gravar o arquivo em disco linha a linha (sem cópias do arquivo inteiro em memória)
+                    nome_arquivo = gerar_nome_arquivo(codigo_selecionado, temporada_atual, converter_horarios, padrao_ssim, filtro_voos)
+                    remover_arquivo_download()
+                    # Validação SSIM em lotes, enquanto as linhas vão para o disco
+                    validador = ValidadorSSIM(df_airports)
+                    caminho_arquivo, total_linhas, _ = gravar_arquivo_temporario(
+                        validador.verificar(gerar_linhas_arquivo_ssim(linhas_header, linhas_filtradas, codigo_selecionado)),
+                        nome_arquivo,
+                        compressao_download,
+                        diretorio_downloads()
+                    )
+                    arquivo_gerado = guardar_arquivo_download(
+                        'arquivo_download', caminho_arquivo, nome=nome_arquivo, linhas=total_linhas,
+                        chave=chave_arquivo, relatorio=validador.concluir()
+                    )
+                nome_arquivo, caminho_arquivo = arquivo_gerado.nome, arquivo_gerado.caminho
+                total_linhas, tamanho_arquivo = arquivo_gerado.linhas, arquivo_gerado.tamanho
+                relatorio_validacao = arquivo_gerado.relatorio
+                
                 st.success(f"✅ **Dados filtrados para {opcoes_companhias[companhia_selecionada]}**")
-                st.info(f"📊 **Linhas encontradas:** {len(dados_filtrados)}")
+                st.info(f"📊 **Linhas encontradas:** {total_linhas}")
+                if filtro_voos is not None:
+                    st.info(f"🔎 **Filtros aplicados:** {filtro_voos.descricao()}")
+                
+                if relatorio_validacao.valido:
+                    st.success("🧪 **Validação SSIM:** tamanhos, sequência, numeração, trailer, datas e horários conferidos")
+                else:
+                    st.warning("🧪 **Validação SSIM:** o arquivo tem registros fora do padrão (detalhes abaixo)")
+                if relatorio_validacao.contagem():
+                    with st.expander("🧪 Resultado da validação SSIM"):
+                        for mensagem in relatorio_validacao.resumo():
+                            st.write(mensagem)
                 
                 if converter_horarios:
                     st.info("🇧🇷 **Horários convertidos para horário de Brasília (UTC-3)**")
+
+                    # Aeroportos sem fuso no CSV (usaram o padrão -3)
+                    if df_airports is not None and df_airports.falhas:
+                        with st.expander(f"🛬 Aeroportos não encontrados no índice ({df_airports.falhas} consultas com fallback -3)"):
+                            for codigo, count in df_airports.codigos_nao_encontrados.most_common():
+                                st.write(f"**{codigo}**: {count} consultas")
                 else:
                     st.info("🌍 **Horários mantidos em fuso local de cada aeroporto**")
                 
@@ -676,54 +838,66 @@ def main():
                     st.info("📊 **Dados preservados no formato original ANAC**")
                 
                 # Preview dos dados
-                if dados_filtrados:
+                if total_linhas:
                     with st.expander("👀 Preview dos dados (primeiras 10 linhas)"):
-                        for i, linha in enumerate(dados_filtrados[:10]):
+                        preview = itertools.islice(
+                            gerar_linhas_arquivo_ssim(linhas_header, linhas_filtradas, codigo_selecionado), 10
+                        )
+                        for i, linha in enumerate(preview):
                             st.code(linha, language="text")
                     
                     # Estatísticas adicionais se for "TODAS"
                     if codigo_selecionado == "TODAS":
-                        # Contar voos por companhia
-                        contagem_por_cia = {}
-                        for linha in dados_filtrados:
-                            if linha.startswith('3 ') and len(linha) > 5:
-                                cia = linha[2:4].strip()
-                                contagem_por_cia[cia] = contagem_por_cia.get(cia, 0) + 1
+                        # Voos por companhia contados uma única vez na indexação da temporada
+                        indice_temporada = st.session_state.get('indice_temporada')
+                        if indice_temporada is not None:
+                            contagem_por_cia = indice_temporada.contagem_por_companhia()
+                        else:
+                            contagem_por_cia = Counter(
+                                linha[2:4].strip() for linha in linhas_filtradas
+                                if linha.startswith('3 ') and len(linha) > 5
+                            )
                         
                         with st.expander("📊 Estatísticas por companhia"):
                             for cia, count in sorted(contagem_por_cia.items()):
-                                nome_cia = "Nome não encontrado"
-                                if df_airlines is not None:
-                                    resultado = df_airlines[df_airlines['IATA Designator'] == cia]
-                                    if not resultado.empty:
-                                        nome_cia = resultado.iloc[0]['Airline Name']
-                                st.write(f"**{cia}** - {nome_cia}: {count} voos")
+                                st.write(f"**{cia}** - {indice_companhias.nome(cia)}: {count} voos")
                     
-                    # Botão para baixar
-                    arquivo_ssim = "\n".join(dados_filtrados)
-                    nome_arquivo = gerar_nome_arquivo(codigo_selecionado, st.session_state.get('temporada_atual', 'TEMP'), converter_horarios, padrao_ssim)
+                    # Consulta por data sobre os períodos e dias de operação dos registros 3
+                    exibir_voos_por_data(codigo_selecionado)
                     
+                    # Diferenças em relação à versão da temporada substituída no último download
+                    exibir_alteracoes_temporada(
+                        codigo_selecionado, converter_horarios, df_airports, padrao_ssim,
+                        usar_fuso_iana, filtro_voos, compressao_download
+                    )
+                    
+                    # Botão para baixar (servido a partir do arquivo em disco)
+                    # (lido do disco só no clique, sem rerun da página)
                     st.download_button(
                         label="📥 Baixar Arquivo SSIM",
-                        data=arquivo_ssim,
-                        file_name=nome_arquivo,
-                        mime="text/plain",
-                        help="Clique para baixar o arquivo SSIM filtrado"
+                        data=conteudo_no_clique(caminho_arquivo),
+                        file_name=nome_com_compressao(nome_arquivo, compressao_download),
+                        mime=tipo_mime(compressao_download),
+                        help="Clique para baixar o arquivo SSIM filtrado",
+                        on_click='ignore'
                     )
                     
+                    # Mesmos registros em colunas tipadas (Parquet / Arrow), particionados por companhia
+                    exibir_exportacao_colunar(linhas_filtradas, nome_arquivo)
+                    
                     # Informações do arquivo
                     st.markdown("---")
                     col1, col2, col3 = st.columns(3)
                     
                     with col1:
-                        st.metric("📄 Total de linhas", len(dados_filtrados))
+                        st.metric("📄 Total de linhas", total_linhas)
                     
                     with col2:
-                        st.metric("💾 Tamanho aproximado", f"{len(arquivo_ssim) // 1024} KB")
+                        st.metric("💾 Tamanho do arquivo", f"{tamanho_arquivo // 1024} KB")
                     
                     with col3:
                         if codigo_selecionado != "TODAS":
-                            voos_dados = len([l for l in dados_filtrados if l.startswith('3 ')])
+                            voos_dados = len([l for l in linhas_filtradas if l.startswith('3 ')])
                             st.metric("✈️ Voos encontrados", voos_dados)
                 else:
                     st.warning("⚠️ Nenhum dado encontrado para os filtros selecionados")
@@ -740,7 +914,15 @@ def main():
         3. **Clique em 'Carregar Dados da API'** 
         4. **Selecione uma companhia** aérea
         5. **Baixe o arquivo SSIM** gerado
+        
+        Para converter um arquivo SSIM da própria companhia, envie-o em **"📂 Arquivo SSIM próprio"** na barra lateral.
         """)
+    
+    # Painel de desempenho (por último, para incluir as medições desta execução)
+    exibir_painel_desempenho()
 
 if __name__ == "__main__":
-    main() 
+    inicio_execucao = time.perf_counter()
+    main()
+    # Só a primeira execução completa do processo fica registrada (primeira página desenhada)
+    INSTRUMENTACAO.registrar_partida('primeira_execucao', time.perf_counter() - inicio_execucao)
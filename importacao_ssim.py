@@ -0,0 +1,224 @@
+# -*- coding: utf-8 -*-
+# Gerador SSIM - Importação de arquivos SSIM próprios (enviados pelas companhias)
+# Registros 1 a 5 lidos linha a linha (texto, .gz ou .zip); registros 3 transformados em lotes pelo
+# mesmo pipeline da API e arquivo de saída gerado sob demanda: a memória fica limitada ao lote
+
+import gzip
+import io
+import os
+import re
+import zipfile
+from collections import Counter
+from contextlib import contextmanager
+
+from paralelo_ssim import transformar_linhas3_paralelo
+from gerador_ssim import gerar_linhas_arquivo_ssim
+from instrumentacao import etapa, contar
+
+TAMANHO_LINHA = 200
+# Registros 3 por lote: mesma vazão de lotes maiores, com pico de memória bem menor
+LINHAS_POR_LOTE = 16384
+EXTENSOES_ARQUIVO = ['ssim', 'txt', 'dat', 'gz', 'zip']
+_ASSINATURA_GZIP = b'\x1f\x8b'
+_ASSINATURA_ZIP = b'PK\x03\x04'
+_TEMPORADA_REGISTRO2 = slice(10, 13)  # Registro 2, colunas 11-13 (ex: W25)
+_TEMPORADA_VALIDA = re.compile(r'[SW]\d\d')
+
+
+@contextmanager
+def abrir_texto_ssim(origem):
+    """
+    Abre o arquivo SSIM como texto para leitura linha a linha: `origem` é um caminho ou um
+    arquivo binário aberto (ex: upload do Streamlit, relido do início). Conteúdo gzip ou zip
+    (o primeiro arquivo do pacote) é descompactado durante a leitura, sem passar pelo disco.
+    """
+    proprio = isinstance(origem, (str, os.PathLike))
+    binario = open(origem, 'rb') if proprio else origem
+    pacote = None
+    try:
+        binario.seek(0)
+        assinatura = binario.read(4)
+        binario.seek(0)
+        if assinatura.startswith(_ASSINATURA_GZIP):
+            fonte = gzip.GzipFile(fileobj=binario, mode='rb')
+        elif assinatura == _ASSINATURA_ZIP:
+            try:
+                pacote = zipfile.ZipFile(binario)
+            except zipfile.BadZipFile as erro:
+                raise ValueError(f"Arquivo zip inválido: {erro}")
+            membros = [membro for membro in pacote.infolist() if not membro.is_dir()]
+            if not membros:
+                raise ValueError("Arquivo zip sem nenhum arquivo SSIM")
+            fonte = pacote.open(membros[0])
+        else:
+            fonte = binario
+        # latin-1: um byte por caractere, sem erro de decodificação em arquivos fora do ASCII
+        texto = io.TextIOWrapper(fonte, encoding='latin-1')
+        try:
+            yield texto
+        finally:
+            if fonte is binario:
+                texto.detach()  # Não fecha o arquivo de quem chamou
+            else:
+                texto.close()
+    finally:
+        if pacote is not None:
+            pacote.close()
+        if proprio:
+            binario.close()
+
+
+def _eh_registro3(linha):
+    return linha.startswith('3') and len(linha) > 5
+
+
+def _transformar_lote(linhas3, registros4, df_airports, converter_para_brasilia, adaptar_ssim_gol,
+                      processos, usar_fuso_iana):
+    """Transforma um lote de registros 3 e recoloca cada registro 4 depois do seu registro 3"""
+    def transformar(linhas):
+        return transformar_linhas3_paralelo(
+            linhas, df_airports, converter_para_brasilia, adaptar_ssim_gol, processos, usar_fuso_iana
+        )
+
+    with etapa('importacao.lote', linhas=len(linhas3)):
+        if not registros4:
+            return transformar(linhas3)
+        resultado = []
+        if not (converter_para_brasilia and usar_fuso_iana):
+            # Transformações 1 para 1: posição k do resultado é o registro 3 k do lote
+            for k, linha in enumerate(transformar(linhas3)):
+                resultado.append(linha)
+                resultado.extend(registros4.get(k, ()))
+            return resultado
+        # Fusos IANA podem dividir um registro 3: o lote é cortado em cada registro 3 com registros 4
+        inicio = 0
+        for k in sorted(registros4):
+            resultado.extend(transformar(linhas3[inicio:k + 1]))
+            resultado.extend(registros4[k])
+            inicio = k + 1
+        resultado.extend(transformar(linhas3[inicio:]))
+        return resultado
+
+
+class ArquivoSSIM:
+    """
+    Arquivo SSIM próprio lido em streaming, nas mesmas conversões da temporada da API.
+
+    `examinar()` percorre o arquivo uma vez e guarda só o que é pequeno: headers (registros 1
+    e 2), trailers originais e a contagem de registros por tipo e de voos por companhia.
+    `linhas_companhia()` relê o arquivo e produz os registros 3 da companhia transformados em
+    lotes de LINHAS_POR_LOTE, cada um seguido dos seus registros 4; `gerar_linhas()` monta o
+    arquivo de saída (renumerado, com trailer novo) sob demanda.
+    """
+
+    def __init__(self, origem, nome=None):
+        self.origem = origem
+        if nome is None:
+            nome = os.path.basename(origem) if isinstance(origem, (str, os.PathLike)) else getattr(origem, 'name', 'arquivo.ssim')
+        self.nome = str(nome)
+        self.linhas_header = []
+        self.linhas_trailer = []
+        self.registros_por_tipo = Counter()
+        self.voos_por_companhia = {}
+        self.companhias = []
+        self.total_linhas = 0
+        self.examinado = False
+
+    def _linhas(self):
+        with abrir_texto_ssim(self.origem) as arquivo:
+            for linha in arquivo:
+                yield linha.rstrip('\r\n')
+
+    def examinar(self):
+        """Primeira passada: headers, trailers e contagens (o arquivo não fica em memória)"""
+        with etapa('importacao.exame') as medicao:
+            voos = Counter()
+            for linha in self._linhas():
+                self.total_linhas += 1
+                if not linha:
+                    continue
+                tipo = linha[0]
+                self.registros_por_tipo[tipo] += 1
+                if tipo in '12':
+                    self.linhas_header.append(linha)
+                elif tipo == '5':
+                    self.linhas_trailer.append(linha)
+                elif _eh_registro3(linha):
+                    voos[linha[2:4].strip()] += 1
+            # Mesmo critério de indexar_temporada
+            self.companhias = sorted(codigo for codigo in voos if codigo and codigo.replace(' ', '').isalnum())
+            self.voos_por_companhia = dict(sorted(voos.items()))
+            self.examinado = True
+            medicao.linhas = self.total_linhas
+        return self
+
+    @property
+    def temporada(self):
+        """Temporada do registro 2 (colunas 11-13) ou, sem ela, o nome do arquivo"""
+        for linha in self.linhas_header:
+            temporada = linha[_TEMPORADA_REGISTRO2].strip().upper()
+            if linha.startswith('2') and _TEMPORADA_VALIDA.fullmatch(temporada):
+                return temporada
+        base = self.nome.split('.')[0]
+        return re.sub(r'[^A-Za-z0-9_-]', '_', base) or 'ARQUIVO'
+
+    def _lotes(self, codigo_companhia, tamanho_lote):
+        """Lotes (registros 3, {índice no lote: registros 4 seguintes}) da companhia"""
+        linhas3, registros4 = [], {}
+        selecionado = None  # Registros 4 acompanham o último registro 3 lido
+        for linha in self._linhas():
+            if _eh_registro3(linha):
+                selecionado = codigo_companhia == "TODAS" or linha[2:4].strip() == codigo_companhia
+                if selecionado:
+                    if len(linhas3) >= tamanho_lote:
+                        yield linhas3, registros4
+                        linhas3, registros4 = [], {}
+                    linhas3.append(linha)
+            elif linha.startswith('4'):
+                if selecionado:
+                    # Completado até 200 colunas: a renumeração grava o número nas colunas 195-200
+                    registros4.setdefault(len(linhas3) - 1, []).append(linha.ljust(TAMANHO_LINHA))
+                elif selecionado is None:
+                    contar('importacao.registro4_sem_registro3')
+            elif linha[:1] not in ('', '0', '1', '2', '5'):
+                contar('importacao.linha_ignorada')
+        if linhas3:
+            yield linhas3, registros4
+
+    def linhas_companhia(self, codigo_companhia="TODAS", converter_para_brasilia=False, df_airports=None,
+                         adaptar_ssim_gol=False, processos=1, usar_fuso_iana=False):
+        """Registros 3 (e 4) da companhia, transformados lote a lote, na ordem do arquivo"""
+        # Com processos, lotes maiores: cada lote é dividido entre os trabalhadores
+        tamanho_lote = LINHAS_POR_LOTE * max(processos, 1)
+        opcoes = (df_airports, converter_para_brasilia, adaptar_ssim_gol, processos, usar_fuso_iana)
+        for linhas3, registros4 in self._lotes(codigo_companhia, tamanho_lote):
+            yield from _transformar_lote(linhas3, registros4, *opcoes)
+
+    def gerar_linhas(self, codigo_companhia="TODAS", converter_para_brasilia=False, df_airports=None,
+                     adaptar_ssim_gol=False, processos=1, usar_fuso_iana=False):
+        """Linhas do arquivo SSIM gerado (headers do arquivo, registros renumerados e trailer novo)"""
+        if not self.examinado:
+            self.examinar()
+        return gerar_linhas_arquivo_ssim(
+            self.linhas_header,
+            self.linhas_companhia(
+                codigo_companhia, converter_para_brasilia, df_airports, adaptar_ssim_gol, processos, usar_fuso_iana
+            ),
+            codigo_companhia
+        )
+
+    def gerar_arquivos(self, companhias=None, incluir_todas=True, converter_para_brasilia=False, df_airports=None,
+                       adaptar_ssim_gol=False, processos=1, usar_fuso_iana=False):
+        """
+        Pares (codigo_companhia, gerador de linhas) como gerar_arquivos_por_companhia. Cada arquivo
+        relê a entrada: nada da temporada fica em memória entre um arquivo e outro.
+        """
+        if not self.examinado:
+            self.examinar()
+        if companhias is None:
+            companhias = self.companhias
+        opcoes = (converter_para_brasilia, df_airports, adaptar_ssim_gol, processos, usar_fuso_iana)
+        if incluir_todas:
+            yield "TODAS", self.gerar_linhas("TODAS", *opcoes)
+        for codigo in companhias:
+            yield codigo, self.gerar_linhas(codigo, *opcoes)
@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+# Gerador SSIM - Instrumentação de desempenho
+# Tempo por etapa e contadores (linhas, fallbacks, erros ignorados); sem custo relevante quando desligada
+# Tempos de partida (importações sob demanda, tabelas de referência, primeira execução) sempre registrados
+
+import importlib
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+
+class _EtapaInativa:
+    """Contexto vazio usado quando a instrumentação está desligada"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *excecao):
+        return False
+
+    def __setattr__(self, nome, valor):
+        # Ignora `medicao.linhas = n` quando a instrumentação está desligada
+        pass
+
+
+_ETAPA_INATIVA = _EtapaInativa()
+
+
+class _Etapa:
+    """Mede o tempo de parede de uma etapa e registra ao sair do bloco"""
+
+    def __init__(self, instrumentacao, nome, linhas):
+        self.instrumentacao = instrumentacao
+        self.nome = nome
+        self.linhas = linhas
+
+    def __enter__(self):
+        self.inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, *excecao):
+        self.instrumentacao.registrar_etapa(self.nome, time.perf_counter() - self.inicio, self.linhas)
+        return False
+
+
+class Instrumentacao:
+    """
+    Acumula, por processo, o tempo de cada etapa (chamadas, segundos, linhas) e
+    contadores nomeados. Desligada, `etapa` e `contar` só testam um atributo.
+    """
+
+    def __init__(self, ativa=False):
+        self.ativa = ativa
+        self._lock = threading.Lock()
+        self.etapas = {}
+        self.contadores = Counter()
+        self.partida = {}
+        self.iniciada_em = time.time()
+
+    def etapa(self, nome, linhas=0):
+        """Contexto que mede uma etapa: `with instrumentacao.etapa('filtragem', linhas=n):`"""
+        if not self.ativa:
+            return _ETAPA_INATIVA
+        return _Etapa(self, nome, linhas)
+
+    def registrar_etapa(self, nome, segundos, linhas=0):
+        with self._lock:
+            etapa = self.etapas.setdefault(nome, {'chamadas': 0, 'segundos': 0.0, 'linhas': 0})
+            etapa['chamadas'] += 1
+            etapa['segundos'] += segundos
+            etapa['linhas'] += linhas
+
+    def registrar_partida(self, nome, segundos):
+        """Registra um tempo de partida do processo (só a primeira medição de cada nome vale)"""
+        with self._lock:
+            self.partida.setdefault(nome, round(segundos, 6))
+
+    def contar(self, nome, quantidade=1):
+        """Soma `quantidade` ao contador `nome` (ex: 'ajuste_formato.fallback_espacos')"""
+        if not self.ativa or not quantidade:
+            return
+        with self._lock:
+            self.contadores[nome] += quantidade
+
+    def resumo(self):
+        """Etapas e contadores em um dict serializável em JSON"""
+        with self._lock:
+            etapas = {
+                nome: {
+                    'chamadas': etapa['chamadas'],
+                    'segundos': round(etapa['segundos'], 6),
+                    'linhas': etapa['linhas'],
+                    'linhas_por_segundo': round(etapa['linhas'] / etapa['segundos'], 1)
+                    if etapa['linhas'] and etapa['segundos'] else None,
+                }
+                for nome, etapa in sorted(self.etapas.items())
+            }
+            contadores = dict(sorted(self.contadores.items()))
+            partida = dict(self.partida)
+        return {
+            'ativa': self.ativa,
+            'desde': datetime.fromtimestamp(self.iniciada_em).isoformat(timespec='seconds'),
+            'etapas': etapas,
+            'contadores': contadores,
+            'partida': partida,
+        }
+
+    def para_json(self):
+        return json.dumps(self.resumo(), ensure_ascii=False, indent=2)
+
+    def zerar(self):
+        # Tempos de partida são do processo: não são zerados
+        with self._lock:
+            self.etapas.clear()
+            self.contadores.clear()
+            self.iniciada_em = time.time()
+
+
+# Instância do processo (ligada também pela variável de ambiente GERADOR_SSIM_INSTRUMENTACAO=1)
+INSTRUMENTACAO = Instrumentacao(ativa=os.environ.get('GERADOR_SSIM_INSTRUMENTACAO') == '1')
+
+
+def etapa(nome, linhas=0):
+    """Mede uma etapa na instrumentação do processo"""
+    return INSTRUMENTACAO.etapa(nome, linhas)
+
+
+def contar(nome, quantidade=1):
+    """Incrementa um contador na instrumentação do processo"""
+    if INSTRUMENTACAO.ativa:
+        INSTRUMENTACAO.contar(nome, quantidade)
+
+
+class _ModuloSobDemanda:
+    """Módulo importado no primeiro acesso a um atributo, com o tempo da importação registrado"""
+
+    def __init__(self, nome):
+        self._nome = nome
+        self._modulo = None
+
+    def _carregar(self):
+        modulo = self._modulo
+        if modulo is None:
+            ja_importado = self._nome in sys.modules
+            inicio = time.perf_counter()
+            modulo = importlib.import_module(self._nome)  # Thread-safe: trava de importação do módulo
+            if not ja_importado:
+                INSTRUMENTACAO.registrar_partida(f'importacao.{self._nome}', time.perf_counter() - inicio)
+            self._modulo = modulo
+        return modulo
+
+    def __getattr__(self, atributo):
+        return getattr(self._carregar(), atributo)
+
+    def __repr__(self):
+        situacao = 'carregado' if self._modulo is not None else 'sob demanda'
+        return f"<módulo {self._nome!r} ({situacao})>"
+
+
+def modulo_sob_demanda(nome):
+    """
+    Adia a importação de um módulo pesado até o primeiro uso: `pd = modulo_sob_demanda('pandas')`
+    e `pd.read_csv(...)` só importa o pandas na primeira chamada.
+    """
+    return _ModuloSobDemanda(nome)
@@ -0,0 +1,261 @@
+# -*- coding: utf-8 -*-
+# Gerador SSIM - Operações por data
+# Período de operação + dias da semana (bitmask) de cada registro 3 em colunas NumPy, com
+# consultas por data, intervalo e dia da semana sem expandir a temporada inteira em voos datados
+
+from functools import lru_cache
+
+import numpy as np
+
+from parser_ssim import TAMANHO_LOTE, matriz_caracteres, _data, _numero, _horario, _mascara_dias
+from temporada_compacta import linhas_nas_posicoes
+from instrumentacao import etapa, modulo_sob_demanda
+
+pd = modulo_sob_demanda('pandas')
+
+DIAS_SEMANA = ['SEG', 'TER', 'QUA', 'QUI', 'SEX', 'SAB', 'DOM']  # bit 0 = segunda ... bit 6 = domingo
+
+
+def _dia(valor):
+    """Data (str 'AAAA-MM-DD', date, datetime, datetime64) em dias desde 1970-01-01"""
+    return int(np.datetime64(pd.Timestamp(valor).date(), 'D').astype(np.int64))
+
+
+def dia_da_semana(dias):
+    """Dia da semana (0 = segunda) de dias desde 1970-01-01 (uma quinta-feira)"""
+    return (np.asarray(dias) + 3) % 7
+
+
+def _codigo(texto, largura=3):
+    """Código de companhia/aeroporto/equipamento no formato das colunas (bytes com espaços à direita)"""
+    return texto.strip().upper().encode('ascii', errors='replace').ljust(largura)[:largura]
+
+
+def _categorias(coluna):
+    """Códigos e categorias (strings sem espaços à direita) de uma coluna de bytes fixos"""
+    categorias, codigos = np.unique(coluna, return_inverse=True)
+    return codigos.ravel(), pd.Index(np.char.rstrip(np.char.decode(categorias, 'ascii', errors='replace')))
+
+
+@lru_cache(maxsize=None)
+def _horarios():
+    """'HH:MM' de cada minuto do dia; a última posição ('') representa horário inválido"""
+    return pd.Index([f'{minuto // 60:02d}:{minuto % 60:02d}' for minuto in range(24 * 60)] + [''])
+
+
+def _hhmm(minutos, validos):
+    """Minutos desde a meia-noite como Categorical 'HH:MM' ('' quando o campo é inválido)"""
+    codigos = np.where(validos & (minutos >= 0) & (minutos < 24 * 60), minutos, 24 * 60)
+    return pd.Categorical.from_codes(codigos, _horarios())
+
+
+class OperacoesTemporada:
+    """
+    Colunas dos registros 3 de uma temporada para consultas por data.
+
+    Cada registro opera nos dias d de [inicio, fim] cujo bit (d + 3) % 7 está em `mascara`.
+    As consultas trabalham sobre essas colunas (aritmética de bits e datetime64) e só
+    `expandir` gera uma linha por voo datado, restrita à janela e à seleção pedidas.
+    Datas e horários são os locais do registro (data de partida na origem).
+    """
+
+    def __init__(self, colunas):
+        self.posicoes = colunas['posicoes']        # Posição do registro na temporada
+        self.inicio = colunas['inicio']            # Dias desde 1970-01-01
+        self.fim = colunas['fim']
+        self.mascara = colunas['mascara']
+        self.companhia = colunas['companhia']      # S3
+        self.numero_voo = colunas['numero_voo']
+        self.origem = colunas['origem']            # S3
+        self.destino = colunas['destino']          # S3
+        self.equipamento = colunas['equipamento']  # S3
+        self.partida = colunas['partida']          # Minutos (partida da aeronave)
+        self.partida_valida = colunas['partida_valida']
+        self.chegada = colunas['chegada']          # Minutos (chegada da aeronave)
+        self.chegada_valida = colunas['chegada_valida']
+        self._categorias = {}  # Códigos por registro das colunas de texto, calculados na primeira expansão
+
+    @classmethod
+    def de_linhas(cls, linhas, posicoes=None):
+        """
+        Extrai as colunas dos registros 3 em lotes sobre a matriz de caracteres.
+        Registros sem período válido ou sem dias de operação ficam de fora.
+        """
+        linhas = list(linhas)
+        posicoes = np.arange(len(linhas)) if posicoes is None else np.asarray(posicoes, dtype=np.int64)
+        with etapa('operacoes.colunas', linhas=len(linhas)):
+            lotes = []
+            for inicio in range(0, len(linhas), TAMANHO_LOTE):
+                matriz = matriz_caracteres(linhas[inicio:inicio + TAMANHO_LOTE])
+                data_inicio, data_fim = _data(matriz, 14), _data(matriz, 21)
+                mascara = _mascara_dias(matriz)
+                validos = ~np.isnat(data_inicio) & ~np.isnat(data_fim) & (data_fim >= data_inicio) & (mascara != 0)
+                validos &= matriz[:, 0] == ord('3')
+                partida, partida_valida = _horario(matriz, 43)
+                chegada, chegada_valida = _horario(matriz, 57)
+                lote = {
+                    'posicoes': posicoes[inicio:inicio + TAMANHO_LOTE],
+                    'inicio': data_inicio.astype(np.int64),
+                    'fim': data_fim.astype(np.int64),
+                    'mascara': mascara,
+                    'companhia': np.ascontiguousarray(matriz[:, 2:5]).view('S3').ravel(),
+                    'numero_voo': _numero(matriz, 5, 9)[0].astype(np.int32),
+                    'origem': np.ascontiguousarray(matriz[:, 36:39]).view('S3').ravel(),
+                    'destino': np.ascontiguousarray(matriz[:, 54:57]).view('S3').ravel(),
+                    'equipamento': np.ascontiguousarray(matriz[:, 72:75]).view('S3').ravel(),
+                    'partida': partida.astype(np.int16),
+                    'partida_valida': partida_valida,
+                    'chegada': chegada.astype(np.int16),
+                    'chegada_valida': chegada_valida,
+                }
+                lotes.append({nome: coluna[validos] for nome, coluna in lote.items()})
+
+            if not lotes:
+                return cls.de_linhas(['3'])  # Mesmos dtypes, sem registros
+            colunas = {nome: np.concatenate([lote[nome] for lote in lotes]) for nome in lotes[0]}
+        return cls(colunas)
+
+    @classmethod
+    def de_temporada(cls, dados_json, indice_temporada):
+        """Colunas de todos os registros 3 da temporada (lista da API ou TemporadaCompacta)"""
+        posicoes = indice_temporada.posicoes_linha3
+        return cls.de_linhas(linhas_nas_posicoes(dados_json, posicoes), posicoes)
+
+    def _texto(self, nome, registros):
+        """Coluna de texto dos registros como Categorical (sem decodificar linha a linha)"""
+        if nome not in self._categorias:
+            self._categorias[nome] = _categorias(getattr(self, nome))
+        codigos, categorias = self._categorias[nome]
+        return pd.Categorical.from_codes(codigos[registros], categorias)
+
+    def __len__(self):
+        return len(self.inicio)
+
+    # --- Seleção de registros ---
+    def selecionar(self, companhia=None, estacao=None, origem=None, destino=None, equipamento=None):
+        """Máscara booleana dos registros que atendem a todos os filtros informados"""
+        selecao = np.ones(len(self), dtype=bool)
+        if companhia:
+            selecao &= self.companhia == _codigo(companhia)
+        if estacao:
+            codigo = _codigo(estacao)
+            selecao &= (self.origem == codigo) | (self.destino == codigo)
+        if origem:
+            selecao &= self.origem == _codigo(origem)
+        if destino:
+            selecao &= self.destino == _codigo(destino)
+        if equipamento:
+            selecao &= self.equipamento == _codigo(equipamento)
+        return selecao
+
+    def _janela(self, inicio, fim, selecao):
+        """Início e fim de cada registro recortados à janela [inicio, fim] (e os registros na seleção)"""
+        registros = np.arange(len(self)) if selecao is None else np.flatnonzero(selecao)
+        janela_inicio, janela_fim = self.inicio[registros], self.fim[registros]
+        if inicio is not None:
+            janela_inicio = np.maximum(janela_inicio, _dia(inicio))
+        if fim is not None:
+            janela_fim = np.minimum(janela_fim, _dia(fim))
+        return registros, janela_inicio, janela_fim
+
+    def _operacoes_por_dia_semana(self, registros, janela_inicio, janela_fim):
+        """
+        Para cada dia da semana w: (registros, primeira data, quantidade) dos registros que
+        operam em w dentro da janela - base das contagens e da expansão
+        """
+        mascara = self.mascara[registros]
+        for dia in range(7):
+            opera = ((mascara >> dia) & 1).astype(bool) & (janela_inicio <= janela_fim)
+            indices = np.flatnonzero(opera)
+            primeira = janela_inicio[indices] + (dia - dia_da_semana(janela_inicio[indices])) % 7
+            quantidade = np.maximum(0, (janela_fim[indices] - primeira) // 7 + 1)
+            yield indices, primeira, quantidade
+
+    # --- Consultas sem expansão ---
+    def registros_na_data(self, data, selecao=None):
+        """Índices dos registros que operam na data"""
+        dia = _dia(data)
+        opera = (self.inicio <= dia) & (self.fim >= dia) & (((self.mascara >> dia_da_semana(dia)) & 1) == 1)
+        if selecao is not None:
+            opera &= selecao
+        return np.flatnonzero(opera)
+
+    def registros_no_dia_semana(self, dia_semana, selecao=None):
+        """Índices dos registros que operam no dia da semana (0 = segunda ou 'SEG'...'DOM')"""
+        if isinstance(dia_semana, str):
+            dia_semana = DIAS_SEMANA.index(dia_semana.strip().upper()[:3])
+        opera = ((self.mascara >> dia_semana) & 1) == 1
+        if selecao is not None:
+            opera &= selecao
+        return np.flatnonzero(opera)
+
+    def quantidade_operacoes(self, inicio=None, fim=None, selecao=None):
+        """Número de voos datados de cada registro dentro da janela (array do tamanho da temporada)"""
+        total = np.zeros(len(self), dtype=np.int64)
+        registros, janela_inicio, janela_fim = self._janela(inicio, fim, selecao)
+        for indices, _, quantidade in self._operacoes_por_dia_semana(registros, janela_inicio, janela_fim):
+            np.add.at(total, registros[indices], quantidade)
+        return total
+
+    def registros_no_periodo(self, inicio, fim, selecao=None):
+        """Índices dos registros com ao menos um voo na janela [inicio, fim]"""
+        return np.flatnonzero(self.quantidade_operacoes(inicio, fim, selecao))
+
+    def contagem_por_data(self, inicio, fim, selecao=None):
+        """
+        Voos por data na janela, via somas acumuladas por dia da semana
+        (O(registros + dias), sem gerar os voos datados)
+        """
+        primeiro, ultimo = _dia(inicio), _dia(fim)
+        dias = max(0, ultimo - primeiro + 1)
+        ativos = np.zeros((7, dias + 1), dtype=np.int64)
+        registros, janela_inicio, janela_fim = self._janela(inicio, fim, selecao)
+        validos = janela_inicio <= janela_fim
+        mascara = self.mascara[registros][validos]
+        de = janela_inicio[validos] - primeiro
+        ate = janela_fim[validos] - primeiro + 1
+        for dia in range(7):
+            com_dia = ((mascara >> dia) & 1).astype(bool)
+            np.add.at(ativos[dia], de[com_dia], 1)
+            np.add.at(ativos[dia], ate[com_dia], -1)
+        ativos = np.cumsum(ativos, axis=1)[:, :dias]
+        datas = np.arange(primeiro, primeiro + dias)
+        contagem = ativos[dia_da_semana(datas), np.arange(dias)]
+        return pd.Series(contagem, index=pd.DatetimeIndex(datas.astype('datetime64[D]'), name='data'), name='voos')
+
+    # --- Expansão ---
+    def expandir(self, inicio=None, fim=None, selecao=None):
+        """
+        Voos datados (uma linha por registro e data de operação) na janela e seleção pedidas,
+        ordenados por data e horário de partida
+        """
+        with etapa('operacoes.expansao') as medicao:
+            registros, janela_inicio, janela_fim = self._janela(inicio, fim, selecao)
+            partes_registro, partes_data = [], []
+            for indices, primeira, quantidade in self._operacoes_por_dia_semana(registros, janela_inicio, janela_fim):
+                repetidos = np.repeat(indices, quantidade)
+                # k-ésima ocorrência de cada registro: deslocamento desde o início do seu grupo
+                ordem_no_grupo = np.arange(len(repetidos)) - np.repeat(np.cumsum(quantidade) - quantidade, quantidade)
+                partes_registro.append(registros[repetidos])
+                partes_data.append(np.repeat(primeira, quantidade) + 7 * ordem_no_grupo)
+            registro = np.concatenate(partes_registro)
+            data = np.concatenate(partes_data)
+            ordem = np.lexsort((self.numero_voo[registro], self.partida[registro], data))
+            registro, data = registro[ordem], data[ordem]
+            medicao.linhas = len(registro)
+
+        return pd.DataFrame({
+            'data': data.astype('datetime64[D]'),
+            'companhia': self._texto('companhia', registro),
+            'numero_voo': self.numero_voo[registro],
+            'origem': self._texto('origem', registro),
+            'destino': self._texto('destino', registro),
+            'partida': _hhmm(self.partida[registro], self.partida_valida[registro]),
+            'chegada': _hhmm(self.chegada[registro], self.chegada_valida[registro]),
+            'equipamento': self._texto('equipamento', registro),
+            'posicao': self.posicoes[registro],
+        })
+
+    def voos_na_data(self, data, selecao=None):
+        """Voos datados de uma única data"""
+        return self.expandir(data, data, selecao)
@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+# Gerador SSIM - Geração paralela
+# Distribui as transformações da linha 3 entre processos, em blocos contíguos de linhas
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from referencias import IndiceAeroportos
+from parser_ssim import transformar_linhas3
+from fusos_horarios import transformar_linhas3_fuso_iana
+from temporada_compacta import abrir_temporada, linhas_nas_posicoes
+from instrumentacao import INSTRUMENTACAO, etapa
+
+LINHAS_MINIMAS_PARALELO = 20000  # Abaixo disso o custo de iniciar processos não compensa
+LINHAS_POR_TAREFA = 25000
+
+# Índice de aeroportos do processo trabalhador (recebido uma única vez na inicialização)
+_aeroportos_processo = None
+# Temporada mapeada do arquivo pelo trabalhador (as tarefas trazem só as posições)
+_temporada_processo = None
+
+
+def processos_disponiveis():
+    """Número de CPUs disponíveis para este processo"""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def _iniciar_processo(df_airports, instrumentacao_ativa=False, caminho_temporada=None):
+    """Inicializador dos trabalhadores: guarda o índice de aeroportos e mapeia a temporada"""
+    global _aeroportos_processo, _temporada_processo
+    _aeroportos_processo = df_airports
+    _temporada_processo = abrir_temporada(caminho_temporada) if caminho_temporada else None
+    INSTRUMENTACAO.ativa = instrumentacao_ativa
+
+
+def _transformar(linhas, df_airports, converter_para_brasilia, adaptar_ssim_gol, usar_fuso_iana):
+    """Escolhe o motor de conversão: fusos IANA ou offset do registro em horas cheias"""
+    if converter_para_brasilia and usar_fuso_iana:
+        return transformar_linhas3_fuso_iana(linhas, df_airports, adaptar_ssim_gol)
+    return transformar_linhas3(linhas, df_airports, converter_para_brasilia, adaptar_ssim_gol)
+
+
+def _transformar_bloco(linhas, converter_para_brasilia, adaptar_ssim_gol, usar_fuso_iana=False):
+    """Transforma um bloco no trabalhador e devolve as linhas, as consultas ao índice e os contadores"""
+    df_airports = _aeroportos_processo
+    if isinstance(df_airports, IndiceAeroportos):
+        df_airports.zerar_estatisticas()
+    INSTRUMENTACAO.zerar()
+    linhas = _transformar(linhas, df_airports, converter_para_brasilia, adaptar_ssim_gol, usar_fuso_iana)
+    estatisticas = df_airports.estatisticas() if isinstance(df_airports, IndiceAeroportos) else None
+    return linhas, estatisticas, dict(INSTRUMENTACAO.contadores)
+
+
+def _transformar_posicoes(posicoes, converter_para_brasilia, adaptar_ssim_gol, usar_fuso_iana=False):
+    """Lê as linhas das posições direto do mmap do trabalhador e transforma o bloco"""
+    linhas = _temporada_processo.linhas(posicoes)
+    return _transformar_bloco(linhas, converter_para_brasilia, adaptar_ssim_gol, usar_fuso_iana)
+
+
+def _usar_processos(total_linhas, processos, converter_para_brasilia, adaptar_ssim_gol):
+    """Só compensa dividir entre processos quando há transformação e linhas suficientes"""
+    com_transformacao = converter_para_brasilia or adaptar_ssim_gol
+    return processos > 1 and com_transformacao and total_linhas >= LINHAS_MINIMAS_PARALELO
+
+
+def _dividir(sequencia, processos):
+    """Blocos contíguos: a concatenação dos resultados mantém a ordem original"""
+    tamanho_bloco = max(LINHAS_MINIMAS_PARALELO // 4, min(LINHAS_POR_TAREFA, -(-len(sequencia) // processos)))
+    return [sequencia[inicio:inicio + tamanho_bloco] for inicio in range(0, len(sequencia), tamanho_bloco)]
+
+
+def _executar(funcao, blocos, total_linhas, df_airports, processos, opcoes, caminho_temporada=None):
+    """Roda `funcao(bloco, *opcoes)` nos trabalhadores e junta linhas, consultas e contadores em ordem"""
+    resultado = []
+    with etapa('transformacao.paralela', linhas=total_linhas), ProcessPoolExecutor(
+        max_workers=min(processos, len(blocos)),
+        initializer=_iniciar_processo,
+        initargs=(df_airports, INSTRUMENTACAO.ativa, caminho_temporada)
+    ) as executor:
+        tarefas = [executor.submit(funcao, bloco, *opcoes) for bloco in blocos]
+        for tarefa in tarefas:
+            linhas_bloco, estatisticas, contadores = tarefa.result()
+            resultado.extend(linhas_bloco)
+            if estatisticas is not None:
+                df_airports.mesclar_estatisticas(estatisticas)
+            for nome, quantidade in contadores.items():
+                INSTRUMENTACAO.contar(nome, quantidade)
+    return resultado
+
+
+def transformar_linhas3_paralelo(linhas, df_airports=None, converter_para_brasilia=False,
+                                 adaptar_ssim_gol=False, processos=1, usar_fuso_iana=False):
+    """
+    Mesmo resultado de transformar_linhas3, com os blocos de linhas divididos entre
+    `processos` trabalhadores. A ordem das linhas é preservada e as consultas ao
+    índice de aeroportos feitas nos trabalhadores são somadas ao índice do processo pai.
+    Com `usar_fuso_iana` a conversão para Brasília usa os fusos IANA (fusos_horarios) e um
+    registro pode virar vários quando o período atravessa uma troca de horário de verão.
+    """
+    linhas = list(linhas)
+    if not _usar_processos(len(linhas), processos, converter_para_brasilia, adaptar_ssim_gol):
+        return _transformar(linhas, df_airports, converter_para_brasilia, adaptar_ssim_gol, usar_fuso_iana)
+
+    return _executar(
+        _transformar_bloco, _dividir(linhas, processos), len(linhas), df_airports, processos,
+        (converter_para_brasilia, adaptar_ssim_gol, usar_fuso_iana)
+    )
+
+
+def transformar_posicoes_paralelo(dados_json, posicoes, df_airports=None, converter_para_brasilia=False,
+                                  adaptar_ssim_gol=False, processos=1, usar_fuso_iana=False):
+    """
+    Como transformar_linhas3_paralelo, para as linhas de `dados_json` nas `posicoes`.
+    Se `dados_json` for uma temporada mapeada de arquivo (abrir_temporada), cada trabalhador
+    mapeia o mesmo arquivo e as tarefas levam só as posições, sem enviar as linhas.
+    """
+    caminho_temporada = getattr(dados_json, 'caminho', None)
+    usar_processos = _usar_processos(len(posicoes), processos, converter_para_brasilia, adaptar_ssim_gol)
+    if caminho_temporada is None or not usar_processos:
+        return transformar_linhas3_paralelo(
+            linhas_nas_posicoes(dados_json, posicoes), df_airports, converter_para_brasilia,
+            adaptar_ssim_gol, processos, usar_fuso_iana
+        )
+
+    posicoes = np.asarray(posicoes, dtype=np.int64)
+    return _executar(
+        _transformar_posicoes, _dividir(posicoes, processos), len(posicoes), df_airports, processos,
+        (converter_para_brasilia, adaptar_ssim_gol, usar_fuso_iana), caminho_temporada
+    )
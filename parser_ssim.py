@@ -0,0 +1,348 @@
+# -*- coding: utf-8 -*-
+# Gerador SSIM - Parser vetorizado da linha 3
+# Fatia a temporada inteira em colunas tipadas (NumPy/pandas) em uma única passada
+
+import numpy as np
+
+from referencias import IndiceAeroportos
+from pipeline_ssim import compilar_pipeline
+from instrumentacao import etapa, contar, modulo_sob_demanda
+
+pd = modulo_sob_demanda('pandas')
+
+TAMANHO_LINHA = 200
+TAMANHO_LOTE = 65536  # Linhas por bloco nas operações sobre a matriz de caracteres
+
+# Layout da linha 3 (posições 0-based, fim exclusivo) - IATA SSIM capítulo 7
+CAMPOS_LINHA3 = {
+    'sufixo_operacional': (1, 2),
+    'companhia': (2, 5),
+    'numero_voo': (5, 9),
+    'variacao_itinerario': (9, 11),
+    'sequencia_perna': (11, 13),
+    'tipo_servico': (13, 14),
+    'periodo_inicio': (14, 21),
+    'periodo_fim': (21, 28),
+    'dias_operacao': (28, 35),
+    'frequencia': (35, 36),
+    'origem': (36, 39),
+    'partida_passageiro': (39, 43),
+    'partida_aeronave': (43, 47),
+    'offset_partida': (47, 52),
+    'terminal_partida': (52, 54),
+    'destino': (54, 57),
+    'chegada_aeronave': (57, 61),
+    'chegada_passageiro': (61, 65),
+    'offset_chegada': (65, 70),
+    'terminal_chegada': (70, 72),
+    'equipamento': (72, 75),
+    'prbd': (75, 95),
+    'refeicao': (100, 110),
+    'proprietario_aeronave': (128, 131),
+    'companhia_onward': (137, 140),
+    'voo_onward': (140, 144),
+    'configuracao': (172, 192),
+    'numero_registro': (194, 200),
+}
+
+CAMPOS_TEXTO = [
+    'sufixo_operacional', 'companhia', 'variacao_itinerario', 'sequencia_perna',
+    'tipo_servico', 'dias_operacao', 'frequencia', 'origem', 'terminal_partida',
+    'destino', 'terminal_chegada', 'equipamento', 'prbd', 'refeicao',
+    'proprietario_aeronave', 'companhia_onward', 'configuracao',
+]
+CAMPOS_NUMERICOS = ['numero_voo', 'voo_onward', 'numero_registro']
+CAMPOS_HORARIO = ['partida_passageiro', 'partida_aeronave', 'chegada_aeronave', 'chegada_passageiro']
+CAMPOS_OFFSET = ['offset_partida', 'offset_chegada']
+CAMPOS_DATA = ['periodo_inicio', 'periodo_fim']
+
+MESES_SSIM = ['JAN', 'FEB', 'MAR', 'APR', 'MAY', 'JUN', 'JUL', 'AUG', 'SEP', 'OCT', 'NOV', 'DEC']
+
+_ESPACO, _MAIS, _MENOS, _ZERO = ord(' '), ord('+'), ord('-'), ord('0')
+_CODIGOS_MESES = np.array(
+    [(ord(m[0]) << 16) | (ord(m[1]) << 8) | ord(m[2]) for m in MESES_SSIM], dtype=np.int64
+)
+_ORDEM_MESES = np.argsort(_CODIGOS_MESES)
+
+
+def matriz_caracteres(linhas):
+    """
+    Monta uma matriz (n, 200) de bytes com as linhas SSIM, completando com espaços.
+    Caracteres fora do ASCII viram '?' (a posição de cada campo é preservada).
+    """
+    texto = ''.join([linha[:TAMANHO_LINHA].ljust(TAMANHO_LINHA) for linha in linhas])
+    dados = texto.encode('ascii', errors='replace')
+    return np.frombuffer(dados, dtype=np.uint8).reshape(len(linhas), TAMANHO_LINHA)
+
+
+def _eh_digito(bloco):
+    return (bloco >= _ZERO) & (bloco <= _ZERO + 9)
+
+
+def _eh_maiuscula(bloco):
+    return (bloco >= ord('A')) & (bloco <= ord('Z'))
+
+
+def _eh_alfanumerico(bloco):
+    return _eh_digito(bloco) | _eh_maiuscula(bloco) | ((bloco >= ord('a')) & (bloco <= ord('z')))
+
+
+def _texto(matriz, inicio, fim, remover_espacos=True):
+    """Extrai um campo de texto fixo como Categorical (espaços à direita removidos)"""
+    bloco = np.array(matriz[:, inicio:fim])
+    if remover_espacos:
+        # Espaços finais viram NUL, que o dtype S descarta automaticamente
+        finais = np.logical_and.accumulate((bloco == _ESPACO)[:, ::-1], axis=1)[:, ::-1]
+        bloco[finais] = 0
+    valores = bloco.view(f'S{fim - inicio}').ravel()
+    categorias, codigos = np.unique(valores, return_inverse=True)
+    return pd.Categorical.from_codes(codigos.ravel(), categorias.astype('U'))
+
+
+def _numero(matriz, inicio, fim):
+    """Converte um campo numérico fixo em (valores, validos)"""
+    bloco = matriz[:, inicio:fim]
+    validos = _eh_digito(bloco).all(axis=1)
+    pesos = 10 ** np.arange(fim - inicio - 1, -1, -1, dtype=np.int64)
+    valores = (bloco.astype(np.int64) - _ZERO) @ pesos
+    return np.where(validos, valores, 0), validos
+
+
+def _horario(matriz, inicio):
+    """Converte HHMM em minutos desde a meia-noite"""
+    valores, validos = _numero(matriz, inicio, inicio + 4)
+    return (valores // 100) * 60 + valores % 100, validos
+
+
+def _offset(matriz, inicio):
+    """Converte a variação UTC (+HHMM / -HHMM) em minutos com sinal"""
+    sinal = matriz[:, inicio]
+    minutos, validos = _horario(matriz, inicio + 1)
+    validos &= (sinal == _MAIS) | (sinal == _MENOS)
+    return np.where(sinal == _MENOS, -minutos, minutos), validos
+
+
+def _data(matriz, inicio):
+    """Converte DDMMMYY em datetime64[D] (NaT quando inválida)"""
+    dia, dia_valido = _numero(matriz, inicio, inicio + 2)
+    ano, ano_valido = _numero(matriz, inicio + 5, inicio + 7)
+    bloco = matriz[:, inicio + 2:inicio + 5].astype(np.int64)
+    codigo_mes = (bloco[:, 0] << 16) | (bloco[:, 1] << 8) | bloco[:, 2]
+    posicao = np.searchsorted(_CODIGOS_MESES, codigo_mes, sorter=_ORDEM_MESES)
+    posicao = np.minimum(posicao, len(MESES_SSIM) - 1)
+    mes = _ORDEM_MESES[posicao]
+    mes_valido = _CODIGOS_MESES[mes] == codigo_mes
+
+    validos = dia_valido & ano_valido & mes_valido & (dia >= 1) & (dia <= 31)
+    meses_desde_1970 = (2000 + ano - 1970) * 12 + mes
+    datas = meses_desde_1970.astype('datetime64[M]').astype('datetime64[D]') + (dia - 1)
+    return np.where(validos, datas, np.datetime64('NaT', 'D'))
+
+
+def _mascara_dias(matriz):
+    """Dias de operação como bitmask (bit 0 = segunda ... bit 6 = domingo)"""
+    inicio = CAMPOS_LINHA3['dias_operacao'][0]
+    mascara = np.zeros(len(matriz), dtype=np.uint8)
+    for dia in range(7):
+        mascara |= (matriz[:, inicio + dia] == ord('1') + dia).astype(np.uint8) << dia
+    return mascara
+
+
+def parsear_linhas3(linhas, matriz=None):
+    """
+    Fatia registros 3 em um DataFrame de colunas tipadas, em uma única passada vetorizada.
+
+    Textos viram Categorical; campos numéricos, horários (minutos) e offsets (minutos)
+    usam inteiros anuláveis; períodos viram datas e os dias também saem como bitmask.
+    """
+    if matriz is None:
+        matriz = matriz_caracteres(linhas)
+
+    colunas = {}
+    for campo in CAMPOS_TEXTO:
+        inicio, fim = CAMPOS_LINHA3[campo]
+        colunas[campo] = _texto(matriz, inicio, fim, remover_espacos=campo != 'dias_operacao')
+    for campo in CAMPOS_NUMERICOS:
+        valores, validos = _numero(matriz, *CAMPOS_LINHA3[campo])
+        colunas[campo] = pd.arrays.IntegerArray(valores.astype(np.int32), ~validos)
+    for campo in CAMPOS_HORARIO:
+        valores, validos = _horario(matriz, CAMPOS_LINHA3[campo][0])
+        colunas[campo] = pd.arrays.IntegerArray(valores.astype(np.int16), ~validos)
+    for campo in CAMPOS_OFFSET:
+        valores, validos = _offset(matriz, CAMPOS_LINHA3[campo][0])
+        colunas[campo] = pd.arrays.IntegerArray(valores.astype(np.int16), ~validos)
+    for campo in CAMPOS_DATA:
+        colunas[campo] = _data(matriz, CAMPOS_LINHA3[campo][0])
+    colunas['dias_mascara'] = _mascara_dias(matriz)
+
+    ordem = [campo for campo in CAMPOS_LINHA3 if campo in colunas] + ['dias_mascara']
+    return pd.DataFrame({campo: colunas[campo] for campo in ordem})
+
+
+def _posicao_ajuste_formato(matriz):
+    """
+    Reproduz em lote a decisão de ajustar_formato_ssim para cada linha.
+
+    Retorna (posicao, seguro): `posicao` é onde o código da CIA é repetido (-1 quando a
+    linha não muda) e `seguro` indica que a decisão é exata; as demais vão ao fallback.
+    """
+    linhas, largura = matriz.shape
+    espaco = matriz == _ESPACO
+    colunas = np.arange(largura, dtype=np.int16)
+
+    # Tamanho da sequência de espaços que termina em cada posição (inclusive)
+    ultimo_nao_espaco = np.maximum.accumulate(np.where(espaco, -1, colunas), axis=1)
+    sequencia = colunas - ultimo_nao_espaco
+
+    # Padrão 1: ( {30,})CC (\d{4}) -> candidatos p onde "CC NNNN" começa
+    cia0, cia1 = matriz[:, 2:3], matriz[:, 3:4]
+    fim = largura - 6
+    digito = _eh_digito(matriz)
+    codigo_voo = (
+        (matriz[:, 1:fim] == cia0) & (matriz[:, 2:fim + 1] == cia1) & espaco[:, 3:fim + 2] &
+        digito[:, 4:fim + 3] & digito[:, 5:fim + 4] & digito[:, 6:fim + 5] & digito[:, 7:fim + 6]
+    )
+    candidatos = codigo_voo & (sequencia[:, :fim - 1] >= 30)  # candidato p = coluna + 1
+    quantidade = candidatos.sum(axis=1)
+    posicao = np.where(quantidade == 1, candidatos.argmax(axis=1) + 1 - 9, -1)
+
+    # Padrão 2 (só sem padrão 1): primeira sequência de 25+ espaços seguida de "CC "
+    tem_25 = sequencia >= 25
+    primeira = np.where(tem_25.any(axis=1), tem_25.argmax(axis=1), largura)
+    proximo_nao_espaco = np.minimum.accumulate(
+        np.where(espaco, largura, colunas)[:, ::-1], axis=1
+    )[:, ::-1]
+    fim_sequencia = np.append(proximo_nao_espaco, np.full((linhas, 1), largura), axis=1)[
+        np.arange(linhas), np.minimum(primeira, largura)
+    ]
+    apos = np.append(matriz, np.zeros((linhas, 3), dtype=matriz.dtype), axis=1)
+    indice_linhas = np.arange(linhas)
+    seguido_cia = (
+        (apos[indice_linhas, fim_sequencia] == cia0[:, 0]) &
+        (apos[indice_linhas, fim_sequencia + 1] == cia1[:, 0]) &
+        (apos[indice_linhas, fim_sequencia + 2] == _ESPACO)
+    )
+    padrao_2 = (quantidade == 0) & (primeira < largura) & seguido_cia
+
+    seguro = (quantidade <= 1) & ~padrao_2
+    return posicao, seguro
+
+
+def _linhas_canonicas(matriz, linhas):
+    """
+    Linhas em que ajuste de formato + conversão de horário equivalem a edições em
+    posições fixas (bytes idênticos às funções linha a linha). As demais usam o fallback.
+    """
+    canonicas = np.fromiter(
+        (len(linha) == TAMANHO_LINHA and linha.isascii() for linha in linhas),
+        dtype=bool, count=len(linhas)
+    )
+    canonicas &= (matriz[:, 0] == ord('3')) & (matriz[:, 1] == _ESPACO)
+    canonicas &= _eh_alfanumerico(matriz[:, 2:4]).all(axis=1)
+
+    # converter_horario_ssim: blocos AAAHHMMHHMM±HHMM fixos e nenhum outro sinal na linha
+    for inicio in (36, 54):
+        canonicas &= _eh_maiuscula(matriz[:, inicio:inicio + 3]).all(axis=1)
+        canonicas &= _eh_digito(matriz[:, inicio + 3:inicio + 11]).all(axis=1)
+        canonicas &= _eh_digito(matriz[:, inicio + 12:inicio + 16]).all(axis=1)
+        # Offsets de até 20h mantêm as horas convertidas com 2 dígitos
+        horas_offset = (matriz[:, inicio + 12].astype(np.int16) - _ZERO) * 10 + (matriz[:, inicio + 13] - _ZERO)
+        canonicas &= horas_offset <= 20
+    sinais = (matriz == _MAIS) | (matriz == _MENOS)
+    canonicas &= sinais[:, 47] & sinais[:, 65] & (sinais.sum(axis=1) == 2)
+
+    posicao_ajuste, seguro = _posicao_ajuste_formato(matriz)
+    return canonicas & seguro, posicao_ajuste
+
+
+def _converter_bloco_brasilia(matriz, inicio):
+    """Converte um bloco AAAHHMMHHMM±HHMM para UTC-3 (mesma regra de converter_horario_ssim)"""
+    sinal = np.where(matriz[:, inicio + 11] == _MENOS, -1, 1)
+    horas_offset = sinal * ((matriz[:, inicio + 12].astype(np.int64) - _ZERO) * 10 +
+                            (matriz[:, inicio + 13] - _ZERO))
+    diferenca = -3 - horas_offset
+    alterar = diferenca != 0
+
+    for posicao in (inicio + 3, inicio + 7):
+        horas = (matriz[:, posicao].astype(np.int64) - _ZERO) * 10 + (matriz[:, posicao + 1] - _ZERO)
+        horas = horas + diferenca
+        horas = np.where(horas >= 24, horas - 24, np.where(horas < 0, horas + 24, horas))
+        matriz[:, posicao] = np.where(alterar, _ZERO + horas // 10, matriz[:, posicao])
+        matriz[:, posicao + 1] = np.where(alterar, _ZERO + horas % 10, matriz[:, posicao + 1])
+
+    matriz[alterar, inicio + 11:inicio + 16] = np.frombuffer(b'-0300', dtype=np.uint8)
+    contar('conversao_horario.blocos_convertidos', int(np.count_nonzero(alterar)))
+
+
+def _contabilizar_consultas(df_airports, matriz):
+    """Registra no índice de aeroportos as consultas feitas pela conversão em lote"""
+    if not isinstance(df_airports, IndiceAeroportos) or len(matriz) == 0:
+        return
+    estacoes = np.concatenate([
+        np.ascontiguousarray(matriz[:, 36:39]).view('S3').ravel(),
+        np.ascontiguousarray(matriz[:, 54:57]).view('S3').ravel(),
+    ])
+    codigos, contagens = np.unique(estacoes, return_counts=True)
+    for codigo, quantidade in zip(codigos, contagens):
+        df_airports.contabilizar(codigo.decode('ascii'), int(quantidade))
+
+
+def _converter_lote_brasilia(linhas, df_airports, pipeline):
+    """Ajuste de formato + conversão para Brasília em um bloco de linhas"""
+    resultado = list(linhas)
+    matriz = matriz_caracteres(resultado).copy()
+    canonicas, posicao_ajuste = _linhas_canonicas(matriz, resultado)
+    posicoes = np.flatnonzero(canonicas)
+
+    if len(posicoes):
+        bloco = matriz[posicoes]
+        # ajustar_formato_ssim: repete o código da CIA 9 posições antes do "CC NNNN"
+        ajuste = posicao_ajuste[posicoes]
+        com_ajuste = np.flatnonzero(ajuste >= 0)
+        bloco[com_ajuste, ajuste[com_ajuste]] = bloco[com_ajuste, 2]
+        bloco[com_ajuste, ajuste[com_ajuste] + 1] = bloco[com_ajuste, 3]
+
+        contar('ajuste_formato.padrao_principal', len(com_ajuste))
+        contar('ajuste_formato.sem_ajuste', len(posicoes) - len(com_ajuste))
+        _contabilizar_consultas(df_airports, bloco)
+        _converter_bloco_brasilia(bloco, 36)
+        _converter_bloco_brasilia(bloco, 54)
+
+        texto = bloco.tobytes().decode('ascii')
+        for k, posicao in enumerate(posicoes.tolist()):
+            resultado[posicao] = texto[k * TAMANHO_LINHA:(k + 1) * TAMANHO_LINHA]
+
+    fora_do_layout = np.flatnonzero(~canonicas).tolist()
+    contar('parser.linhas_vetorizadas', len(posicoes))
+    contar('parser.linhas_fora_do_layout', len(fora_do_layout))
+    for posicao in fora_do_layout:
+        resultado[posicao] = pipeline(resultado[posicao])
+
+    return resultado
+
+
+def transformar_linhas3(linhas, df_airports=None, converter_para_brasilia=False, adaptar_ssim_gol=False):
+    """
+    Aplica as transformações da linha 3 em lote, com resultado idêntico ao de
+    converter_horario_ssim / adaptar_para_padrao_ssim_gol aplicadas linha a linha.
+
+    Ajuste de formato e conversão para Brasília rodam vetorizados sobre a matriz de
+    caracteres; linhas fora do layout canônico e a adaptação GOL seguem linha a linha
+    pelo pipeline compilado (pipeline_ssim).
+    """
+    resultado = list(linhas)
+
+    if converter_para_brasilia:
+        with etapa('transformacao.conversao_brasilia', linhas=len(resultado)):
+            # Linhas fora do layout canônico passam pelo pipeline compilado (só conversão)
+            pipeline = compilar_pipeline(df_airports, converter_para_brasilia=True)
+            for inicio in range(0, len(resultado), TAMANHO_LOTE):
+                resultado[inicio:inicio + TAMANHO_LOTE] = _converter_lote_brasilia(
+                    resultado[inicio:inicio + TAMANHO_LOTE], df_airports, pipeline
+                )
+
+    if adaptar_ssim_gol:
+        with etapa('transformacao.adaptacao_gol', linhas=len(resultado)):
+            resultado = compilar_pipeline(adaptar_ssim_gol=True).transformar(resultado)
+
+    return resultado
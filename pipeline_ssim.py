@@ -0,0 +1,207 @@
+# -*- coding: utf-8 -*-
+# Gerador SSIM - Pipeline compilado da linha 3
+# Ajuste de formato, conversão para Brasília e adaptação GOL em uma única chamada por linha,
+# com padrões e modelos por companhia compilados uma vez (resultado idêntico a transformacoes.py)
+
+import re
+from functools import lru_cache
+
+from transformacoes import obter_offset_aeroporto
+from instrumentacao import contar
+
+OFFSET_BRASILIA = -3
+TAMANHO_LINHA = 200
+
+_ESPACOS_LONGOS = re.compile(r' {25,}')
+_AEROPORTO_HORARIO = re.compile(r'([A-Z]{3})(\d{4})(\d{4})([-+]\d{4})')
+_SERVICE_INFORMATION = re.compile(r'(000|Y\d+)')
+_TIPO_AERONAVE_ASCII = re.compile(r'[A-Za-z0-9]{3}')
+
+# Configuração de assentos do padrão GOL por tipo de aeronave
+_CONFIGURACOES_GOL = {
+    '73G': "138", '73X': "186", '738': "186",
+    '320': "180", '321': "224", '319': "224",
+    '789': "304", '788': "304",
+}
+
+
+@lru_cache(maxsize=1024)
+def _padrao_ajuste(codigo_cia):
+    """Padrão "30+ espaços + código da CIA + número" da companhia (None se inválido)"""
+    try:
+        return re.compile(f"( {{30,}}){codigo_cia} (\\d{{4}})")
+    except re.error:
+        return None
+
+
+@lru_cache(maxsize=1024)
+def _padrao_onward(codigo_cia):
+    """Padrão do campo onward carriage ("CC NNNN") da companhia (None se inválido)"""
+    try:
+        return re.compile(f"{codigo_cia} \\d{{4}}")
+    except re.error:
+        return None
+
+
+@lru_cache(maxsize=65536)
+def _horario_convertido(horario, diferenca_horas):
+    """HHMM deslocado em `diferenca_horas`, com a mesma volta de 24h de converter_horario_ssim"""
+    valor = int(horario)
+    horas = valor // 100 + diferenca_horas
+    minutos = valor % 100
+    if horas >= 24:
+        horas -= 24
+    elif horas < 0:
+        horas += 24
+    return f"{horas:02d}{minutos:02d}"
+
+
+def _tipo_aeronave(linha):
+    """Primeiro trio alfanumérico entre as posições 100 e 120 (ou "")"""
+    limite = min(120, len(linha) - 3)
+    if linha.isascii():
+        match = _TIPO_AERONAVE_ASCII.search(linha, 100, limite + 2)
+        return match.group(0) if match else ""
+    for i in range(100, limite):
+        if linha[i:i+3].strip() and linha[i:i+3].isalnum():
+            return linha[i:i+3].strip()
+    return ""
+
+
+class PipelineLinha3:
+    """
+    Plano de transformação da linha 3 resolvido uma única vez para um conjunto de opções.
+    Cada chamada aplica, em sequência, as mesmas etapas de converter_horario_ssim e
+    adaptar_para_padrao_ssim_gol, sem recompilar padrões por linha.
+    """
+
+    def __init__(self, df_airports=None, converter_para_brasilia=False, adaptar_ssim_gol=False):
+        self.df_airports = df_airports
+        self.converter_para_brasilia = converter_para_brasilia
+        self.adaptar_ssim_gol = adaptar_ssim_gol
+
+        etapas = []
+        if converter_para_brasilia:
+            etapas.append(self._ajustar_e_converter)
+        if adaptar_ssim_gol:
+            etapas.append(self._adaptar_gol)
+        self._etapas = tuple(etapas)
+
+    def __call__(self, linha):
+        if not linha.startswith('3 '):
+            return linha
+        for etapa in self._etapas:
+            linha = etapa(linha)
+        return linha
+
+    def transformar(self, linhas):
+        """Aplica o plano a uma sequência de linhas"""
+        if not self._etapas:
+            return list(linhas)
+        return [self(linha) for linha in linhas]
+
+    # --- Etapas ---
+    def _ajustar(self, linha):
+        """Equivalente a ajustar_formato_ssim"""
+        codigo_cia = linha[2:4].strip()
+        padrao = _padrao_ajuste(codigo_cia)
+        if padrao is None:
+            contar('ajuste_formato.erros_ignorados')
+            return linha
+
+        match = padrao.search(linha)
+        if match:
+            espacos_originais, numero_voo = match.groups()
+            # O padrão exige 30+ espaços, então sempre sobram espaços antes do novo código
+            novo_formato = f"{' ' * (len(espacos_originais) - 9)}{codigo_cia}{' ' * 7}{codigo_cia} {numero_voo}"
+            contar('ajuste_formato.padrao_principal')
+            return linha.replace(f"{espacos_originais}{codigo_cia} {numero_voo}", novo_formato)
+
+        match_espacos = _ESPACOS_LONGOS.search(linha)
+        if match_espacos and linha.startswith(f"{codigo_cia} ", match_espacos.end()):
+            espacos_encontrados = match_espacos.group(0)
+            novo_formato = f"{' ' * (len(espacos_encontrados) - 9)}{codigo_cia}{' ' * 7}"
+            contar('ajuste_formato.fallback_espacos')
+            return linha.replace(espacos_encontrados, novo_formato)
+
+        contar('ajuste_formato.sem_ajuste')
+        return linha
+
+    def _ajustar_e_converter(self, linha):
+        """Equivalente a converter_horario_ssim(linha, df_airports, True)"""
+        linha_ajustada = self._ajustar(linha)
+        df_airports = self.df_airports
+
+        linha_convertida = linha_ajustada
+        for aeroporto, hora_partida, hora_chegada, offset_original in _AEROPORTO_HORARIO.findall(linha_ajustada):
+            # A consulta é mantida para as estatísticas do índice de aeroportos
+            obter_offset_aeroporto(aeroporto, df_airports)
+            diferenca_horas = OFFSET_BRASILIA - int(offset_original[:3])
+            if diferenca_horas != 0:
+                texto_original = f"{aeroporto}{hora_partida}{hora_chegada}{offset_original}"
+                texto_novo = (
+                    f"{aeroporto}{_horario_convertido(hora_partida, diferenca_horas)}"
+                    f"{_horario_convertido(hora_chegada, diferenca_horas)}-0300"
+                )
+                linha_convertida = linha_convertida.replace(texto_original, texto_novo)
+                contar('conversao_horario.blocos_convertidos')
+        return linha_convertida
+
+    def _adaptar_gol(self, linha_ssim):
+        """Equivalente a adaptar_para_padrao_ssim_gol"""
+        codigo_cia = linha_ssim[2:4].strip()
+        tipo_aeronave = _tipo_aeronave(linha_ssim) or "320"
+        linha = linha_ssim
+
+        padrao = _padrao_onward(codigo_cia)
+        if padrao is None:
+            contar('adaptacao_gol.erros_ignorados')
+            return linha_ssim
+        match_onward = padrao.search(linha)
+        if match_onward:
+            campo_onward_original = match_onward.group(0)
+            partes = campo_onward_original.split()
+            if len(partes) < 2:
+                contar('adaptacao_gol.erros_ignorados')
+                return linha_ssim
+            pos_onward = linha.find(campo_onward_original)
+            if pos_onward > 0:
+                novo_campo_onward = f"{codigo_cia}{' ' * 7}{codigo_cia} {partes[1]}"
+                linha = linha[:120] + novo_campo_onward + linha[pos_onward + len(campo_onward_original):]
+        else:
+            contar('adaptacao_gol.sem_onward')
+
+        match_service = _SERVICE_INFORMATION.search(linha, 150)
+        if match_service:
+            campo_service_original = match_service.group(0)
+            configuracao = _CONFIGURACOES_GOL.get(tipo_aeronave, "180")
+            pos_service = linha.rfind(campo_service_original)
+            if pos_service > 0:
+                linha = (
+                    linha[:pos_service]
+                    + f"Y{configuracao}VV{tipo_aeronave}{codigo_cia}"
+                    + linha[pos_service + len(campo_service_original):]
+                )
+        else:
+            contar('adaptacao_gol.sem_service_information')
+
+        # Garantir 200 caracteres exatos (contados para o painel de desempenho)
+        if len(linha) > TAMANHO_LINHA:
+            contar('adaptacao_gol.linhas_truncadas')
+            linha = linha[:TAMANHO_LINHA]
+        elif len(linha) < TAMANHO_LINHA:
+            contar('adaptacao_gol.linhas_completadas')
+            linha = linha.ljust(TAMANHO_LINHA)
+        return linha
+
+
+@lru_cache(maxsize=64)
+def _pipeline_sem_aeroportos(converter_para_brasilia, adaptar_ssim_gol):
+    return PipelineLinha3(None, converter_para_brasilia, adaptar_ssim_gol)
+
+
+def compilar_pipeline(df_airports=None, converter_para_brasilia=False, adaptar_ssim_gol=False):
+    """Resolve as opções em um PipelineLinha3 (reaproveitado quando não há índice de aeroportos)"""
+    if df_airports is None:
+        return _pipeline_sem_aeroportos(bool(converter_para_brasilia), bool(adaptar_ssim_gol))
+    return PipelineLinha3(df_airports, converter_para_brasilia, adaptar_ssim_gol)
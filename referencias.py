@@ -0,0 +1,260 @@
+# -*- coding: utf-8 -*-
+# Gerador SSIM - Dados de referência
+# Índices em memória construídos uma única vez a partir dos CSVs de apoio, via tabelas binárias
+# pré-compiladas (o pandas só lê o CSV na primeira carga ou quando o arquivo muda)
+
+import glob
+import hashlib
+import os
+import pickle
+import tempfile
+import time
+from collections import Counter, namedtuple
+
+from instrumentacao import INSTRUMENTACAO
+
+OFFSET_PADRAO_BRASILIA = -3
+
+# Tabelas compiladas ficam no cache local (mesma variável GERADOR_SSIM_CACHE das temporadas)
+DIRETORIO_TABELAS = os.path.join(
+    os.environ.get('GERADOR_SSIM_CACHE', os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache_ssim')),
+    'referencias'
+)
+VERSAO_TABELAS = 1  # Mudou o formato da tabela: incrementar para recompilar
+TAMANHO_BLOCO_HASH = 1 << 20
+
+Aeroporto = namedtuple(
+    'Aeroporto',
+    ['iata', 'icao', 'nome', 'cidade', 'pais', 'timezone', 'dst', 'tz']
+)
+
+Companhia = namedtuple(
+    'Companhia',
+    ['iata', 'nome', 'codigo_numerico', 'icao', 'pais']
+)
+
+NOME_NAO_ENCONTRADO = "Nome não encontrado"
+
+
+def _valor_valido(valor):
+    """Indica se um valor do CSV é utilizável (descarta vazios, NaN e '\\N')"""
+    if valor is None:
+        return False
+    if isinstance(valor, float) and valor != valor:
+        return False
+    texto = str(valor).strip()
+    return bool(texto) and texto != '\\N'
+
+
+def _hash_arquivo(caminho):
+    """SHA-256 do conteúdo do arquivo"""
+    resumo = hashlib.sha256()
+    with open(caminho, 'rb') as arquivo:
+        for bloco in iter(lambda: arquivo.read(TAMANHO_BLOCO_HASH), b''):
+            resumo.update(bloco)
+    return resumo.hexdigest()
+
+
+def _compilar_tabela(caminho_csv, colunas, destino):
+    """Lê as colunas do CSV com pandas e grava a tabela binária em `destino` (troca atômica)"""
+    import pandas as pd  # Só na compilação: a carga normal da tabela não importa o pandas
+
+    linhas = list(pd.read_csv(caminho_csv)[colunas].itertuples(index=False, name=None))
+    diretorio = os.path.dirname(destino)
+    try:
+        os.makedirs(diretorio, exist_ok=True)
+        descritor, temporario = tempfile.mkstemp(dir=diretorio, suffix='.pickle.tmp')
+        with os.fdopen(descritor, 'wb') as arquivo:
+            pickle.dump({'colunas': list(colunas), 'linhas': linhas}, arquivo, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporario, destino)
+        # Tabelas de versões anteriores do mesmo CSV
+        prefixo = destino.rsplit('-', 2)[0]
+        for antiga in glob.glob(glob.escape(prefixo) + '-' + '?' * 16 + '-v*.pickle'):
+            if antiga != destino:
+                os.remove(antiga)
+    except OSError:
+        pass  # Diretório somente leitura: segue com as linhas lidas do CSV
+    return linhas
+
+
+def carregar_tabela_referencia(caminho_csv, colunas, diretorio=DIRETORIO_TABELAS):
+    """
+    Linhas (tuplas) das `colunas` do CSV de referência, a partir da tabela binária
+    `<diretorio>/<nome>-<hash>-v<versão>.pickle`. A tabela é compilada na primeira carga e
+    recompilada quando o hash do CSV muda; o tempo de carga vai para os tempos de partida.
+    FileNotFoundError sobe quando o CSV não existe.
+    """
+    inicio = time.perf_counter()
+    nome = os.path.splitext(os.path.basename(caminho_csv))[0]
+    destino = os.path.join(diretorio, f"{nome}-{_hash_arquivo(caminho_csv)[:16]}-v{VERSAO_TABELAS}.pickle")
+    try:
+        with open(destino, 'rb') as arquivo:
+            tabela = pickle.load(arquivo)
+        if tabela['colunas'] != list(colunas):
+            raise ValueError("Tabela compilada com outras colunas")
+        linhas, origem = tabela['linhas'], 'tabela'
+    except (OSError, EOFError, KeyError, TypeError, ValueError, pickle.UnpicklingError):
+        linhas, origem = _compilar_tabela(caminho_csv, colunas, destino), 'csv'
+    INSTRUMENTACAO.registrar_partida(f'referencias.{nome}.{origem}', time.perf_counter() - inicio)
+    return linhas
+
+
+def _normalizar_nome(nome):
+    """Normaliza nome de aeroporto para busca (minúsculas e espaços simples)"""
+    return ' '.join(str(nome).lower().split())
+
+
+class IndiceAeroportos:
+    """Índice de aeroportos com busca O(1) por código IATA, ICAO ou nome"""
+
+    def __init__(self, aeroportos=()):
+        self.por_iata = {}
+        self.por_icao = {}
+        self.por_nome = {}
+        self.acertos = 0
+        self.falhas = 0
+        self.codigos_nao_encontrados = Counter()
+
+        for aeroporto in aeroportos:
+            # Mantém a primeira ocorrência, como o antigo df[...].iloc[0]
+            if _valor_valido(aeroporto.iata):
+                self.por_iata.setdefault(aeroporto.iata, aeroporto)
+            if _valor_valido(aeroporto.icao):
+                self.por_icao.setdefault(aeroporto.icao, aeroporto)
+            if _valor_valido(aeroporto.nome):
+                self.por_nome.setdefault(_normalizar_nome(aeroporto.nome), aeroporto)
+
+    COLUNAS_CSV = ['IATA', 'ICAO', 'Airport', 'City', 'Country', 'Timezone', 'DST', 'Tz']
+
+    @classmethod
+    def de_dataframe(cls, df_airports):
+        """Constrói o índice a partir do DataFrame lido de 'airport.csv'"""
+        aeroportos = (
+            Aeroporto(*valores)
+            for valores in df_airports[cls.COLUNAS_CSV].itertuples(index=False, name=None)
+        )
+        return cls(aeroportos)
+
+    @classmethod
+    def de_csv(cls, caminho='airport.csv', diretorio=DIRETORIO_TABELAS):
+        """Constrói o índice a partir de 'airport.csv' (pela tabela binária pré-compilada)"""
+        return cls(Aeroporto(*valores) for valores in carregar_tabela_referencia(caminho, cls.COLUNAS_CSV, diretorio))
+
+    def __len__(self):
+        return len(self.por_iata)
+
+    def __contains__(self, codigo_iata):
+        return codigo_iata in self.por_iata
+
+    def buscar_iata(self, codigo_iata):
+        """Retorna o aeroporto do código IATA (ou None), contabilizando acertos e falhas"""
+        aeroporto = self.por_iata.get(codigo_iata)
+        if aeroporto is None:
+            self.falhas += 1
+            self.codigos_nao_encontrados[codigo_iata] += 1
+        else:
+            self.acertos += 1
+        return aeroporto
+
+    def contabilizar(self, codigo_iata, quantidade=1):
+        """Registra `quantidade` consultas a um código IATA feitas em lote"""
+        if codigo_iata in self.por_iata:
+            self.acertos += quantidade
+        else:
+            self.falhas += quantidade
+            self.codigos_nao_encontrados[codigo_iata] += quantidade
+
+    def buscar_icao(self, codigo_icao):
+        """Retorna o aeroporto do código ICAO (ou None)"""
+        return self.por_icao.get(codigo_icao)
+
+    def buscar_nome(self, nome):
+        """Retorna o aeroporto pelo nome, ignorando maiúsculas e espaços extras"""
+        return self.por_nome.get(_normalizar_nome(nome))
+
+    def offset(self, codigo_iata, padrao=OFFSET_PADRAO_BRASILIA):
+        """Obtém o offset UTC do aeroporto, ou o padrão (Brasília) se não encontrado"""
+        aeroporto = self.buscar_iata(codigo_iata)
+        if aeroporto is None:
+            return padrao
+        return aeroporto.timezone
+
+    def tz(self, codigo_iata):
+        """Obtém o nome do fuso IANA (ex: America/Sao_Paulo) do aeroporto"""
+        aeroporto = self.por_iata.get(codigo_iata)
+        if aeroporto is None or not _valor_valido(aeroporto.tz):
+            return None
+        return aeroporto.tz
+
+    def estatisticas(self):
+        """Resumo das consultas feitas ao índice"""
+        return {
+            'aeroportos': len(self.por_iata),
+            'acertos': self.acertos,
+            'falhas': self.falhas,
+            'codigos_nao_encontrados': dict(self.codigos_nao_encontrados.most_common()),
+        }
+
+    def mesclar_estatisticas(self, estatisticas):
+        """Soma ao índice as consultas registradas em outra cópia (ex: outro processo)"""
+        self.acertos += estatisticas['acertos']
+        self.falhas += estatisticas['falhas']
+        self.codigos_nao_encontrados.update(estatisticas['codigos_nao_encontrados'])
+
+    def zerar_estatisticas(self):
+        """Zera os contadores de acertos e falhas"""
+        self.acertos = 0
+        self.falhas = 0
+        self.codigos_nao_encontrados.clear()
+
+
+class IndiceCompanhias:
+    """Índice de companhias aéreas com busca O(1) por designador IATA ou código ICAO"""
+
+    def __init__(self, companhias=()):
+        self.por_iata = {}
+        self.por_icao = {}
+
+        for companhia in companhias:
+            # Mantém a primeira ocorrência, como o antigo df[...].iloc[0]
+            if _valor_valido(companhia.iata):
+                self.por_iata.setdefault(companhia.iata, companhia)
+            if _valor_valido(companhia.icao):
+                self.por_icao.setdefault(companhia.icao, companhia)
+
+    COLUNAS_CSV = ['IATA Designator', 'Airline Name', '3 digit code', 'ICAO code', 'Country / Territory']
+
+    @classmethod
+    def de_dataframe(cls, df_airlines):
+        """Constrói o índice a partir do DataFrame lido de 'iata_airlines.csv'"""
+        companhias = (
+            Companhia(*valores)
+            for valores in df_airlines[cls.COLUNAS_CSV].itertuples(index=False, name=None)
+        )
+        return cls(companhias)
+
+    @classmethod
+    def de_csv(cls, caminho='iata_airlines.csv', diretorio=DIRETORIO_TABELAS):
+        """Constrói o índice a partir de 'iata_airlines.csv' (pela tabela binária pré-compilada)"""
+        return cls(Companhia(*valores) for valores in carregar_tabela_referencia(caminho, cls.COLUNAS_CSV, diretorio))
+
+    def __len__(self):
+        return len(self.por_iata)
+
+    def __contains__(self, codigo_iata):
+        return codigo_iata in self.por_iata
+
+    def buscar_iata(self, codigo_iata):
+        """Retorna a companhia do designador IATA (ou None)"""
+        return self.por_iata.get(codigo_iata)
+
+    def buscar_icao(self, codigo_icao):
+        """Retorna a companhia do código ICAO (ou None)"""
+        return self.por_icao.get(codigo_icao)
+
+    def nome(self, codigo_iata, padrao=NOME_NAO_ENCONTRADO):
+        """Nome da companhia do designador IATA, ou `padrao` se não encontrada"""
+        companhia = self.por_iata.get(codigo_iata)
+        if companhia is None:
+            return padrao
+        return companhia.nome
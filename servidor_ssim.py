@@ -0,0 +1,305 @@
+# -*- coding: utf-8 -*-
+# Gerador SSIM - Modo serviço (HTTP, sem Streamlit)
+# Serve os mesmos arquivos de filtrar_dados_por_companhia em streaming (gzip opcional), com
+# temporadas e resultados em caches compartilhados e um único cálculo por pedido repetido
+#
+# Exemplos:
+#   python servidor_ssim.py --porta 8080
+#   curl -o G3.ssim "http://localhost:8080/ssim?temporada=W25&companhia=G3&horario_brasilia=1"
+#   curl --compressed -O -J "http://localhost:8080/ssim?temporada=W25&companhia=TODAS&padrao_gol=1"
+#   curl "http://localhost:8080/companhias?temporada=W25"
+
+import argparse
+import hashlib
+import json
+import sys
+import threading
+import traceback
+import zlib
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import requests
+
+from referencias import IndiceAeroportos
+from temporada import indexar_temporada
+from api_anac import baixar_linhas_temporada
+from cache_temporadas import CacheTemporadas
+from cache_resultados import CacheResultados, ResultadoFiltragem
+from filtros_voos import FiltroVoos
+from gerador_ssim import selecionar_linhas_companhia, gerar_linhas_arquivo_ssim, gerar_nome_arquivo
+from escrita_ssim import escrever_linhas, nome_com_compressao, tipo_mime
+from instrumentacao import contar
+
+PORTA_PADRAO = 8080
+TEMPORADAS_EM_MEMORIA = 8  # Temporadas abertas (mmap + índice) mantidas entre as requisições
+VALORES_VERDADEIROS = {'1', 'true', 'sim', 's', 'yes', 'y', 'on'}
+PARAMETROS_FILTRO = ['estacao', 'rota', 'origem', 'destino', 'equipamento', 'de', 'ate']
+
+
+class ErroRequisicao(Exception):
+    """Erro a devolver ao cliente com o status HTTP correspondente"""
+
+    def __init__(self, status, mensagem):
+        super().__init__(mensagem)
+        self.status = status
+
+
+def _opcao(parametros, nome):
+    return parametros.get(nome, [''])[-1].strip().lower() in VALORES_VERDADEIROS
+
+
+def _texto(parametros, nome):
+    return parametros.get(nome, [''])[-1].strip() or None
+
+
+class ServicoSSIM:
+    """
+    Temporadas e arquivos gerados compartilhados por todas as requisições.
+
+    As temporadas vêm do cache em disco (mmap) e, quando expiram, são revalidadas na API em
+    segundo plano; só uma temporada ausente do disco faz a requisição esperar o download.
+    Temporadas abertas e resultados ficam em CacheResultados: pedidos simultâneos da mesma
+    chave aguardam um único cálculo e o total em memória é limitado (descarte LRU).
+    """
+
+    def __init__(self, cache_temporadas=None, limite_bytes=None, processos=1, caminho_aeroportos='airport.csv'):
+        self.cache_temporadas = cache_temporadas or CacheTemporadas()
+        # Limite das temporadas em número de entradas (cada uma mede 1)
+        self.temporadas = CacheResultados(limite_bytes=TEMPORADAS_EM_MEMORIA, medir=lambda temporada: 1)
+        self.resultados = CacheResultados(**({'limite_bytes': limite_bytes} if limite_bytes else {}))
+        self.processos = processos
+        self.caminho_aeroportos = caminho_aeroportos
+        self._aeroportos = None
+        self._lock_aeroportos = threading.Lock()
+
+    def aeroportos(self):
+        """Índice de aeroportos para a conversão de horários (lido uma vez)"""
+        with self._lock_aeroportos:
+            if self._aeroportos is None:
+                try:
+                    self._aeroportos = IndiceAeroportos.de_csv(self.caminho_aeroportos)
+                except FileNotFoundError:
+                    raise ErroRequisicao(503, f"Arquivo '{self.caminho_aeroportos}' não encontrado: conversão de horários indisponível")
+            return self._aeroportos
+
+    def temporada(self, temporada):
+        """(dados, índice) da temporada, abertos uma vez por conteúdo em cache"""
+        metadados = self.cache_temporadas.metadados(temporada)
+        if metadados is not None and self.cache_temporadas.expirado(metadados):
+            # Continua servindo a cópia local enquanto a API é consultada
+            self.cache_temporadas.atualizar_em_segundo_plano(temporada, baixar_linhas_temporada)
+        chave = (temporada, metadados['hash'] if metadados else None)
+        return self.temporadas.obter(chave, lambda: self._abrir_temporada(temporada))
+
+    def _abrir_temporada(self, temporada):
+        if self.cache_temporadas.metadados(temporada) is None:
+            situacao = self.cache_temporadas.atualizar(temporada, baixar_linhas_temporada)
+            contar('servico.downloads')
+            if situacao == 'erro':
+                raise ErroRequisicao(502, f"Resposta inválida da API para a temporada {temporada}")
+        dados, _ = self.cache_temporadas.carregar_mapeada(temporada)
+        if dados is None:
+            raise ErroRequisicao(404, f"Temporada {temporada} não disponível")
+        indice = indexar_temporada(dados)
+        if not len(indice.posicoes_linha3):
+            raise ErroRequisicao(404, f"Temporada {temporada} sem registros de voos")
+        return dados, indice
+
+    def gerar(self, temporada, codigo_companhia, converter_horarios=False, padrao_gol=False,
+              usar_fuso_iana=False, filtro_voos=None):
+        """ResultadoFiltragem da companhia (ou "TODAS"), calculado uma vez por conteúdo e opções"""
+        dados, indice = self.temporada(temporada)
+        if codigo_companhia != "TODAS" and codigo_companhia not in indice.por_companhia:
+            raise ErroRequisicao(404, f"Companhia {codigo_companhia} não encontrada na temporada {temporada}")
+        df_airports = self.aeroportos() if converter_horarios else None
+        usar_fuso_iana = bool(converter_horarios and usar_fuso_iana)
+
+        def calcular():
+            linhas_header, linhas_filtradas = selecionar_linhas_companhia(
+                dados, codigo_companhia, converter_horarios, df_airports, padrao_gol,
+                indice, self.processos, usar_fuso_iana, filtro_voos
+            )
+            return ResultadoFiltragem(tuple(linhas_header), tuple(linhas_filtradas), None)
+
+        chave = (indice.hash_conteudo, codigo_companhia, converter_horarios, padrao_gol, usar_fuso_iana, filtro_voos)
+        return chave, self.resultados.obter(chave, calcular)
+
+    def estatisticas(self):
+        return {
+            'temporadas': self.temporadas.estatisticas(),
+            'resultados': self.resultados.estatisticas(),
+        }
+
+
+class _SaidaChunked:
+    """Arquivo de texto sobre a resposta HTTP: cada escrita vira um chunk (comprimido com gzip, se pedido)"""
+
+    def __init__(self, wfile, comprimir):
+        self.wfile = wfile
+        self.compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if comprimir else None
+
+    def _enviar(self, dados):
+        if dados:
+            self.wfile.write(b'%x\r\n%s\r\n' % (len(dados), dados))
+
+    def write(self, texto):
+        dados = texto.encode('utf-8')
+        self._enviar(self.compressor.compress(dados) if self.compressor else dados)
+
+    def fechar(self):
+        if self.compressor:
+            self._enviar(self.compressor.flush())
+        self.wfile.write(b'0\r\n\r\n')
+
+
+class RequisicaoSSIM(BaseHTTPRequestHandler):
+    """Rotas: /ssim, /companhias e /saude (GET)"""
+
+    protocol_version = 'HTTP/1.1'
+    servico = None  # ServicoSSIM, definido em criar_servidor
+
+    def log_message(self, formato, *argumentos):
+        sys.stderr.write(f"🌐 {self.address_string()} {formato % argumentos}\n")
+
+    def end_headers(self):
+        super().end_headers()
+        self.cabecalhos_enviados = True
+
+    def do_GET(self):
+        self.cabecalhos_enviados = False
+        url = urlparse(self.path)
+        parametros = parse_qs(url.query)
+        rotas = {'/ssim': self._ssim, '/companhias': self._companhias, '/saude': self._saude}
+        try:
+            rota = rotas.get(url.path.rstrip('/') or '/')
+            if rota is None:
+                raise ErroRequisicao(404, f"Rota desconhecida: {url.path} (use /ssim, /companhias ou /saude)")
+            rota(parametros)
+        except ErroRequisicao as e:
+            self._json({'erro': str(e)}, e.status)
+        except requests.exceptions.Timeout:
+            self._json({'erro': "Timeout na consulta à API"}, 504)
+        except requests.exceptions.RequestException as e:
+            self._json({'erro': f"Erro na requisição à API: {str(e)}"}, 502)
+        except ConnectionError:
+            # Cliente desconectou no meio da resposta
+            self.close_connection = True
+        except Exception as e:
+            contar('servico.erros_internos')
+            self.log_error("Erro interno: %r", e)
+            traceback.print_exc()
+            if self.cabecalhos_enviados:
+                # Falha no meio do arquivo: sem o chunk final o cliente percebe a resposta incompleta
+                self.close_connection = True
+            else:
+                self._json({'erro': "Erro interno do servidor"}, 500)
+
+    def _json(self, conteudo, status=200):
+        corpo = json.dumps(conteudo, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def _temporada(self, parametros):
+        temporada = (_texto(parametros, 'temporada') or '').upper()
+        if not temporada:
+            raise ErroRequisicao(400, "Parâmetro 'temporada' obrigatório (ex: W25)")
+        return temporada
+
+    def _saude(self, parametros):
+        self._json({'status': 'ok', **self.servico.estatisticas()})
+
+    def _companhias(self, parametros):
+        temporada = self._temporada(parametros)
+        _, indice = self.servico.temporada(temporada)
+        self._json({'temporada': temporada, 'companhias': indice.contagem_por_companhia()})
+
+    def _ssim(self, parametros):
+        temporada = self._temporada(parametros)
+        codigo_companhia = (_texto(parametros, 'companhia') or 'TODAS').upper()
+        converter_horarios = _opcao(parametros, 'horario_brasilia')
+        padrao_gol = _opcao(parametros, 'padrao_gol')
+        usar_fuso_iana = _opcao(parametros, 'fuso_iana')
+        try:
+            filtro_voos = FiltroVoos(*(_texto(parametros, nome) for nome in PARAMETROS_FILTRO)).normalizado()
+        except ValueError as e:
+            raise ErroRequisicao(400, f"Filtro inválido: {str(e)}")
+
+        chave, resultado = self.servico.gerar(
+            temporada, codigo_companhia, converter_horarios, padrao_gol, usar_fuso_iana, filtro_voos
+        )
+        # Mesmo conteúdo e mesmo dia (data do registro 5): os agendadores recebem 304 sem corpo
+        etag = '"%s"' % hashlib.sha256(repr((chave, datetime.now().strftime('%Y%m%d'))).encode()).hexdigest()[:32]
+        if etag in self.headers.get('If-None-Match', ''):
+            contar('servico.nao_modificados')
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.end_headers()
+            return
+
+        # ?compressao=gzip: arquivo .ssim.gz; Accept-Encoding: gzip: o .ssim comprimido no transporte
+        arquivo_gzip = _texto(parametros, 'compressao') == 'gzip'
+        transporte_gzip = not arquivo_gzip and 'gzip' in self.headers.get('Accept-Encoding', '')
+        nome_arquivo = gerar_nome_arquivo(codigo_companhia, temporada, converter_horarios, padrao_gol, filtro_voos)
+        self.send_response(200)
+        if arquivo_gzip:
+            self.send_header('Content-Type', tipo_mime('gzip'))
+            nome_arquivo = nome_com_compressao(nome_arquivo, 'gzip')
+        else:
+            self.send_header('Content-Type', 'text/plain; charset=utf-8')
+        if transporte_gzip:
+            self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Disposition', f'attachment; filename="{nome_arquivo}"')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.send_header('ETag', etag)
+        self.end_headers()
+
+        saida = _SaidaChunked(self.wfile, arquivo_gzip or transporte_gzip)
+        linhas = gerar_linhas_arquivo_ssim(resultado.linhas_header, resultado.linhas_filtradas, codigo_companhia)
+        escrever_linhas(linhas, saida)
+        saida.fechar()
+        contar('servico.arquivos')
+
+
+def criar_servidor(servico, host='127.0.0.1', porta=PORTA_PADRAO):
+    """Servidor HTTP (uma thread por conexão) ligado ao serviço"""
+    requisicao = type('Requisicao', (RequisicaoSSIM,), {'servico': servico})
+    servidor = ThreadingHTTPServer((host, porta), requisicao)
+    servidor.daemon_threads = True
+    return servidor
+
+
+def criar_parser():
+    parser = argparse.ArgumentParser(
+        description="Serve por HTTP os arquivos SSIM gerados a partir da API SIROS da ANAC."
+    )
+    parser.add_argument('--host', default='127.0.0.1', help="Endereço de escuta (padrão: 127.0.0.1)")
+    parser.add_argument('--porta', type=int, default=PORTA_PADRAO, help=f"Porta (padrão: {PORTA_PADRAO})")
+    parser.add_argument('--limite-cache-mb', type=int, metavar='MB',
+                        help="Memória máxima dos arquivos gerados em cache (padrão: 512)")
+    parser.add_argument('--processos', type=int, default=1, metavar='N',
+                        help="Processos para as conversões de cada arquivo (padrão: 1)")
+    return parser
+
+
+def main(argv=None):
+    args = criar_parser().parse_args(argv)
+    limite_bytes = args.limite_cache_mb * 1024 * 1024 if args.limite_cache_mb else None
+    servico = ServicoSSIM(limite_bytes=limite_bytes, processos=max(args.processos, 1))
+    servidor = criar_servidor(servico, args.host, args.porta)
+    print(f"🌐 Servindo arquivos SSIM em http://{args.host}:{servidor.server_port}/ssim?temporada=W25&companhia=G3")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        print("👋 Servidor encerrado")
+    finally:
+        servidor.server_close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+# Gerador SSIM - Índice da temporada
+# Particiona os registros da API por tipo e por companhia em uma única passada
+
+import hashlib
+
+from instrumentacao import etapa
+from temporada_compacta import linhas_nas_posicoes
+
+
+def _linha_ssim(item):
+    """Extrai a linha SSIM de um item da API (ou None se o item for inválido)"""
+    if isinstance(item, dict) and 'ssimfile' in item:
+        return item['ssimfile']
+    return None
+
+
+class IndiceTemporada:
+    """
+    Índice de uma temporada carregada da API da ANAC.
+
+    Guarda as linhas de header (registros 1 e 2), o trailer original (registro 5)
+    e, para cada companhia, as posições dos registros 3 na lista `dados_json`.
+    Assim filtrar uma companhia custa proporcional aos voos dela, não à temporada.
+    """
+
+    def __init__(self):
+        self.linhas_header = []
+        self.linhas_trailer = []
+        self.posicoes_linha3 = []
+        self.por_companhia = {}
+        self.companhias = []
+        self.voos_por_companhia = {}
+        self.total_registros = 0
+        self.hash_conteudo = None
+        self.filtros = None  # IndiceFiltros (filtros_voos), montado quando a temporada é carregada para filtrar
+
+    def posicoes(self, codigo_companhia):
+        """Posições dos registros 3 da companhia ("TODAS" para a malha completa)"""
+        if codigo_companhia == "TODAS":
+            return self.posicoes_linha3
+        return self.por_companhia.get(codigo_companhia, [])
+
+    def linhas_companhia(self, dados_json, codigo_companhia):
+        """Itera as linhas 3 da companhia na ordem original da API"""
+        yield from linhas_nas_posicoes(dados_json, self.posicoes(codigo_companhia))
+
+    def contagem_por_companhia(self):
+        """Número de registros 3 por companhia (calculado na indexação)"""
+        return self.voos_por_companhia
+
+
+def _indice_do_arquivo(indice_arquivo):
+    """Monta o índice a partir do índice lateral de uma temporada gravada em arquivo"""
+    indice = IndiceTemporada()
+    indice.total_registros = indice_arquivo['total_registros']
+    indice.linhas_header = list(indice_arquivo['linhas_header'])
+    indice.linhas_trailer = list(indice_arquivo['linhas_trailer'])
+    indice.posicoes_linha3 = indice_arquivo['linhas3']
+    ordem, limites = indice_arquivo['ordem'], indice_arquivo['limites']
+    indice.por_companhia = {
+        codigo: ordem[limites[k]:limites[k + 1]] for k, codigo in enumerate(indice_arquivo['codigos'])
+    }
+    indice.companhias = list(indice_arquivo['companhias'])
+    indice.voos_por_companhia = {
+        codigo: len(posicoes) for codigo, posicoes in indice.por_companhia.items()
+    }
+    indice.hash_conteudo = indice_arquivo['hash_conteudo']
+    return indice
+
+
+def indexar_temporada(dados_json):
+    """Constrói o índice da temporada em uma única passada pelos dados da API"""
+    indice_arquivo = getattr(dados_json, 'indice_arquivo', None)
+    if indice_arquivo is not None:
+        # Temporada mapeada de arquivo: o índice já foi gravado junto, nada a percorrer
+        with etapa('indexacao'):
+            return _indice_do_arquivo(indice_arquivo)
+
+    with etapa('indexacao', linhas=len(dados_json)):
+        indice = IndiceTemporada()
+        indice.total_registros = len(dados_json)
+        por_companhia = indice.por_companhia
+        hash_conteudo = hashlib.sha256()
+
+        for posicao, item in enumerate(dados_json):
+            linha = _linha_ssim(item)
+            if not linha:
+                continue
+            # Identifica o conteúdo da temporada (chave dos resultados em cache)
+            hash_conteudo.update((linha + '\n').encode('utf-8'))
+
+            if linha.startswith(('1', '2')):
+                indice.linhas_header.append(linha)
+            elif linha.startswith('3 ') and len(linha) > 5:
+                indice.posicoes_linha3.append(posicao)
+                codigo_cia = linha[2:4].strip()
+                lista = por_companhia.get(codigo_cia)
+                if lista is None:
+                    lista = por_companhia[codigo_cia] = []
+                lista.append(posicao)
+            elif linha.startswith('5'):
+                indice.linhas_trailer.append(linha)
+
+        # Mesmo critério de extrair_companhias_do_ssim
+        indice.companhias = sorted(
+            codigo for codigo in por_companhia
+            if codigo and codigo.replace(' ', '').isalnum()
+        )
+        indice.voos_por_companhia = {
+            codigo: len(por_companhia[codigo]) for codigo in sorted(por_companhia)
+        }
+        indice.hash_conteudo = hash_conteudo.hexdigest()
+
+    return indice
@@ -0,0 +1,294 @@
+# -*- coding: utf-8 -*-
+# Gerador SSIM - Temporada compacta em memória
+# Registros de largura fixa (200 bytes) em um único buffer contíguo, com colunas de tipo de
+# registro e código da companhia; lida como a lista de dicts da API por uma camada fina de acesso
+
+import json
+import os
+import tempfile
+import threading
+import weakref
+
+import numpy as np
+
+TAMANHO_REGISTRO = 200
+_SEM_TIPO = 0  # Registro vazio ou guardado fora do buffer
+
+# Arquivo da temporada: registros de 200 bytes (mapeados com mmap) + índice lateral pequeno
+EXTENSAO_REGISTROS = '.registros'
+EXTENSAO_INDICE = '.indice.npz'
+VERSAO_ARQUIVO = 1
+
+
+class TemporadaCompacta:
+    """
+    Temporada somente leitura: a linha da posição i ocupa os bytes [i*200, i*200 + tamanhos[i])
+    do buffer, em UTF-8 e completada com espaços. Itens que não cabem nesse formato
+    (linhas com mais de 200 bytes, itens sem 'ssimfile' ou com outros campos) ficam
+    em `extras`, exatamente como vieram.
+
+    Indexar (`temporada[i]`) e iterar devolvem dicts {'ssimfile': linha}, como a lista da
+    API; `linha(i)` e `linhas(posicoes)` evitam criar os dicts.
+    """
+
+    def __init__(self, registros, tamanhos, extras=None, tipos=None, companhias=None, diretas=None):
+        self.registros = registros  # Matriz (n, 200) de uint8 sobre bytes (ou um mmap)
+        self.tamanhos = tamanhos
+        self.extras = extras or {}
+        self.indice = None  # IndiceTemporada montado uma vez para a temporada compartilhada
+        self.caminho = None  # Base do arquivo de onde a temporada foi mapeada (abrir_temporada)
+        self.indice_arquivo = None  # Índice lateral lido junto com o arquivo
+
+        # Colunas recebidas prontas (índice lateral) evitam percorrer o mmap inteiro
+        if tipos is None:
+            tipos = np.where(tamanhos > 0, registros[:, 0], _SEM_TIPO).astype(np.uint8)
+        if companhias is None:
+            companhias = np.ascontiguousarray(registros[:, 2:4]).view('S2').ravel()
+        if diretas is None:
+            # Linhas ASCII de 200 caracteres: decodificadas em lote, direto do buffer
+            diretas = (tamanhos == TAMANHO_REGISTRO) & (registros.max(axis=1, initial=0) < 0x80)
+        self.tipos = tipos
+        self.companhias = companhias
+        self._diretas = diretas
+        self._diretas_todas = bool(diretas.all())
+
+    @classmethod
+    def de_linhas(cls, linhas):
+        """Monta a temporada a partir das linhas SSIM (str), lidas uma a uma"""
+        return cls._construir(linhas)
+
+    @classmethod
+    def de_dados_api(cls, dados_json):
+        """Monta a temporada a partir dos registros da API ({'ssimfile': ...}), lidos um a um"""
+        if isinstance(dados_json, TemporadaCompacta):
+            return dados_json
+        return cls._construir(
+            item['ssimfile'] if isinstance(item, dict) and len(item) == 1 and isinstance(item.get('ssimfile'), str)
+            else item
+            for item in dados_json
+        )
+
+    @classmethod
+    def _construir(cls, itens):
+        """
+        Cada linha (str) é acrescentada ao buffer assim que lida: só o buffer de registros fica
+        em memória. Outros itens e linhas com mais de 200 bytes vão para `extras`.
+        """
+        buffer = bytearray()
+        tamanhos = bytearray()
+        extras = {}
+        for posicao, item in enumerate(itens):
+            codificada = item.encode('utf-8') if isinstance(item, str) else None
+            if codificada is None or len(codificada) > TAMANHO_REGISTRO:
+                extras[posicao] = item if codificada is None else {'ssimfile': item}
+                codificada = b''
+            tamanhos.append(len(codificada))
+            buffer += codificada.ljust(TAMANHO_REGISTRO)
+
+        # Matriz sobre o próprio buffer (sem cópia), somente leitura como antes
+        registros = np.frombuffer(buffer, dtype=np.uint8).reshape(len(tamanhos), TAMANHO_REGISTRO)
+        registros.flags.writeable = False
+        return cls(registros, np.frombuffer(tamanhos, dtype=np.uint8), extras)
+
+    # --- Acesso como lista da API ---
+    def __len__(self):
+        return len(self.tamanhos)
+
+    def __bool__(self):
+        return len(self.tamanhos) > 0
+
+    def __getitem__(self, posicao):
+        if posicao < 0:
+            posicao += len(self)
+        if self.extras and posicao in self.extras:
+            return self.extras[posicao]
+        return {'ssimfile': self.linha(posicao)}
+
+    def __iter__(self):
+        for posicao in range(len(self)):
+            yield self[posicao]
+
+    def linha(self, posicao):
+        """Linha SSIM da posição (None se o item não tiver 'ssimfile')"""
+        if self.extras and posicao in self.extras:
+            item = self.extras[posicao]
+            return item.get('ssimfile') if isinstance(item, dict) else None
+        return bytes(self.registros[posicao, :self.tamanhos[posicao]]).decode('utf-8')
+
+    def linhas(self, posicoes):
+        """Linhas SSIM das posições, decodificadas em lote"""
+        posicoes = np.asarray(posicoes, dtype=np.int64)
+        if not len(posicoes):
+            return []
+        if self._diretas_todas or self._diretas[posicoes].all():
+            texto = self.registros[posicoes].tobytes().decode('ascii')
+            return [texto[k:k + TAMANHO_REGISTRO] for k in range(0, len(texto), TAMANHO_REGISTRO)]
+        return [self.linha(posicao) for posicao in posicoes.tolist()]
+
+    # --- Colunas ---
+    def posicoes_tipo(self, tipo):
+        """Posições dos registros cujo primeiro caractere é `tipo` (ex: '3')"""
+        return np.flatnonzero(self.tipos == ord(tipo))
+
+    def posicoes_companhia(self, codigo_companhia):
+        """
+        Posições dos registros 3 ("3 ..." com mais de 5 caracteres, como em indexar_temporada)
+        cujo código (posições 2-4, sem espaços) é `codigo_companhia`
+        """
+        codigo = codigo_companhia.encode('utf-8')
+        candidatos = {codigo.ljust(2), codigo.rjust(2)} if len(codigo) < 2 else {codigo}
+        mesma_cia = np.isin(self.companhias, list(candidatos))
+        linha3 = (self.tipos == ord('3')) & (self.registros[:, 1] == ord(' ')) & (self.tamanhos > 5)
+        return np.flatnonzero(mesma_cia & linha3)
+
+    @property
+    def nbytes(self):
+        """Bytes ocupados pelo buffer e pelas colunas"""
+        return sum(coluna.nbytes for coluna in (
+            self.registros, self.tamanhos, self.tipos, self.companhias, self._diretas
+        ))
+
+
+def _substituir_atomicamente(destino, escrever):
+    """Grava em um temporário do mesmo diretório e troca pelo destino (leitores com mmap não são afetados)"""
+    descritor, temporario = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(destino)), suffix='.tmp')
+    try:
+        with os.fdopen(descritor, 'wb') as arquivo:
+            escrever(arquivo)
+        os.replace(temporario, destino)
+    except BaseException:
+        os.remove(temporario)
+        raise
+
+
+def gravar_temporada(temporada, indice, caminho_base, origem=None):
+    """
+    Grava a temporada em `caminho_base.registros` (n x 200 bytes, sem cabeçalho) e o índice
+    lateral em `caminho_base.indice.npz`: colunas por registro, posições dos registros 3
+    agrupadas por companhia (faixas contíguas em `ordem`), headers, trailer e o hash do
+    conteúdo. `origem` identifica de onde o arquivo foi gerado (ex: hash do cache em disco).
+    """
+    registros = np.ascontiguousarray(temporada.registros)
+    codigos = sorted(indice.por_companhia)
+    grupos = [np.asarray(indice.por_companhia[codigo], dtype=np.int64) for codigo in codigos]
+    ordem = np.concatenate(grupos) if grupos else np.empty(0, dtype=np.int64)
+    limites = np.cumsum([0] + [len(grupo) for grupo in grupos]).astype(np.int64)
+    metadados = {
+        'versao': VERSAO_ARQUIVO,
+        'registros': len(temporada),
+        'origem': origem,
+        'hash_conteudo': indice.hash_conteudo,
+        'total_registros': indice.total_registros,
+        'codigos': codigos,
+        'companhias': indice.companhias,
+        'linhas_header': indice.linhas_header,
+        'linhas_trailer': indice.linhas_trailer,
+        'extras': {str(posicao): item for posicao, item in temporada.extras.items()},
+    }
+
+    # Registros primeiro: o índice lateral só aparece quando os registros já estão completos
+    _substituir_atomicamente(caminho_base + EXTENSAO_REGISTROS, lambda arquivo: arquivo.write(registros.data))
+    _substituir_atomicamente(caminho_base + EXTENSAO_INDICE, lambda arquivo: np.savez(
+        arquivo,
+        tamanhos=temporada.tamanhos, tipos=temporada.tipos, companhias=temporada.companhias,
+        diretas=temporada._diretas, ordem=ordem, limites=limites,
+        linhas3=np.asarray(indice.posicoes_linha3, dtype=np.int64),
+        metadados=np.frombuffer(json.dumps(metadados, ensure_ascii=False).encode('utf-8'), dtype=np.uint8),
+    ))
+
+
+def abrir_temporada(caminho_base):
+    """
+    Abre uma temporada gravada por gravar_temporada: os registros são mapeados com mmap
+    (somente leitura, sem cópia) e o índice lateral vai para `temporada.indice_arquivo`.
+    Levanta OSError se os arquivos não existirem e ValueError se estiverem inconsistentes.
+    """
+    with np.load(caminho_base + EXTENSAO_INDICE) as arquivo:
+        colunas = {nome: arquivo[nome] for nome in arquivo.files}
+    metadados = json.loads(colunas.pop('metadados').tobytes().decode('utf-8'))
+    if metadados.get('versao') != VERSAO_ARQUIVO:
+        raise ValueError("Versão do arquivo de temporada não suportada")
+
+    total = metadados['registros']
+    caminho_registros = caminho_base + EXTENSAO_REGISTROS
+    if os.path.getsize(caminho_registros) != total * TAMANHO_REGISTRO or len(colunas['tamanhos']) != total:
+        raise ValueError("Arquivo de temporada incompleto")
+    if total:
+        registros = np.memmap(caminho_registros, dtype=np.uint8, mode='r', shape=(total, TAMANHO_REGISTRO))
+    else:
+        registros = np.empty((0, TAMANHO_REGISTRO), dtype=np.uint8)
+
+    temporada = TemporadaCompacta(
+        registros, colunas['tamanhos'],
+        extras={int(posicao): item for posicao, item in metadados['extras'].items()},
+        tipos=colunas['tipos'], companhias=colunas['companhias'], diretas=colunas['diretas'],
+    )
+    temporada.caminho = caminho_base
+    temporada.indice_arquivo = {
+        'origem': metadados['origem'],
+        'hash_conteudo': metadados['hash_conteudo'],
+        'total_registros': metadados['total_registros'],
+        'codigos': metadados['codigos'],
+        'companhias': metadados['companhias'],
+        'linhas_header': metadados['linhas_header'],
+        'linhas_trailer': metadados['linhas_trailer'],
+        'ordem': colunas['ordem'],
+        'limites': colunas['limites'],
+        'linhas3': colunas['linhas3'],
+    }
+    return temporada
+
+
+def remover_arquivos_temporada(caminho_base):
+    """Remove os arquivos gravados por gravar_temporada (se existirem)"""
+    for extensao in (EXTENSAO_REGISTROS, EXTENSAO_INDICE):
+        try:
+            os.remove(caminho_base + extensao)
+        except FileNotFoundError:
+            pass
+
+
+def tamanho_arquivos_temporada(caminho_base):
+    """Bytes ocupados em disco pelos arquivos da temporada"""
+    total = 0
+    for extensao in (EXTENSAO_REGISTROS, EXTENSAO_INDICE):
+        try:
+            total += os.path.getsize(caminho_base + extensao)
+        except FileNotFoundError:
+            pass
+    return total
+
+
+def linhas_nas_posicoes(dados_json, posicoes):
+    """Linhas SSIM das posições, da lista da API ou de uma TemporadaCompacta"""
+    if isinstance(dados_json, TemporadaCompacta):
+        return dados_json.linhas(posicoes)
+    return [dados_json[posicao]['ssimfile'] for posicao in posicoes]
+
+
+class TemporadasCompartilhadas:
+    """
+    Uma única TemporadaCompacta por conteúdo para todas as sessões. A temporada deixa o
+    registro sozinha quando nenhuma sessão a referencia mais.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._temporadas = weakref.WeakValueDictionary()
+
+    def compartilhar(self, chave, temporada):
+        """Devolve a temporada já registrada com a mesma chave, ou registra esta"""
+        with self._lock:
+            existente = self._temporadas.get(chave)
+            if existente is not None:
+                return existente
+            self._temporadas[chave] = temporada
+            return temporada
+
+    def __len__(self):
+        return len(self._temporadas)
+
+    def nbytes(self):
+        """Bytes ocupados pelas temporadas registradas"""
+        with self._lock:
+            return sum(temporada.nbytes for temporada in self._temporadas.values())
@@ -0,0 +1,259 @@
+# -*- coding: utf-8 -*-
+# Gerador SSIM - Testes do download da API contra um servidor HTTP local
+# Respostas gravadas servidas por http.server: novas tentativas em 429/5xx, resposta cortada,
+# espera exponencial, downloads simultâneos e estados do ProgressoDownloads
+
+import gzip
+import json
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+from urllib.parse import parse_qs, urlparse
+
+import requests
+
+import api_anac
+from api_anac import ProgressoDownloads, baixar_registros_temporada, baixar_temporadas, iterar_linhas_ssim
+from cache_temporadas import CacheTemporadas
+
+
+def _registros_gravados(temporada, voos):
+    """Registros como a API devolve: headers 1 e 2, registros 3 e trailer 5, em linhas de 200 colunas"""
+    linhas = [
+        '1AIRLINE STANDARD SCHEDULE DATA SET'.ljust(194) + '000001',
+        f'2UXX  0008{temporada}01NOV2529MAR26'.ljust(194) + '000002',
+    ]
+    for numero in range(voos):
+        linhas.append(
+            f'3 G3 {1000 + numero:04}0101J01NOV2529MAR261234567 GRU06000600-0300  SDU07000700-0300  738'
+            .ljust(192) + f'{numero + 3:08}'
+        )
+    linhas.append('5 G3 17OCT26'.ljust(187) + f'{voos + 2:06}E{voos + 3:06}')
+    return [{'ssimfile': linha} for linha in linhas]
+
+
+# Respostas gravadas: string JSON com a lista de registros (duplamente codificada, como a API)
+REGISTROS = {
+    'W25': _registros_gravados('W25', 300),
+    'S25': _registros_gravados('S25', 450),
+    'W24': _registros_gravados('W24', 200),
+}
+RESPOSTAS = {temporada: json.dumps(json.dumps(registros)).encode() for temporada, registros in REGISTROS.items()}
+
+
+class _ServidorApi(BaseHTTPRequestHandler):
+    """Servidor da API: cada temporada tem uma fila de falhas para as próximas requisições"""
+    protocol_version = 'HTTP/1.1'
+    falhas = {}  # temporada -> ['429', '503', 'corta', ...]
+    atraso = 0.0
+    lock = threading.Lock()
+    simultaneas = 0
+    maximo_simultaneas = 0
+    requisicoes = 0
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        temporada = parse_qs(urlparse(self.path).query)['ds_temporada'][0]
+        cls = type(self)
+        with cls.lock:
+            cls.requisicoes += 1
+            cls.simultaneas += 1
+            cls.maximo_simultaneas = max(cls.maximo_simultaneas, cls.simultaneas)
+            fila = cls.falhas.get(temporada) or []
+            acao = fila.pop(0) if fila else None
+        try:
+            if cls.atraso:
+                # Sem time.sleep, que os testes substituem para registrar as esperas do download
+                threading.Event().wait(cls.atraso)
+            if acao in ('429', '500', '502', '503', '504') or temporada not in RESPOSTAS:
+                self.send_response(int(acao) if acao else 404)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+
+            corpo = RESPOSTAS[temporada]
+            comprimida = 'gzip' in self.headers.get('Accept-Encoding', '')
+            if comprimida:
+                corpo = gzip.compress(corpo)
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            if comprimida:
+                self.send_header('Content-Encoding', 'gzip')
+            self.send_header('Content-Length', str(len(corpo)))
+            self.send_header('ETag', f'"{temporada}"')
+            self.send_header('Last-Modified', 'Sat, 17 Oct 2026 12:00:00 GMT')
+            self.end_headers()
+            if acao == 'corta':
+                # Conexão encerrada no meio do corpo anunciado
+                self.wfile.write(corpo[:len(corpo) // 2])
+                self.wfile.flush()
+                self.close_connection = True
+                return
+            self.wfile.write(corpo)
+        finally:
+            with cls.lock:
+                cls.simultaneas -= 1
+
+
+class TestDownloadApi(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.servidor = ThreadingHTTPServer(('127.0.0.1', 0), _ServidorApi)
+        threading.Thread(target=cls.servidor.serve_forever, daemon=True).start()
+        cls.url = mock.patch.object(
+            api_anac, 'URL_API_SSIM', f'http://127.0.0.1:{cls.servidor.server_port}/ssimfile'
+        )
+        cls.url.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.url.stop()
+        cls.servidor.shutdown()
+        cls.servidor.server_close()
+
+    def setUp(self):
+        _ServidorApi.falhas = {}
+        _ServidorApi.atraso = 0.0
+        _ServidorApi.maximo_simultaneas = 0
+        _ServidorApi.requisicoes = 0
+        # Esperas entre tentativas registradas em vez de dormidas
+        self.esperas = []
+        espera = mock.patch.object(api_anac.time, 'sleep', self.esperas.append)
+        espera.start()
+        self.addCleanup(espera.stop)
+
+    def test_baixa_registros(self):
+        self.assertEqual(baixar_registros_temporada('W25'), REGISTROS['W25'])
+        self.assertEqual(_ServidorApi.requisicoes, 1)
+        self.assertEqual(self.esperas, [])
+
+    def test_nova_tentativa_em_429_e_5xx(self):
+        _ServidorApi.falhas['W25'] = ['429', '503', '502']
+        progresso = ProgressoDownloads(['W25'])
+        registros = baixar_registros_temporada('W25', tentativas=4, espera_inicial=0.01, progresso=progresso)
+        self.assertEqual(registros, REGISTROS['W25'])
+        self.assertEqual(_ServidorApi.requisicoes, 4)
+        estado = progresso.instantaneo()['W25']
+        self.assertEqual((estado['estado'], estado['tentativa']), ('concluída', 4))
+
+    def test_resposta_cortada_repete_o_download(self):
+        _ServidorApi.falhas['S25'] = ['corta']
+        self.assertEqual(baixar_registros_temporada('S25', espera_inicial=0.01), REGISTROS['S25'])
+        self.assertEqual(_ServidorApi.requisicoes, 2)
+
+    def test_resposta_cortada_sem_tentativas(self):
+        _ServidorApi.falhas['S25'] = ['corta']
+        with self.assertRaises(requests.exceptions.RequestException) as erro:
+            baixar_registros_temporada('S25', tentativas=1)
+        self.assertTrue(api_anac._falha_transitoria(erro.exception))
+
+    def test_espera_exponencial(self):
+        _ServidorApi.falhas['W25'] = ['503', '503', '503']
+        with mock.patch.object(api_anac.random, 'uniform', return_value=1.0):
+            baixar_registros_temporada('W25', tentativas=4, espera_inicial=0.5)
+        self.assertEqual(self.esperas, [0.5, 1.0, 2.0])
+
+    def test_espera_com_variacao_limitada(self):
+        _ServidorApi.falhas['W25'] = ['500', '500']
+        baixar_registros_temporada('W25', tentativas=3, espera_inicial=1.0)
+        self.assertEqual(len(self.esperas), 2)
+        self.assertTrue(0.8 <= self.esperas[0] <= 1.2)
+        self.assertTrue(1.6 <= self.esperas[1] <= 2.4)
+
+    def test_desiste_depois_das_tentativas(self):
+        _ServidorApi.falhas['W24'] = ['503'] * 5
+        progresso = ProgressoDownloads(['W24'])
+        with self.assertRaises(requests.exceptions.HTTPError):
+            baixar_registros_temporada('W24', tentativas=2, espera_inicial=0.01, progresso=progresso)
+        self.assertEqual(_ServidorApi.requisicoes, 2)
+        estado = progresso.instantaneo()['W24']
+        self.assertEqual((estado['estado'], estado['tentativa']), ('erro', 2))
+        self.assertIn('503', estado['erro'])
+
+    def test_erro_definitivo_sem_nova_tentativa(self):
+        progresso = ProgressoDownloads(['X99'])
+        with self.assertRaises(requests.exceptions.HTTPError) as erro:
+            baixar_registros_temporada('X99', espera_inicial=0.01, progresso=progresso)
+        self.assertEqual(erro.exception.response.status_code, 404)
+        self.assertEqual(_ServidorApi.requisicoes, 1)
+        self.assertEqual(self.esperas, [])
+        self.assertEqual(progresso.instantaneo()['X99']['estado'], 'erro')
+
+    def test_estados_do_progresso(self):
+        _ServidorApi.falhas['W25'] = ['503']
+        progresso = ProgressoDownloads(['W25'])
+        inicial = progresso.instantaneo()['W25']
+        self.assertEqual((inicial['estado'], inicial['tentativa'], inicial['bytes']), ('na fila', 0, 0))
+
+        durante_espera = []
+        with mock.patch.object(api_anac.time, 'sleep', lambda _: durante_espera.append(progresso.instantaneo()['W25'])):
+            baixar_registros_temporada('W25', espera_inicial=0.01, progresso=progresso)
+        self.assertEqual(durante_espera[0]['estado'], 'aguardando nova tentativa')
+        self.assertEqual(durante_espera[0]['tentativa'], 1)
+
+        final = progresso.instantaneo()['W25']
+        self.assertEqual((final['estado'], final['tentativa']), ('concluída', 2))
+        self.assertEqual(final['registros'], len(REGISTROS['W25']))
+        self.assertIsNotNone(final['bytes_totais'])
+        self.assertEqual(final['bytes'], final['bytes_totais'])
+        # instantaneo() devolve cópias
+        final['estado'] = 'alterado'
+        self.assertEqual(progresso.instantaneo()['W25']['estado'], 'concluída')
+
+    def test_baixar_temporadas_simultaneas(self):
+        _ServidorApi.atraso = 0.3
+        _ServidorApi.falhas['W24'] = ['corta']
+        temporadas = ['W25', 'S25', 'W24', 'X99']
+        progresso = ProgressoDownloads(temporadas)
+        downloads = baixar_temporadas(temporadas, espera_inicial=0.01, progresso=progresso)
+        self.assertEqual(list(downloads), temporadas)
+        for temporada in ('W25', 'S25', 'W24'):
+            self.assertEqual(downloads[temporada].result(timeout=30), REGISTROS[temporada])
+        with self.assertRaises(requests.exceptions.HTTPError):
+            downloads['X99'].result(timeout=30)
+        self.assertGreater(_ServidorApi.maximo_simultaneas, 1)
+
+        estados = progresso.instantaneo()
+        self.assertEqual(
+            {temporada: (estado['estado'], estado['tentativa']) for temporada, estado in estados.items()},
+            {'W25': ('concluída', 1), 'S25': ('concluída', 1), 'W24': ('concluída', 2), 'X99': ('erro', 1)}
+        )
+        self.assertEqual(estados['S25']['registros'], len(REGISTROS['S25']))
+
+    def test_destino_grava_no_cache_a_cada_tentativa(self):
+        diretorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, diretorio, True)
+        cache = CacheTemporadas(diretorio)
+        _ServidorApi.falhas['W25'] = ['corta']
+        metadados = baixar_registros_temporada(
+            'W25', espera_inicial=0.01,
+            destino=lambda temporada, registros: cache.salvar(temporada, iterar_linhas_ssim(registros))
+        )
+        self.assertEqual(metadados['registros'], len(REGISTROS['W25']))
+        # A tentativa interrompida não deixa arquivo temporário para trás
+        self.assertEqual([nome for nome in os.listdir(diretorio) if nome.endswith('.tmp')], [])
+        linhas, _ = cache.carregar('W25')
+        self.assertEqual(linhas, [registro['ssimfile'] for registro in REGISTROS['W25']])
+
+    def test_validadores_da_resposta_de_cada_temporada(self):
+        _ServidorApi.falhas['S25'] = ['503']
+        respostas = {}
+        downloads = baixar_temporadas(['W25', 'S25'], espera_inicial=0.01, info_respostas=respostas)
+        for download in downloads.values():
+            download.result(timeout=30)
+        # S25: validadores da tentativa que deu certo, não da que recebeu 503
+        self.assertEqual(respostas['S25'], {
+            'status': 200, 'etag': '"S25"', 'last_modified': 'Sat, 17 Oct 2026 12:00:00 GMT'
+        })
+        self.assertEqual(respostas['W25']['etag'], '"W25"')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+# Gerador SSIM - Testes do cache de resultados
+# Um único cálculo por chave com requisições simultâneas: erros compartilhados com quem
+# esperava, interrupções da thread que calculava refeitas pelas demais
+
+import threading
+import unittest
+
+from cache_resultados import CacheResultados
+
+
+class _Interrompido(BaseException):
+    """Como KeyboardInterrupt ou o StopException do Streamlit: não é uma Exception"""
+
+
+class TestCalculoCompartilhado(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = CacheResultados(medir=lambda valor: 1)
+        self.iniciado = threading.Event()
+        self.liberar = threading.Event()
+        self.chamadas = 0
+
+    def calcular_apos_liberar(self, resultado):
+        """Primeira chamada espera `liberar` e então devolve ou lança `resultado`; as demais devolvem 'valor'"""
+        def calcular():
+            self.chamadas += 1
+            if self.chamadas > 1:
+                return 'valor'
+            self.iniciado.set()
+            self.liberar.wait(5)
+            if isinstance(resultado, BaseException):
+                raise resultado
+            return resultado
+        return calcular
+
+    def obter_com_espera(self, calcular):
+        """Inicia o cálculo em uma thread, obtém a mesma chave enquanto ele roda e devolve (thread, valor ou erro)"""
+        saida = {}
+
+        def responsavel():
+            try:
+                saida['responsavel'] = self.cache.obter('chave', calcular)
+            except BaseException as erro:
+                saida['responsavel'] = erro
+
+        thread = threading.Thread(target=responsavel)
+        thread.start()
+        self.assertTrue(self.iniciado.wait(5))
+        # Libera o cálculo assim que esta thread estiver esperando por ele
+        threading.Timer(0.2, self.liberar.set).start()
+        try:
+            saida['espera'] = self.cache.obter('chave', calcular)
+        except Exception as erro:
+            saida['espera'] = erro
+        thread.join(5)
+        return saida
+
+    def test_valor_compartilhado(self):
+        saida = self.obter_com_espera(self.calcular_apos_liberar('valor'))
+        self.assertEqual(saida, {'responsavel': 'valor', 'espera': 'valor'})
+        self.assertEqual(self.chamadas, 1)
+        self.assertEqual(self.cache.compartilhados, 1)
+
+    def test_erro_compartilhado(self):
+        erro = ValueError('falhou')
+        saida = self.obter_com_espera(self.calcular_apos_liberar(erro))
+        self.assertIs(saida['responsavel'], erro)
+        self.assertIs(saida['espera'], erro)
+        self.assertEqual(self.chamadas, 1)
+        self.assertEqual(self.cache.erros_compartilhados, 1)
+
+    def test_interrupcao_nao_compartilhada(self):
+        saida = self.obter_com_espera(self.calcular_apos_liberar(_Interrompido()))
+        self.assertIsInstance(saida['responsavel'], _Interrompido)
+        # Quem esperava calcula de novo e o resultado fica no cache
+        self.assertEqual(saida['espera'], 'valor')
+        self.assertEqual(self.chamadas, 2)
+        self.assertEqual(self.cache.erros_compartilhados, 0)
+        self.assertEqual(self.cache.obter('chave', self.calcular_apos_liberar('outro')), 'valor')
+        self.assertEqual(self.cache.acertos, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
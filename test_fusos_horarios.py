@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+# Gerador SSIM - Testes da conversão para Brasília pelos fusos IANA
+# Períodos divididos nas trocas de horário de verão, inclusive os que atravessam um ano inteiro
+
+import shutil
+import tempfile
+import unittest
+
+from referencias import IndiceAeroportos
+from fusos_horarios import transformar_linhas3_fuso_iana
+
+
+def _registro3(inicio, fim):
+    """Voo GRU 22:00 -> JFK 06:00 (horário local), todos os dias do período"""
+    return f'3 G3 10000101J{inicio}{fim}1234567 GRU22002200-0300  JFK06000600-0500  738'.ljust(192) + '00000003'
+
+
+class TestFusoIana(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.diretorio = tempfile.mkdtemp()
+        cls.aeroportos = IndiceAeroportos.de_csv('airport.csv', cls.diretorio)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.diretorio, ignore_errors=True)
+
+    def trechos(self, inicio, fim):
+        """(início, fim, chegada em Brasília) de cada registro gerado"""
+        linhas = transformar_linhas3_fuso_iana([_registro3(inicio, fim)], self.aeroportos)
+        for linha in linhas:
+            self.assertEqual(len(linha), 200)
+        return [(linha[14:21], linha[21:28], linha[57:61]) for linha in linhas]
+
+    def test_periodo_dividido_no_horario_de_verao(self):
+        self.assertEqual(self.trechos('30DEC24', '30DEC25'), [
+            ('30DEC24', '08MAR25', '0800'),
+            ('09MAR25', '01NOV25', '0700'),
+            ('02NOV25', '30DEC25', '0800'),
+        ])
+
+    def test_periodo_que_atravessa_um_ano_inteiro(self):
+        # 31DEC24-01JAN26 tem 366 dias e não começa nem termina em 2025
+        self.assertEqual(self.trechos('31DEC24', '01JAN26'), [
+            ('31DEC24', '08MAR25', '0800'),
+            ('09MAR25', '01NOV25', '0700'),
+            ('02NOV25', '01JAN26', '0800'),
+        ])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+# Gerador SSIM - Testes das respostas de erro do modo serviço
+# Falhas inesperadas antes do arquivo viram 500 com corpo JSON; no meio do arquivo a conexão
+# é encerrada sem o chunk final, e o cliente percebe a resposta incompleta
+
+import http.client
+import json
+import threading
+import unittest
+from unittest import mock
+
+import servidor_ssim
+from cache_resultados import ResultadoFiltragem
+from servidor_ssim import criar_servidor
+
+LINHA3 = '3 G3 10000101J01NOV2529MAR261234567 GRU06000600-0300  SDU07000700-0300  738'.ljust(192) + '00000003'
+
+
+class _ServicoFalso:
+    """Serviço com o resultado fixo de uma linha, ou que falha ao gerar"""
+
+    def __init__(self):
+        self.erro = None
+
+    def gerar(self, temporada, codigo_companhia, *opcoes):
+        if self.erro is not None:
+            raise self.erro
+        return ('chave', codigo_companhia), ResultadoFiltragem((), (LINHA3,), None)
+
+    def estatisticas(self):
+        return {}
+
+
+def _escrever_e_falhar(linhas, arquivo):
+    """Escreve o começo do arquivo e falha, como um erro no meio da geração"""
+    arquivo.write(next(iter(linhas)))
+    raise RuntimeError('falha no meio do arquivo')
+
+
+class TestErrosServidor(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.servico = _ServicoFalso()
+        cls.servidor = criar_servidor(cls.servico, porta=0)
+        threading.Thread(target=cls.servidor.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.servidor.shutdown()
+        cls.servidor.server_close()
+
+    def setUp(self):
+        self.servico.erro = None
+        # Log e traceback das falhas esperadas não poluem a saída dos testes
+        for silencio in (mock.patch.object(servidor_ssim.traceback, 'print_exc'),
+                         mock.patch.object(servidor_ssim.RequisicaoSSIM, 'log_message')):
+            silencio.start()
+            self.addCleanup(silencio.stop)
+
+    def requisitar(self, caminho):
+        conexao = http.client.HTTPConnection('127.0.0.1', self.servidor.server_port, timeout=10)
+        self.addCleanup(conexao.close)
+        conexao.request('GET', caminho)
+        return conexao.getresponse()
+
+    def test_arquivo_completo(self):
+        resposta = self.requisitar('/ssim?temporada=W25&companhia=G3')
+        self.assertEqual(resposta.status, 200)
+        # Registro 3 renumerado na posição do arquivo
+        self.assertIn(LINHA3[:192], resposta.read().decode())
+
+    def test_erro_inesperado_antes_do_arquivo(self):
+        self.servico.erro = RuntimeError('falha inesperada')
+        resposta = self.requisitar('/ssim?temporada=W25&companhia=G3')
+        self.assertEqual(resposta.status, 500)
+        self.assertEqual(resposta.getheader('Content-Type'), 'application/json; charset=utf-8')
+        self.assertEqual(json.loads(resposta.read()), {'erro': 'Erro interno do servidor'})
+
+    def test_erro_no_meio_do_arquivo(self):
+        with mock.patch.object(servidor_ssim, 'escrever_linhas', _escrever_e_falhar):
+            resposta = self.requisitar('/ssim?temporada=W25&companhia=G3')
+            self.assertEqual(resposta.status, 200)
+            with self.assertRaises(http.client.IncompleteRead):
+                resposta.read()
+
+    def test_erro_conhecido_continua_com_seu_status(self):
+        resposta = self.requisitar('/inexistente')
+        self.assertEqual(resposta.status, 404)
+        self.assertIn('Rota desconhecida', json.loads(resposta.read())['erro'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,345 @@
+# -*- coding: utf-8 -*-
+# Gerador SSIM - Transformações da linha 3
+# Ajuste de formato, conversão de horários e adaptação ao padrão SSIM GOL
+
+import re
+
+from referencias import IndiceAeroportos
+from instrumentacao import contar
+
+def obter_offset_aeroporto(codigo_aeroporto, df_airports):
+    """Obtém o offset UTC de um aeroporto (aceita o índice de aeroportos ou o DataFrame)"""
+    if df_airports is None:
+        return -3  # Default para horário de Brasília
+    
+    # Consulta O(1) no índice de aeroportos
+    if isinstance(df_airports, IndiceAeroportos):
+        return df_airports.offset(codigo_aeroporto)
+    
+    # Buscar por código IATA
+    resultado = df_airports[df_airports['IATA'] == codigo_aeroporto]
+    if not resultado.empty:
+        return resultado.iloc[0]['Timezone']
+    
+    # Se não encontrar, retorna -3 (Brasília)
+    return -3
+
+def ajustar_formato_ssim(linha_ssim):
+    """Ajusta formato SSIM para repetir código da companhia aérea na posição específica"""
+    if not linha_ssim.startswith('3 '):
+        return linha_ssim
+    
+    try:
+        # Extrair código da companhia (posições 2-4)
+        codigo_cia = linha_ssim[2:4].strip()
+        
+        # Procurar o padrão no final: [muitos espaços] + codigo_cia + espaço + número
+        # Exemplo: "                                                              AF 0415"
+        
+        # Procurar por 30+ espaços seguidos do código da CIA e número do voo
+        padrao = f"( {{30,}}){codigo_cia} (\\d{{4}})"
+        match = re.search(padrao, linha_ssim)
+        
+        if match:
+            # Encontrou! Vamos substituir
+            espacos_originais = match.group(1)  # Os espaços antes do código
+            numero_voo = match.group(2)  # O número do voo
+            
+            # Remover 9 espaços e inserir "AF       " (AF + 7 espaços)
+            if len(espacos_originais) >= 15:  # Garantir que tem espaços suficientes
+                # Calcular: 62 espaços originais - 9 = 53 espaços antes do novo AF
+                espacos_antes_novo_af = len(espacos_originais) - 9
+                
+                if espacos_antes_novo_af > 0:
+                    # Construir: 53_espaços + AF + 7_espaços + AF_0415
+                    novo_formato = f"{' ' * espacos_antes_novo_af}{codigo_cia}{' ' * 7}{codigo_cia} {numero_voo}"
+                    
+                    # Substituir na linha original
+                    linha_ajustada = linha_ssim.replace(
+                        f"{espacos_originais}{codigo_cia} {numero_voo}",
+                        novo_formato
+                    )
+                    contar('ajuste_formato.padrao_principal')
+                    return linha_ajustada
+        
+        # Se não encontrou o padrão padrão, tentar abordagem mais geral
+        # Procurar qualquer sequência longa de espaços
+        match_espacos = re.search(r' {25,}', linha_ssim)
+        if match_espacos:
+            espacos_encontrados = match_espacos.group(0)
+            
+            # Verificar se após os espaços tem o código da CIA
+            pos_fim_espacos = match_espacos.end()
+            resto_linha = linha_ssim[pos_fim_espacos:]
+            
+            if resto_linha.startswith(f"{codigo_cia} "):
+                # Encontrou! Fazer a substituição
+                if len(espacos_encontrados) >= 15:
+                    espacos_antes_novo_af = len(espacos_encontrados) - 9
+                    
+                    if espacos_antes_novo_af > 0:
+                        novo_formato = f"{' ' * espacos_antes_novo_af}{codigo_cia}{' ' * 7}"
+                        
+                        linha_ajustada = linha_ssim.replace(
+                            espacos_encontrados,
+                            novo_formato
+                        )
+                        contar('ajuste_formato.fallback_espacos')
+                        return linha_ajustada
+        
+        # Se não conseguiu ajustar, retorna original
+        contar('ajuste_formato.sem_ajuste')
+        return linha_ssim
+        
+    except Exception as e:
+        # Em caso de erro, retorna a linha original
+        contar('ajuste_formato.erros_ignorados')
+        return linha_ssim
+
+def converter_horario_ssim(linha_ssim, df_airports, para_brasilia=False):
+    """Converte horários de uma linha SSIM para horário de Brasília"""
+    if not linha_ssim.startswith('3 '):
+        return linha_ssim
+    
+    # Primeiro ajustar o formato (repetir código da CIA)
+    linha_ajustada = ajustar_formato_ssim(linha_ssim)
+    
+    # Se não precisa converter horários, retorna linha ajustada
+    if not para_brasilia:
+        return linha_ajustada
+    
+    # Extrair aeroportos da linha SSIM
+    # Formato: 3 XX NNNNNNNJDDMMMYYDDMMMYYOOOOOOO  AAAHHMM-TTTT  BBBHHMM-TTTT  ...
+    try:
+        # Encontrar posições dos aeroportos e horários
+        partes = linha_ajustada.split()
+        
+        # Buscar padrões de aeroporto + horário (ex: GRU12001200-0300)
+        padrao_aeroporto_horario = re.findall(r'([A-Z]{3})(\d{4})(\d{4})([-+]\d{4})', linha_ajustada)
+        
+        linha_convertida = linha_ajustada
+        
+        for aeroporto, hora_partida, hora_chegada, offset_original in padrao_aeroporto_horario:
+            offset_aeroporto = obter_offset_aeroporto(aeroporto, df_airports)
+            offset_brasilia = -3  # UTC-3
+            
+            # Converter offset format (-0300 para -3)
+            try:
+                offset_atual = int(offset_original[:3])  # -030 -> -3
+            except:
+                offset_atual = offset_aeroporto
+            
+            # Calcular diferença de horas para Brasília
+            diferenca_horas = offset_brasilia - offset_atual
+            
+            if diferenca_horas != 0:
+                # Converter horário de partida
+                try:
+                    hora_part_int = int(hora_partida)
+                    horas_part = hora_part_int // 100
+                    minutos_part = hora_part_int % 100
+                    
+                    # Aplicar diferença
+                    horas_part += diferenca_horas
+                    
+                    # Ajustar se passou de 24h ou ficou negativo
+                    if horas_part >= 24:
+                        horas_part -= 24
+                    elif horas_part < 0:
+                        horas_part += 24
+                    
+                    hora_partida_nova = f"{horas_part:02d}{minutos_part:02d}"
+                    
+                    # Converter horário de chegada
+                    hora_cheg_int = int(hora_chegada)
+                    horas_cheg = hora_cheg_int // 100
+                    minutos_cheg = hora_cheg_int % 100
+                    
+                    # Aplicar diferença
+                    horas_cheg += diferenca_horas
+                    
+                    # Ajustar se passou de 24h ou ficou negativo
+                    if horas_cheg >= 24:
+                        horas_cheg -= 24
+                    elif horas_cheg < 0:
+                        horas_cheg += 24
+                    
+                    hora_chegada_nova = f"{horas_cheg:02d}{minutos_cheg:02d}"
+                    
+                    # Substituir na linha
+                    texto_original = f"{aeroporto}{hora_partida}{hora_chegada}{offset_original}"
+                    texto_novo = f"{aeroporto}{hora_partida_nova}{hora_chegada_nova}-0300"
+                    linha_convertida = linha_convertida.replace(texto_original, texto_novo)
+                    contar('conversao_horario.blocos_convertidos')
+                    
+                except (ValueError, IndexError):
+                    # Se der erro na conversão, manter original
+                    contar('conversao_horario.erros_ignorados')
+                    continue
+        
+        return linha_convertida
+        
+    except Exception:
+        # Se der qualquer erro, retorna a linha ajustada (sem conversão de horário)
+        contar('conversao_horario.erros_ignorados')
+        return linha_ajustada
+
+def melhorar_campo_informacoes_linha3(linha_ssim):
+    """
+    Melhora o campo de informações adicionais da linha 3 seguindo padrão SSIM
+    Exemplo: Y312 -> Y138VVG373G (baseado no padrão GOL)
+    """
+    if not linha_ssim.startswith('3 '):
+        return linha_ssim
+    
+    # Extrair informações da linha
+    codigo_cia = linha_ssim[2:4].strip()  # Posição 2-3: código da companhia
+    
+    # Encontrar posição do campo de aeronave (geralmente após os aeroportos e horários)
+    # No formato SSIM, o tipo de aeronave está por volta da posição 100-110
+    tipo_aeronave = ""
+    for i in range(100, min(120, len(linha_ssim)-3)):
+        if linha_ssim[i:i+3].strip() and linha_ssim[i:i+3].isalnum():
+            tipo_aeronave = linha_ssim[i:i+3].strip()
+            break
+    
+    # Localizar campo atual de informações (geralmente contém Y seguido de números)
+    campo_info_atual = ""
+    pos_campo_info = -1
+    for i in range(150, min(180, len(linha_ssim)-10)):
+        if linha_ssim[i] == 'Y' and linha_ssim[i+1:i+4].isdigit():
+            # Encontrou campo que começa com Y seguido de números
+            # Extrair até encontrar espaços ou fim
+            j = i
+            while j < len(linha_ssim) and linha_ssim[j] not in [' ', '\t']:
+                j += 1
+            campo_info_atual = linha_ssim[i:j]
+            pos_campo_info = i
+            break
+    
+    if pos_campo_info == -1:
+        contar('melhoria_informacoes.sem_campo_servico')
+        return linha_ssim  # Não encontrou campo para melhorar
+    
+    # Criar novo campo de informações baseado no padrão SSIM
+    # Formato: Y + configuração + código aeronave + código companhia
+    configuracao_base = campo_info_atual[1:] if len(campo_info_atual) > 1 else "312"
+    
+    # Se a configuração é muito curta, expandir baseada no tipo de aeronave
+    if len(configuracao_base) < 3:
+        configuracao_base = "312"  # Padrão básico
+    
+    # Criar campo melhorado: Y + config + aeronave_info + companhia
+    if tipo_aeronave:
+        # Adicionar informações como no padrão GOL: Y138VVG373G
+        novo_campo_info = f"Y{configuracao_base}VV{tipo_aeronave}{codigo_cia}"
+    else:
+        # Padrão básico se não encontrar aeronave
+        novo_campo_info = f"Y{configuracao_base}VV{codigo_cia}"
+    
+    # Substituir na linha, mantendo mesmo tamanho
+    tamanho_original = len(campo_info_atual)
+    if len(novo_campo_info) > tamanho_original:
+        novo_campo_info = novo_campo_info[:tamanho_original]
+    elif len(novo_campo_info) < tamanho_original:
+        novo_campo_info = novo_campo_info + ' ' * (tamanho_original - len(novo_campo_info))
+    
+    linha_melhorada = linha_ssim[:pos_campo_info] + novo_campo_info + linha_ssim[pos_campo_info + tamanho_original:]
+    
+    return linha_melhorada
+
+def adaptar_para_padrao_ssim_gol(linha_ssim):
+    """
+    Adapta dados da ANAC para padrão SSIM da GOL, melhorando campos obrigatórios
+    """
+    if not linha_ssim.startswith('3 '):
+        return linha_ssim
+    
+    try:
+        # Extrair informações básicas
+        codigo_cia = linha_ssim[2:4].strip()
+        
+        # Encontrar posição do tipo de aeronave (geralmente posição ~105-115)
+        tipo_aeronave = ""
+        for i in range(100, min(120, len(linha_ssim)-3)):
+            if linha_ssim[i:i+3].strip() and linha_ssim[i:i+3].isalnum():
+                tipo_aeronave = linha_ssim[i:i+3].strip()
+                break
+        
+        if not tipo_aeronave:
+            tipo_aeronave = "320"  # Default
+        
+        # Melhoria 1: Campo Onward Carriage (posição ~120-140)
+        # Formato ANAC: "LA 0707"
+        # Formato GOL:  "G3       G3 1007"
+        
+        # Encontrar campo onward carriage atual
+        padrao_onward = f"{codigo_cia} \\d{{4}}"
+        match_onward = re.search(padrao_onward, linha_ssim)
+        
+        if match_onward:
+            campo_onward_original = match_onward.group(0)
+            numero_voo = campo_onward_original.split()[1]
+            
+            # Criar novo campo no padrão GOL: "G3       G3 1007"
+            novo_campo_onward = f"{codigo_cia}{' ' * 7}{codigo_cia} {numero_voo}"
+            
+            # Localizar posição para substituição
+            pos_onward = linha_ssim.find(campo_onward_original)
+            if pos_onward > 0:
+                # Calcular espaços antes para manter 200 caracteres
+                espacos_antes = 120  # Posição aproximada do campo onward
+                linha_parte1 = linha_ssim[:espacos_antes]
+                linha_parte2 = linha_ssim[pos_onward + len(campo_onward_original):]
+                
+                # Reconstruir linha
+                linha_ssim = linha_parte1 + novo_campo_onward + linha_parte2
+        else:
+            contar('adaptacao_gol.sem_onward')
+        
+        # Melhoria 2: Campo Service Information (posição ~170-190)
+        # Formato ANAC: "000"
+        # Formato GOL:  "Y138VVG373G"
+        
+        # Procurar campo de service information (geralmente "000" ou "Y...")
+        padrao_service = r'(000|Y\d+)'
+        match_service = re.search(padrao_service, linha_ssim[150:])
+        
+        if match_service:
+            campo_service_original = match_service.group(0)
+            
+            # Criar novo campo no padrão GOL
+            if tipo_aeronave in ['73G', '73X', '738']:
+                configuracao = "138" if tipo_aeronave == '73G' else "186"
+            elif tipo_aeronave in ['320', '321', '319']:
+                configuracao = "180" if tipo_aeronave == '320' else "224"
+            elif tipo_aeronave in ['789', '788']:
+                configuracao = "304"
+            else:
+                configuracao = "180"  # Default
+            
+            novo_campo_service = f"Y{configuracao}VV{tipo_aeronave}{codigo_cia}"
+            
+            # Localizar e substituir
+            pos_service = linha_ssim.rfind(campo_service_original)
+            if pos_service > 0:
+                linha_antes = linha_ssim[:pos_service]
+                linha_depois = linha_ssim[pos_service + len(campo_service_original):]
+                linha_ssim = linha_antes + novo_campo_service + linha_depois
+        else:
+            contar('adaptacao_gol.sem_service_information')
+        
+        # Garantir 200 caracteres exatos (contados para o painel de desempenho)
+        if len(linha_ssim) > 200:
+            contar('adaptacao_gol.linhas_truncadas')
+            linha_ssim = linha_ssim[:200]
+        elif len(linha_ssim) < 200:
+            contar('adaptacao_gol.linhas_completadas')
+            linha_ssim = linha_ssim + ' ' * (200 - len(linha_ssim))
+        
+        return linha_ssim
+        
+    except Exception:
+        # Em caso de erro, retorna linha original
+        contar('adaptacao_gol.erros_ignorados')
+        return linha_ssim
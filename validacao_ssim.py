@@ -0,0 +1,238 @@
+# -*- coding: utf-8 -*-
+# Gerador SSIM - Validação dos arquivos gerados
+# Confere tamanho, ordem dos registros, numeração, trailer, datas, horários e aeroportos em lotes
+# sobre a matriz de caracteres, enquanto as linhas passam para a gravação (sem segunda leitura)
+
+import numpy as np
+
+from parser_ssim import (
+    TAMANHO_LINHA, TAMANHO_LOTE, CAMPOS_LINHA3, CAMPOS_HORARIO, CAMPOS_OFFSET,
+    matriz_caracteres, _data, _numero, _eh_maiuscula, _MAIS, _MENOS
+)
+from referencias import IndiceAeroportos
+from temporada_compacta import linhas_nas_posicoes
+from instrumentacao import etapa, contar
+
+CATEGORIAS = {
+    'tamanho': "Registros com tamanho diferente de 200 caracteres",
+    'sequencia': "Registros fora da ordem 1, 2, 3/4, 5 ou de tipo desconhecido",
+    'numeracao': "Registros 3/4 com número (colunas 193-200 / 195-200) diferente da linha",
+    'trailer': "Registro 5 ausente, repetido, fora do fim ou com numeração inconsistente",
+    'data': "Período de operação inválido (DDMMMAA ou fim antes do início)",
+    'dias_operacao': "Dias de operação inválidos (posição d deve ter o dígito d ou espaço)",
+    'horario': "Horários (HHMM) ou variações UTC (+HHMM/-HHMM) inválidos",
+    'aeroporto_formato': "Código de aeroporto fora do formato IATA (3 letras)",
+    'aeroporto_desconhecido': "Aeroportos que não estão no índice de aeroportos",
+}
+AVISOS = {'aeroporto_desconhecido'}  # Não invalidam o arquivo (o índice de aeroportos pode estar incompleto)
+
+# Ordem dos tipos de registro no arquivo (linhas de zeros não entram na sequência)
+_ORDEM_TIPO = np.full(256, -1, dtype=np.int8)
+_ORDEM_TIPO[ord('0')] = 0
+_ORDEM_TIPO[ord('1')], _ORDEM_TIPO[ord('2')] = 1, 2
+_ORDEM_TIPO[ord('3')] = _ORDEM_TIPO[ord('4')] = 3
+_ORDEM_TIPO[ord('5')] = 5
+
+
+def _horario_valido(matriz, inicio):
+    """HHMM com HH < 24 e MM < 60"""
+    valores, validos = _numero(matriz, inicio, inicio + 4)
+    return validos & (valores // 100 < 24) & (valores % 100 < 60)
+
+
+def _offset_valido(matriz, inicio):
+    sinal = matriz[:, inicio]
+    return ((sinal == _MAIS) | (sinal == _MENOS)) & _horario_valido(matriz, inicio + 1)
+
+
+class RelatorioValidacao:
+    """Linhas (numeradas a partir de 1) com problema, por categoria"""
+
+    def __init__(self, total_linhas, ocorrencias):
+        self.total_linhas = total_linhas
+        self.ocorrencias = ocorrencias  # categoria -> array de números de linha
+
+    @property
+    def valido(self):
+        """Sem erros (avisos não invalidam)"""
+        return not any(len(linhas) for categoria, linhas in self.ocorrencias.items() if categoria not in AVISOS)
+
+    def contagem(self):
+        """Número de linhas com problema por categoria (só as que ocorreram)"""
+        return {categoria: len(linhas) for categoria, linhas in self.ocorrencias.items() if len(linhas)}
+
+    def resumo(self, exemplos=5):
+        """Uma linha de texto por categoria, com as primeiras linhas afetadas"""
+        mensagens = []
+        for categoria, quantidade in self.contagem().items():
+            linhas = ', '.join(str(numero) for numero in self.ocorrencias[categoria][:exemplos])
+            if quantidade > exemplos:
+                linhas += ', ...'
+            icone = "⚠️" if categoria in AVISOS else "❌"
+            mensagens.append(f"{icone} {CATEGORIAS[categoria]}: {quantidade} (linhas {linhas})")
+        return mensagens
+
+    def para_dict(self):
+        return {
+            'total_linhas': self.total_linhas,
+            'valido': self.valido,
+            'ocorrencias': {categoria: linhas.tolist() for categoria, linhas in self.ocorrencias.items() if len(linhas)},
+        }
+
+
+class ValidadorSSIM:
+    """
+    Valida as linhas de um arquivo SSIM em lotes de TAMANHO_LOTE.
+
+    `verificar(linhas)` devolve as mesmas linhas (para encadear com a gravação) e valida
+    cada lote ao passar; `concluir()` fecha as verificações de fim de arquivo e devolve o
+    RelatorioValidacao. Com `arquivo=False` só os campos dos registros 3 são conferidos
+    (temporada da API, antes da numeração e do trailer do gerador).
+    Aeroportos são conferidos contra `df_airports` (IndiceAeroportos), quando informado.
+    """
+
+    def __init__(self, df_airports=None, arquivo=True):
+        self.arquivo = arquivo
+        self._aeroportos = None
+        if isinstance(df_airports, IndiceAeroportos) and len(df_airports):
+            codigos = [codigo.encode('ascii', errors='replace').ljust(3)[:3] for codigo in df_airports.por_iata]
+            self._aeroportos = np.array(sorted(codigos), dtype='S3')
+        self._total = 0
+        self._ultima_ordem = 0
+        self._trailers = []
+        self._ocorrencias = {categoria: [] for categoria in CATEGORIAS}
+
+    def verificar(self, linhas):
+        """Repassa as linhas, validando-as em lotes"""
+        lote = []
+        for linha in linhas:
+            lote.append(linha)
+            if len(lote) == TAMANHO_LOTE:
+                self.validar_lote(lote)
+                yield from lote
+                lote = []
+        if lote:
+            self.validar_lote(lote)
+            yield from lote
+
+    def _registrar(self, categoria, numeros, problemas):
+        if problemas.any():
+            self._ocorrencias[categoria].append(numeros[problemas])
+
+    def validar_lote(self, lote):
+        """Valida as próximas linhas do arquivo"""
+        with etapa('validacao', linhas=len(lote)):
+            numeros = np.arange(self._total + 1, self._total + 1 + len(lote), dtype=np.int64)
+            self._total += len(lote)
+            tamanhos = np.fromiter(map(len, lote), dtype=np.int64, count=len(lote))
+            matriz = matriz_caracteres(lote)
+            tipos = matriz[:, 0]
+            self._registrar('tamanho', numeros, tamanhos != TAMANHO_LINHA)
+
+            linhas3 = tipos == ord('3')
+            if self.arquivo:
+                self._validar_estrutura(matriz, numeros, tipos)
+            if linhas3.any():
+                self._validar_linhas3(matriz[linhas3], numeros[linhas3])
+
+    def _validar_estrutura(self, matriz, numeros, tipos):
+        """Ordem dos tipos de registro, numeração dos registros 3/4 e registros 5"""
+        ordem = _ORDEM_TIPO[tipos]
+        self._registrar('sequencia', numeros, ordem < 0)
+        com_ordem = np.flatnonzero(ordem > 0)
+        if len(com_ordem):
+            sequencia = ordem[com_ordem]
+            anteriores = np.concatenate(([self._ultima_ordem], sequencia[:-1]))
+            # Depois do registro 5 nada mais deve vir (outro 5 é contado como trailer repetido)
+            fora_de_ordem = (sequencia < anteriores) | ((anteriores == 5) & (sequencia != 5))
+            self._registrar('sequencia', numeros[com_ordem], fora_de_ordem)
+            self._ultima_ordem = int(sequencia[-1])
+
+        # Renumeração do gerador: registro 3 com 8 dígitos nas colunas 193-200, registro 4 com 6
+        # dígitos nas colunas 195-200 (os dados do registro 4 vão até a coluna 194)
+        for tipo, inicio in (('3', 192), ('4', 194)):
+            dados = tipos == ord(tipo)
+            if dados.any():
+                numero_registro, validos = _numero(matriz[dados], inicio, TAMANHO_LINHA)
+                self._registrar('numeracao', numeros[dados], ~validos | (numero_registro != numeros[dados]))
+
+        trailers = np.flatnonzero(tipos == ord('5'))
+        if len(trailers):
+            bloco = matriz[trailers]
+            ultima_linha3, ultima_valida = _numero(bloco, 187, 193)
+            numero_linha, numero_valido = _numero(bloco, 194, TAMANHO_LINHA)
+            data_valida = ~np.isnat(_data(bloco, 5))
+            consistentes = (
+                ultima_valida & numero_valido & data_valida & (bloco[:, 193] == ord('E'))
+                & (numero_linha == numeros[trailers]) & (ultima_linha3 == numero_linha - 5)
+            )
+            self._registrar('trailer', numeros[trailers], ~consistentes)
+            self._trailers.extend(numeros[trailers].tolist())
+
+    def _validar_linhas3(self, matriz, numeros):
+        """Campos de data, dias, horários e aeroportos dos registros 3"""
+        inicio, fim = _data(matriz, CAMPOS_LINHA3['periodo_inicio'][0]), _data(matriz, CAMPOS_LINHA3['periodo_fim'][0])
+        self._registrar('data', numeros, np.isnat(inicio) | np.isnat(fim) | (fim < inicio))
+
+        coluna_dias = CAMPOS_LINHA3['dias_operacao'][0]
+        dias = matriz[:, coluna_dias:coluna_dias + 7]
+        digitos = np.arange(ord('1'), ord('8'), dtype=np.uint8)
+        dias_validos = ((dias == digitos) | (dias == ord(' '))).all(axis=1) & (dias == digitos).any(axis=1)
+        self._registrar('dias_operacao', numeros, ~dias_validos)
+
+        horarios_validos = np.ones(len(matriz), dtype=bool)
+        for campo in CAMPOS_HORARIO:
+            horarios_validos &= _horario_valido(matriz, CAMPOS_LINHA3[campo][0])
+        for campo in CAMPOS_OFFSET:
+            horarios_validos &= _offset_valido(matriz, CAMPOS_LINHA3[campo][0])
+        self._registrar('horario', numeros, ~horarios_validos)
+
+        for campo in ('origem', 'destino'):
+            coluna = CAMPOS_LINHA3[campo][0]
+            self._registrar('aeroporto_formato', numeros, ~_eh_maiuscula(matriz[:, coluna:coluna + 3]).all(axis=1))
+            if self._aeroportos is not None:
+                codigos = np.ascontiguousarray(matriz[:, coluna:coluna + 3]).view('S3').ravel()
+                self._registrar('aeroporto_desconhecido', numeros, ~np.isin(codigos, self._aeroportos))
+
+    def concluir(self):
+        """Verificações de fim de arquivo e relatório final"""
+        if self.arquivo:
+            # Exatamente um registro 5, na última linha
+            if not self._trailers:
+                self._ocorrencias['trailer'].append(np.array([self._total], dtype=np.int64))
+            else:
+                extras = list(self._trailers[:-1])
+                if self._trailers[-1] != self._total:
+                    extras.append(self._trailers[-1])
+                if extras:
+                    self._ocorrencias['trailer'].append(np.array(extras, dtype=np.int64))
+
+        ocorrencias = {}
+        for categoria, partes in self._ocorrencias.items():
+            linhas = np.unique(np.concatenate(partes)) if partes else np.empty(0, dtype=np.int64)
+            ocorrencias[categoria] = linhas
+            if len(linhas):
+                contar(f'validacao.{categoria}', len(linhas))
+        return RelatorioValidacao(self._total, ocorrencias)
+
+
+def validar_arquivo_ssim(linhas, df_airports=None):
+    """Valida um arquivo SSIM completo (linhas geradas ou lidas de disco)"""
+    validador = ValidadorSSIM(df_airports)
+    for _ in validador.verificar(linhas):
+        pass
+    return validador.concluir()
+
+
+def validar_temporada(dados_json, indice_temporada, df_airports=None):
+    """Valida os registros 3 de uma temporada da API (tamanho e campos, sem numeração/trailer)"""
+    validador = ValidadorSSIM(df_airports, arquivo=False)
+    posicoes = np.asarray(indice_temporada.posicoes_linha3, dtype=np.int64)
+    for _ in validador.verificar(linhas_nas_posicoes(dados_json, posicoes)):
+        pass
+    relatorio = validador.concluir()
+    # Números de linha do lote -> posições na temporada (base 1, como as linhas do arquivo)
+    relatorio.ocorrencias = {
+        categoria: posicoes[linhas - 1] + 1 for categoria, linhas in relatorio.ocorrencias.items()
+    }
+    return relatorio